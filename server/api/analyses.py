@@ -0,0 +1,458 @@
+import asyncio
+import re
+from typing import NamedTuple, Optional
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from . import crud, crud_async, geocoding, llm, llm_cache, models, resilience, scoring_terms, spatial
+from .config import settings
+from .weather_cache import current_weather
+
+# The Gemini-backed analyses, shared by the HTTP routes and the background job workers.
+# Each takes a session and plain arguments and returns the JSON-ready response body;
+# problems surface as HTTPException so both callers report them the same way.
+
+def _reference_profile():
+    # Imported on first use: reference_data and scoring load pandas, which would otherwise
+    # dominate the API's startup time.
+    from .reference_data import reference_profile
+    return reference_profile
+
+# Bump when a prompt template changes so cached LLM responses are not reused.
+CHECK_COMPLIANCE_PROMPT_VERSION = 2
+SUPPLIER_INSIGHTS_PROMPT_VERSION = 2
+RECOMMEND_SUPPLIER_PROMPT_VERSION = 2
+
+
+# ---------- Supplier compliance ----------
+
+def _check_compliance_request(db: Session, supplier_id: int):
+    try:
+        reference = _reference_profile().render()
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Reference Excel files not found")
+
+    supplier = db.query(models.Supplier).filter(models.Supplier.id == supplier_id).first()
+    if not supplier:
+        raise HTTPException(status_code=404, detail="Supplier not found")
+
+    records = crud.get_latest_records_by_supplier(db, [supplier_id], 5)[supplier_id]
+    if not records:
+        raise HTTPException(status_code=404, detail="No compliance records found for this supplier.")
+
+    compliance_summary = "\n".join([
+        f"- {r.metric} on {r.date_recorded.strftime('%Y-%m-%d')}: {r.result} ({r.status})"
+        for r in records
+    ])
+
+    prompt = f"""
+You are an expert supply chain compliance analyst.
+
+Analyze the compliance performance of Supplier "{supplier.name}" (ID: {supplier_id}) in comparison to other suppliers using the dataset provided.
+
+### Supplier Information:
+- Country: {supplier.country}
+- Risk Level: {supplier.risk_level}
+- Status: {supplier.status}
+- Compliance Score: {supplier.compliance_score}
+- Last Audit: {supplier.last_audit}
+
+### Supplier's Compliance Records:
+{compliance_summary}
+
+### Reference Dataset Profile (All Suppliers and Compliance Records):
+{reference}
+
+Please do not mention any limitations about the dataset size or content. Limit your response to a maximum of 4000 characters, and focus on actionable insights only.
+Please answer:
+1. How does Supplier {supplier_id}'s reliability compare to the average?
+2. Are there any patterns of delays, failures, or inconsistencies?
+3. Predict future reliability and risks.
+4. Give a reliability score out of 10 and justify.
+5. Recommend 2 action points for the compliance team.
+"""
+
+    cache_key = llm_cache.cache_key(llm.model_name(), "check_compliance", CHECK_COMPLIANCE_PROMPT_VERSION, {
+        "supplier": llm_cache.supplier_inputs(supplier),
+        "records": llm_cache.record_inputs(records),
+        "reference": _reference_profile().key(),
+    })
+    return supplier, prompt, cache_key
+
+
+def check_compliance(db: Session, supplier_id: int):
+    supplier, prompt, cache_key = _check_compliance_request(db, supplier_id)
+    analysis = llm_cache.lookup(db, cache_key)
+    cached = analysis is not None
+    if not cached:
+        try:
+            analysis = llm.generate(prompt)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Gemini error: {str(e)}")
+        llm_cache.store(db, cache_key, llm.model_name(), "check_compliance", CHECK_COMPLIANCE_PROMPT_VERSION, analysis, supplier_id)
+    llm_cache.commit(db)
+    return {"analysis": analysis, "cached": cached}
+
+
+def _supplier_insights_request(db: Session, supplier_id: int):
+    try:
+        reference = _reference_profile().render()
+    except FileNotFoundError:
+        raise HTTPException(status_code=500, detail="Reference Excel files not found")
+
+    supplier = db.query(models.Supplier).filter(models.Supplier.id == supplier_id).first()
+    if not supplier:
+        raise HTTPException(status_code=404, detail="Supplier not found")
+
+    records = crud.get_latest_records_by_supplier(db, [supplier_id], 5)[supplier_id]
+    if not records:
+        raise HTTPException(status_code=404, detail="No compliance records found for this supplier.")
+
+    history = "\n".join([
+        f"- {r.metric} on {r.date_recorded.strftime('%Y-%m-%d')}: {r.result} ({r.status})"
+        for r in records
+    ])
+
+    prompt = f"""
+You are a procurement compliance assistant.
+
+Based on the following supplier details and compliance history, generate:
+
+1. Key weaknesses or compliance issues.
+2. At least 2 suggestions to improve the supplier's compliance.
+3. Recommended contract term adjustments (like audit frequency, stricter penalties, incentives, etc.).
+
+SUPPLIER INFO:
+- Name: {supplier.name}
+- Country: {supplier.country}
+- Status: {supplier.status}
+- Risk Level: {supplier.risk_level}
+- Compliance Score: {supplier.compliance_score}
+- Last Audit: {supplier.last_audit}
+
+COMPLIANCE HISTORY (last 5 records):
+{history}
+
+REFERENCE DATA (profile of all reference suppliers & compliance records):
+{reference}
+
+Please do not mention any limitations about the dataset size or content. Limit your response to a maximum of 4000 characters, and focus on actionable insights only.
+"""
+
+    cache_key = llm_cache.cache_key(llm.model_name(), "supplier_insights", SUPPLIER_INSIGHTS_PROMPT_VERSION, {
+        "supplier": llm_cache.supplier_inputs(supplier),
+        "records": llm_cache.record_inputs(records),
+        "reference": _reference_profile().key(),
+    })
+    return supplier, prompt, cache_key
+
+
+def supplier_insights(db: Session, supplier_id: int):
+    supplier, prompt, cache_key = _supplier_insights_request(db, supplier_id)
+    insights = llm_cache.lookup(db, cache_key)
+    cached = insights is not None
+    if not cached:
+        try:
+            insights = llm.generate(prompt)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Gemini processing failed: {str(e)}")
+        llm_cache.store(db, cache_key, llm.model_name(), "supplier_insights", SUPPLIER_INSIGHTS_PROMPT_VERSION, insights, supplier_id)
+    llm_cache.commit(db)
+    return {
+        "supplier": supplier.name,
+        "insights": insights,
+        "cached": cached
+    }
+
+
+# ---------- Streaming variants ----------
+
+class PreparedAnalysis(NamedTuple):
+    template: str
+    version: int
+    cache_key: str
+    prompt: str
+    supplier_id: int
+    field: str  # key of the generated text in the response body
+    extra: dict  # other keys of the synchronous endpoint's response body
+    cached: Optional[str]  # the cached text, when there is one
+
+
+def prepare_check_compliance(db: Session, supplier_id: int) -> PreparedAnalysis:
+    supplier, prompt, cache_key = _check_compliance_request(db, supplier_id)
+    cached = llm_cache.lookup(db, cache_key)
+    llm_cache.commit(db)
+    return PreparedAnalysis(
+        "check_compliance", CHECK_COMPLIANCE_PROMPT_VERSION, cache_key, prompt, supplier_id, "analysis", {}, cached
+    )
+
+
+def prepare_supplier_insights(db: Session, supplier_id: int) -> PreparedAnalysis:
+    supplier, prompt, cache_key = _supplier_insights_request(db, supplier_id)
+    cached = llm_cache.lookup(db, cache_key)
+    llm_cache.commit(db)
+    return PreparedAnalysis(
+        "supplier_insights", SUPPLIER_INSIGHTS_PROMPT_VERSION, cache_key, prompt, supplier_id, "insights",
+        {"supplier": supplier.name}, cached
+    )
+
+
+def store_analysis(db: Session, analysis: PreparedAnalysis, text: str):
+    llm_cache.store(db, analysis.cache_key, llm.model_name(), analysis.template, analysis.version, text, analysis.supplier_id)
+    llm_cache.commit(db)
+
+
+# ---------- Supplier recommendation ----------
+
+def _recommend_prompt(supplier, records, weather, temp, distance_km, reference):
+    db_compliance_summary = "\n".join([
+        f"- {r.metric} on {r.date_recorded}: {r.result} ({r.status})"
+        for r in records
+    ]) if records else "No compliance records found."
+
+    return f"""
+You are evaluating suppliers for a procurement system.
+
+Below is a statistical profile of a REFERENCE dataset of past supplier compliance:
+{reference}
+Please do not mention any limitations about the dataset size or content. Limit your response to a maximum of 4000 characters, and focus on actionable insights only.
+
+Now evaluate this LIVE supplier:
+- Name: {supplier.name}
+- Country: {supplier.country}
+- Risk Level: {supplier.risk_level}
+- Status: {supplier.status}
+- Current Weather: {weather}, {temp}°C
+- Distance from user: {distance_km:.2f} km
+
+RECENT COMPLIANCE HISTORY:
+{db_compliance_summary}
+
+Return:
+1. Feasibility score (out of 10)
+2. Strengths & risks
+3. Should the user select them today?
+4. Recommended action (approve, monitor, avoid)
+"""
+
+async def _prepare_evaluation(supplier, coords, records, user_lat, user_lon, reference):
+    """Weather, prompt and cache key for one supplier; no database access."""
+    if isinstance(coords, Exception):
+        raise coords
+    lat, lon = coords
+    distance_km = float(spatial.haversine_km(user_lat, user_lon, lat, lon))
+
+    data = await current_weather.get(lat, lon)
+    weather = data["weather"][0]["description"]
+    temp = data["main"]["temp"]
+
+    cache_key = llm_cache.cache_key(llm.model_name(), "recommend_supplier", RECOMMEND_SUPPLIER_PROMPT_VERSION, {
+        "supplier": llm_cache.supplier_inputs(supplier),
+        "records": llm_cache.record_inputs(records),
+        "reference": _reference_profile().key(),
+        "weather": [weather, temp],
+        "distance_km": round(distance_km, 2),
+    })
+    return {
+        "supplier": supplier.name,
+        "weather": weather,
+        "temperature": temp,
+        "distance_km": round(distance_km, 2),
+        "risk_level": supplier.risk_level,
+        "status": supplier.status,
+        "prompt": _recommend_prompt(supplier, records, weather, temp, distance_km, reference),
+        "cache_key": cache_key,
+    }
+
+def _evaluation_result(prepared, recommendation, cached):
+    """recommendation is None for suppliers that were only scored locally."""
+    score = None
+    if recommendation is not None:
+        # Try to extract feasibility score using regex
+        score_match = re.search(r"(\d+(?:\.\d+)?)\s*/\s*10", recommendation)
+        score = float(score_match.group(1)) if score_match else 0
+
+    result = {k: v for k, v in prepared.items() if k not in ("prompt", "cache_key")}
+    result.update(feasibility_score=score, recommendation=recommendation, cached=cached)
+    return result
+
+def _rank_key(result):
+    if "error" in result:
+        return (0, 0, 0)
+    if result["feasibility_score"] is None:
+        return (1, 0, result["local_score"])
+    return (2, result["feasibility_score"], result["local_score"])
+
+def _score_locally(evaluated, rows) -> dict:
+    import pandas as pd
+    from . import scoring
+    frame = scoring.suppliers_frame([s for s, _ in evaluated])
+    distance = pd.Series([p["distance_km"] for _, p in evaluated], index=frame["id"])
+    adverse = pd.Series([scoring_terms.is_adverse_weather(p["weather"]) for _, p in evaluated], index=frame["id"])
+    return scoring.score(scoring.supplier_features(scoring.summary_frame(rows), frame), distance, adverse).to_dict()
+
+async def _local_scores(db: AsyncSession, evaluated) -> dict:
+    """
+    Local 0-10 score per supplier id from its full history, distance and current weather. The
+    history is aggregated in the database; the pandas work runs in the threadpool.
+    """
+    if not evaluated:
+        return {}
+    query = scoring_terms.record_summary_query([s.id for s, _ in evaluated])
+    rows = (await db.execute(query)).all()
+    return await run_in_threadpool(_score_locally, evaluated, rows)
+
+def _evaluation_error(supplier, error):
+    if isinstance(error, asyncio.TimeoutError):
+        detail = f"timed out after {settings.recommend_supplier_timeout}s"
+    else:
+        detail = error.detail if isinstance(error, HTTPException) else str(error)
+    return {
+        "supplier": supplier.name,
+        "error": f"Failed to evaluate: {detail}"
+    }
+
+def _known_coordinates(db: Session, suppliers):
+    """Stored lat/lon, then the geocode cache; returns (coords, {place key: (place, [suppliers])})."""
+    coords, missing = {}, {}
+    for s in suppliers:
+        if s.latitude is not None and s.longitude is not None:
+            coords[s.id] = (s.latitude, s.longitude)
+            continue
+        place = geocoding.supplier_place(s)
+        cached = geocoding.lookup(db, place)
+        if cached is not None:
+            coords[s.id] = cached
+            s.latitude, s.longitude = cached
+        else:
+            missing.setdefault(geocoding.normalize_place(place), (place, []))[1].append(s)
+    return coords, missing
+
+def _remember_coordinates(db: Session, coords, missing, fetched):
+    for (place, group), result in zip(missing.values(), fetched):
+        if not isinstance(result, Exception):
+            geocoding.remember(db, place, *result)
+        for s in group:
+            coords[s.id] = result
+            if not isinstance(result, Exception):
+                s.latitude, s.longitude = result
+    if db.dirty or db.new:
+        geocoding.commit_quietly(db)
+
+async def _resolve_supplier_coordinates(db: AsyncSession, suppliers):
+    """
+    Coordinates per supplier id: stored lat/lon first, then the geocode cache, and one
+    concurrent geo API call per distinct unknown place. New results are written back
+    to the suppliers and the cache in a single commit. Failed lookups map to the exception.
+    """
+    coords, missing = await db.run_sync(_known_coordinates, suppliers)
+    fetched = []
+    if missing:
+        fetched = await asyncio.gather(
+            *(geocoding.fetch_coordinates_async(place) for place, _ in missing.values()),
+            return_exceptions=True,
+        )
+    await db.run_sync(_remember_coordinates, coords, missing, fetched)
+    return coords
+
+def _store_recommendations(db: Session, pending, generated):
+    for (supplier, prepared), recommendation in zip(pending, generated):
+        if not isinstance(recommendation, Exception):
+            llm_cache.store(
+                db, prepared["cache_key"], llm.model_name(), "recommend_supplier",
+                RECOMMEND_SUPPLIER_PROMPT_VERSION, recommendation, supplier.id
+            )
+    llm_cache.commit(db)
+
+async def _nearby_suppliers(db: AsyncSession, suppliers, user_lat, user_lon, k, within_km):
+    await db.run_sync(spatial.index.ensure_loaded)
+    if k is not None:
+        found = spatial.index.nearest(user_lat, user_lon, k, within_km=within_km)
+    else:
+        found = spatial.index.within(user_lat, user_lon, within_km)
+    keep = {supplier_id for supplier_id, _ in found}
+    return [s for s in suppliers if s.id in keep]
+
+async def recommend_supplier(db: AsyncSession, user_lat: float, user_lon: float, k: int = None, within_km: float = None):
+    """k / within_km limit the evaluation to the nearest suppliers."""
+    suppliers = (await db.execute(select(models.Supplier))).scalars().all()
+
+    try:
+        reference = _reference_profile().render()
+    except Exception:
+        raise HTTPException(status_code=500, detail="Static compliance dataset not found in /uploads.")
+
+    coords_by_supplier = await _resolve_supplier_coordinates(db, suppliers)
+    if k is not None or within_km is not None:
+        suppliers = await _nearby_suppliers(db, suppliers, user_lat, user_lon, k, within_km)
+
+    # Load recent history for every supplier up front, in one query.
+    records_by_supplier = await crud_async.get_latest_records_by_supplier(db, [s.id for s in suppliers], 5)
+
+    # An AsyncSession must not be used by concurrent tasks, so the work is staged: weather for
+    # every supplier concurrently, one cache lookup for all of them, Gemini concurrently for
+    # the misses, then one commit. Each supplier keeps a single deadline across the stages.
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.recommend_supplier_timeout
+
+    def remaining():
+        return max(deadline - loop.time(), 0)
+
+    prepared = await asyncio.gather(*(
+        asyncio.wait_for(
+            _prepare_evaluation(
+                s, coords_by_supplier[s.id], records_by_supplier[s.id], user_lat, user_lon, reference
+            ),
+            timeout=remaining(),
+        )
+        for s in suppliers
+    ), return_exceptions=True)
+
+    # Pre-rank with the local scoring engine; only the top-K candidates go to Gemini.
+    evaluated = [(s, p) for s, p in zip(suppliers, prepared) if isinstance(p, dict)]
+    local_scores = await _local_scores(db, evaluated)
+    for s, p in evaluated:
+        p["local_score"] = local_scores[s.id]
+    evaluated.sort(key=lambda sp: sp[1]["local_score"], reverse=True)
+    if settings.recommend_top_k > 0:
+        evaluated = evaluated[:settings.recommend_top_k]
+    shortlisted = {s.id for s, _ in evaluated}
+
+    cached = await db.run_sync(llm_cache.lookup_many, [p["cache_key"] for _, p in evaluated])
+    pending = [(s, p) for s, p in evaluated if p["cache_key"] not in cached]
+    generated = await asyncio.gather(*(
+        asyncio.wait_for(llm.agenerate(p["prompt"]), timeout=remaining()) for _, p in pending
+    ), return_exceptions=True)
+
+    fresh = {supplier.id: recommendation for (supplier, _), recommendation in zip(pending, generated)}
+
+    results = []
+    for supplier, p in zip(suppliers, prepared):
+        if isinstance(p, Exception):
+            results.append(_evaluation_error(supplier, p))
+        elif supplier.id not in shortlisted:
+            results.append(_evaluation_result(p, None, False))
+        elif p["cache_key"] in cached:
+            results.append(_evaluation_result(p, cached[p["cache_key"]], True))
+        elif isinstance(fresh[supplier.id], resilience.UpstreamUnavailable):
+            # Gemini is down (circuit open): keep the local score rather than an error.
+            results.append(_evaluation_result(p, None, False))
+        elif isinstance(fresh[supplier.id], Exception):
+            results.append(_evaluation_error(supplier, fresh[supplier.id]))
+        else:
+            results.append(_evaluation_result(p, fresh[supplier.id], False))
+
+    # Stored last: a commit that loses a race to another worker rolls back and expires the
+    # suppliers read above.
+    await db.run_sync(_store_recommendations, pending, generated)
+
+    # Rank by feasibility score, then suppliers only scored locally; failed evaluations go last.
+    suggestions = sorted(results, key=_rank_key, reverse=True)
+    best_supplier_data = next((r for r in suggestions if "error" not in r), None)
+
+    return {
+        "results": suggestions,
+        "best_supplier": best_supplier_data
+    }
@@ -1,10 +1,20 @@
+import asyncio
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple, Optional
 from fastapi import APIRouter, HTTPException, Depends, status
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
+from sqlalchemy import exists, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from passlib.context import CryptContext
 from jose import JWTError, jwt
-from . import models, schemas, database
+from . import models, schemas, database, crud
+from .config import settings
 
 # JWT Config
 SECRET_KEY = "THIS_IS_A_SECRET"
@@ -24,12 +34,42 @@ def verify_password(plain_password, hashed_password):
 def hash_password(password):
     return pwd_context.hash(password)
 
+# bcrypt is deliberately slow (~250 ms of CPU). It runs on a small dedicated pool so logins
+# never occupy the event loop or the request threadpool, and once auth_hash_max_pending
+# hashes are queued further logins are refused with 503 instead of piling up.
+_hash_executor = ThreadPoolExecutor(max_workers=settings.auth_hash_workers, thread_name_prefix="bcrypt")
+_hash_pending = 0
+
+async def _run_hash(fn, *args):
+    global _hash_pending
+    if _hash_pending >= settings.auth_hash_max_pending:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many concurrent logins, please retry",
+            headers={"Retry-After": "1"},
+        )
+    _hash_pending += 1
+    try:
+        return await asyncio.wrap_future(_hash_executor.submit(fn, *args))
+    finally:
+        _hash_pending -= 1
+
+async def averify_password(plain_password, hashed_password):
+    return await _run_hash(verify_password, plain_password, hashed_password)
+
+async def ahash_password(password):
+    return await _run_hash(hash_password, password)
+
+def shutdown():
+    _hash_executor.shutdown(wait=False)
+
 # ---------- JWT utils ----------
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=15))
     to_encode.update({"exp": expire})
+    to_encode.setdefault("jti", uuid.uuid4().hex)
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 def decode_access_token(token: str):
@@ -39,13 +79,82 @@ def decode_access_token(token: str):
     except JWTError:
         return None
 
+# ---------- Principal cache ----------
+
+class Principal(NamedTuple):
+    id: int
+    email: str
+    full_name: Optional[str]
+    jti: Optional[str]
+    expires_at: datetime
+
+class _PrincipalCache:
+    """
+    Resolved principals by bearer token for a short TTL (never past the token's expiry), so
+    repeat requests skip the JWT decode and the user query. Revocations evict locally right
+    away; other workers pick them up when their entry expires.
+    """
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str):
+        with self._lock:
+            entry = self._data.get(token)
+            if entry is None:
+                return None
+            principal, expires = entry
+            if expires <= time.monotonic():
+                del self._data[token]
+                return None
+            self._data.move_to_end(token)
+            return principal
+
+    def put(self, token: str, principal: Principal):
+        ttl = min(self.ttl, (principal.expires_at - datetime.utcnow()).total_seconds())
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[token] = (principal, time.monotonic() + ttl)
+            self._data.move_to_end(token)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def discard(self, jti: str = None, user_id: int = None):
+        with self._lock:
+            for token, (principal, _) in list(self._data.items()):
+                if (jti is not None and principal.jti == jti) or (user_id is not None and principal.id == user_id):
+                    del self._data[token]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+principal_cache = _PrincipalCache(settings.auth_principal_cache_size, settings.auth_principal_cache_ttl_seconds)
+
+def revoke_token(db: Session, jti: str, user_id: int, expires_at: datetime):
+    """Record a revoked token (caller commits) and drop it from this worker's cache."""
+    db.query(models.RevokedToken).filter(
+        models.RevokedToken.expires_at < datetime.utcnow()
+    ).delete(synchronize_session=False)
+    db.merge(models.RevokedToken(jti=jti, user_id=user_id, expires_at=expires_at))
+    principal_cache.discard(jti=jti)
+
+def revoke_user(user_id: int):
+    """Forget cached principals of a user, e.g. after a password change or deletion."""
+    principal_cache.discard(user_id=user_id)
+
 
 # ---------- Auth routes ----------
 
 @router.post("/token")
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(database.get_db)):
-    user = db.query(models.User).filter(models.User.email == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(database.get_async_db)):
+    user = (await db.execute(
+        select(models.User).filter(models.User.email == form_data.username)
+    )).scalars().first()
+    if not user or not await averify_password(form_data.password, user.hashed_password):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     token_data = {"sub": str(user.id)}
     access_token = create_access_token(token_data, timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
@@ -64,22 +173,22 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
 from fastapi import Body
 
 @router.post("/signup", status_code=201)
-def signup(
+async def signup(
     email: str = Body(...),
     password: str = Body(...),
     full_name: str = Body(None),
-    db: Session = Depends(database.get_db)
+    db: AsyncSession = Depends(database.get_async_db)
 ):
     # Check if user already exists
-    existing_user = db.query(models.User).filter(models.User.email == email).first()
+    existing_user = (await db.execute(select(models.User).filter(models.User.email == email))).scalars().first()
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     # Create new user
-    hashed_password = hash_password(password)
+    hashed_password = await ahash_password(password)
     new_user = models.User(email=email, hashed_password=hashed_password, full_name=full_name)
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     # Return token on signup
     token_data = {"sub": str(new_user.id)}
     access_token = create_access_token(token_data, timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
@@ -95,49 +204,73 @@ def signup(
 
 # ---------- Protected route dependency ----------
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(database.get_async_db)):
+    principal = principal_cache.get(token)
+    if principal is not None:
+        return principal
+
     payload = decode_access_token(token)
     if not payload:
         raise HTTPException(status_code=401, detail="Invalid token")
 
     user_id = payload.get("sub")
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    if not user:
+    jti = payload.get("jti")
+    # One query for the user and the revocation check; tokens issued before jti existed can't be revoked.
+    query = select(models.User)
+    if jti:
+        query = select(models.User, exists().where(models.RevokedToken.jti == jti).label("revoked"))
+    row = (await db.execute(query.filter(models.User.id == int(user_id)))).first()
+    if not row:
         raise HTTPException(status_code=404, detail="User not found")
-    return user
+    if jti and row.revoked:
+        raise HTTPException(status_code=401, detail="Token has been revoked")
+    user = row[0]
+    principal = Principal(user.id, user.email, user.full_name, jti, datetime.utcfromtimestamp(payload["exp"]))
+    principal_cache.put(token, principal)
+    return principal
+
+@router.post("/logout", status_code=204)
+async def logout(user: Principal = Depends(get_current_user), db: AsyncSession = Depends(database.get_async_db)):
+    if user.jti:
+        await db.run_sync(revoke_token, user.jti, user.id, user.expires_at)
+        await db.commit()
+    principal_cache.discard(jti=user.jti)
 
 @router.get("/dashboard-data")
-def get_dashboard_data(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
-    payload = decode_access_token(token)
-    if not payload:
-        raise HTTPException(status_code=401, detail="Invalid token")
-    user_id = int(payload.get("sub"))
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+async def get_dashboard_data(user: Principal = Depends(get_current_user), db: AsyncSession = Depends(database.get_async_db)):
+    # The same AsyncSession get_current_user used (FastAPI resolves a dependency once per request).
+    return await db.run_sync(_dashboard_data, user.id)
 
-    # Supplier and compliance stats for this user
-    suppliers = db.query(models.Supplier).filter(models.Supplier.user_id == user_id).all()
-    supplier_count = len(suppliers)
-    compliance_count = db.query(models.ComplianceRecord).join(models.Supplier).filter(models.Supplier.user_id == user_id).count()
-    recent_suppliers = [
-        {"name": s.name, "country": s.country, "last_audit": str(s.last_audit) if s.last_audit else None}
-        for s in suppliers[-5:]
-    ]
-    recent_compliance = db.query(models.ComplianceRecord).join(models.Supplier).filter(models.Supplier.user_id == user_id).order_by(models.ComplianceRecord.date_recorded.desc()).limit(5).all()
-    recent_compliance_list = [
-        {
-            "supplier": db.query(models.Supplier).filter(models.Supplier.id == c.supplier_id).first().name,
-            "metric": c.metric,
-            "date_recorded": str(c.date_recorded),
-            "result": c.result,
-            "status": c.status
-        }
-        for c in recent_compliance
-    ]
+def _dashboard_data(db: Session, user_id: int):
+    # Counters come from the per-user summary row; recent items are two bounded queries.
+    summary = crud.get_user_summary(db, user_id)
+    recent_suppliers = db.query(
+        models.Supplier.name, models.Supplier.country, models.Supplier.last_audit
+    ).filter(models.Supplier.user_id == user_id).order_by(models.Supplier.id.desc()).limit(5).all()
+    recent_compliance = db.query(
+        models.Supplier.name,
+        models.ComplianceRecord.metric,
+        models.ComplianceRecord.date_recorded,
+        models.ComplianceRecord.result,
+        models.ComplianceRecord.status,
+    ).join(models.Supplier).filter(models.Supplier.user_id == user_id).order_by(
+        models.ComplianceRecord.date_recorded.desc()
+    ).limit(5).all()
     return {
-        "suppliers": supplier_count,
-        "compliance_records": compliance_count,
-        "recent_suppliers": recent_suppliers,
-        "recent_compliance": recent_compliance_list
-    }
\ No newline at end of file
+        "suppliers": summary.supplier_count,
+        "compliance_records": summary.record_count,
+        "recent_suppliers": [
+            {"name": s.name, "country": s.country, "last_audit": str(s.last_audit) if s.last_audit else None}
+            for s in reversed(recent_suppliers)
+        ],
+        "recent_compliance": [
+            {
+                "supplier": c.name,
+                "metric": c.metric,
+                "date_recorded": str(c.date_recorded),
+                "result": c.result,
+                "status": c.status
+            }
+            for c in recent_compliance
+        ]
+    }
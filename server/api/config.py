@@ -1,12 +1,87 @@
+import logging
 from pydantic_settings import BaseSettings  
 
 class Settings(BaseSettings):
     database_url: str
     gemini_api_key: str
+    # Comma-separated read-only replicas; GET requests read from them (see database.RoutingSession).
+    database_replica_urls: str = ""
+    db_echo: bool = False  # logs every statement; for local debugging only, see db_slow_query_ms
+    db_slow_query_ms: float = 500  # log statements slower than this to "api.slow_query"; 0 disables
+    log_level: str = "INFO"
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30
+    db_pool_recycle: int = 1800  # seconds; -1 disables
+    db_pool_pre_ping: bool = True
+    db_statement_timeout_ms: int = 0  # PostgreSQL only; 0 disables
     openweather_api_key: str = ""
+    openweather_base_url: str = "https://api.openweathermap.org"
+    gemini_api_endpoint: str = ""  # Gemini REST API base URL; empty for Google's
+    # Upstream providers (see providers.py): weather "openweather" | "fake",
+    # LLM "gemini" | "gemini-sdk" | "fake". The bulk ones serve background jobs and default
+    # to the interactive ones.
+    weather_provider: str = "openweather"
+    llm_provider: str = "gemini"
+    llm_model: str = "models/gemini-1.5-flash"
+    llm_bulk_provider: str = ""
+    llm_bulk_model: str = ""
+    llm_timeout_seconds: float = 120
+    upstream_http2: bool = True  # needs the h2 package; HTTP/1.1 keep-alive otherwise
+    upstream_timeout_seconds: float = 10
+    upstream_keepalive_seconds: float = 60
+    # Resilience (see resilience.py). Retries back off exponentially with full jitter;
+    # a circuit opens after circuit_failure_threshold consecutive failures (0 never opens).
+    openweather_timeout_seconds: float = 5
+    openweather_retries: int = 2
+    openweather_hedge_after_ms: float = 0  # resend weather GETs slower than this, e.g. their p95; 0 disables
+    gemini_retries: int = 1
+    upstream_backoff_base_seconds: float = 0.2
+    upstream_backoff_max_seconds: float = 2
+    circuit_failure_threshold: int = 5
+    circuit_reset_seconds: float = 30
     secret_key: str = "THIS_IS_A_SECRET"
+    reference_cache_dir: str = "uploads/.cache"
+    reference_profile_max_tokens: int = 500  # size of the reference-data section of Gemini prompts
+    openweather_concurrency: int = 10
+    gemini_concurrency: int = 5
+    recommend_supplier_timeout: float = 30.0
+    recommend_top_k: int = 5  # suppliers sent to Gemini after local scoring; 0 sends all
+    geocode_lru_size: int = 2048
+    weather_cache_ttl_seconds: float = 600
+    spatial_cell_degrees: float = 1.0  # grid cell size of the supplier spatial index
+    spatial_index_refresh_seconds: float = 300
+    weather_cache_precision: int = 2  # decimal places of lat/lon, ~1 km
+    weather_cache_max_entries: int = 10000
+    weather_history_days: int = 7
+    weather_history_max_days: int = 30
+    llm_cache_max_bytes: int = 50 * 1024 * 1024
+    llm_cache_touch_seconds: float = 300  # a hit records last_used_at / hits at most this often per entry
+    llm_cache_size_sync_seconds: float = 60  # how long the in-process cache size estimate is trusted
+    # Serve /suppliers/{id}/metrics charts from compliance_monthly_rollup (the range then starts
+    # at a month boundary). Run crud.rebuild_monthly_rollup once before enabling on a database
+    # with existing records.
+    metrics_use_rollup: bool = False
+    auth_principal_cache_ttl_seconds: float = 60  # also the longest a revocation takes to reach other workers
+    auth_principal_cache_size: int = 10000
+    auth_hash_workers: int = 2  # threads running bcrypt; each one keeps a core busy
+    auth_hash_max_pending: int = 32  # queued + running hashes before logins get 503
+    job_workers: int = 2  # in-process job workers; 0 when jobs run in `python -m api.jobs`
+    job_poll_interval_seconds: float = 1.0
+    job_timeout_seconds: float = 300
+    job_max_attempts: int = 3  # runs a job gets before a lost worker fails it instead of requeueing
+    job_result_ttl_seconds: int = 3600
+    job_max_wait_seconds: float = 60  # longest GET /jobs/{id}?wait= long-poll
+    import_chunk_size: int = 1000
+    import_max_reported_errors: int = 1000
 
     class Config:
         env_file = ".env"
 
 settings = Settings()
+
+
+def configure_logging():
+    """Process-wide logging, set up by the entrypoints (the app's lifespan, python -m api.jobs)."""
+    logging.basicConfig(level=settings.log_level, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    logging.getLogger("httpx").setLevel(logging.WARNING)  # its request log includes the OpenWeather appid
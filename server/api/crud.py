@@ -1,32 +1,262 @@
-from datetime import datetime
+import logging
+from datetime import date, datetime
+from fastapi import HTTPException
+from sqlalchemy import DateTime, extract, func, insert, literal, select, true, tuple_, update
 from sqlalchemy.orm import Session
-from . import models, schemas
+from . import models, schemas, llm_cache, pagination
+from .config import settings
 
-def get_suppliers(db: Session, user_id: int, skip: int = 0, limit: int = 100):
-    return db.query(models.Supplier).filter(models.Supplier.user_id == user_id).offset(skip).limit(limit).all()
+logger = logging.getLogger(__name__)
+
+# ---------- Per-user summary counters ----------
+
+def _user_summary_counts(user_id: int, now=None):
+    """SELECT user_id, supplier_count, record_count, last_activity counted by the database."""
+    supplier_count = select(func.count(models.Supplier.id)).where(models.Supplier.user_id == user_id)
+    record_count = select(func.count(models.ComplianceRecord.id)).join(models.Supplier).where(
+        models.Supplier.user_id == user_id
+    )
+    # WHERE true lets SQLite parse the ON CONFLICT clause that follows an INSERT ... SELECT.
+    return select(
+        literal(user_id), supplier_count.scalar_subquery(), record_count.scalar_subquery(),
+        literal(now, DateTime),
+    ).where(true())
+
+def _insert_user_summary(db: Session, user_id: int, suppliers: int = 0, records: int = 0, now=None):
+    """
+    Insert a summary row counted by the INSERT ... SELECT itself, so the counts always come
+    from the primary (and include writes pending in this session). When another transaction
+    inserted the row first, keep theirs and apply this write's deltas to it (now=None for a
+    read that adds nothing).
+    """
+    table = models.UserSummary.__table__
+    columns = ["user_id", "supplier_count", "record_count", "last_activity"]
+    dialect = db.get_bind().dialect.name
+    if dialect not in ("postgresql", "sqlite"):
+        db.execute(insert(table).from_select(columns, _user_summary_counts(user_id, now)))
+        return
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    stmt = dialect_insert(table).from_select(columns, _user_summary_counts(user_id, now))
+    if now is None:
+        stmt = stmt.on_conflict_do_nothing(index_elements=[table.c.user_id])
+    else:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id],
+            set_={
+                "supplier_count": table.c.supplier_count + suppliers,
+                "record_count": table.c.record_count + records,
+                "last_activity": now,
+            },
+        )
+    db.execute(stmt)
+
+def bump_user_summary(db: Session, user_id: int, suppliers: int = 0, records: int = 0):
+    """Apply counter deltas for a write staged in this session; the caller commits."""
+    if user_id is None:
+        return
+    now = datetime.utcnow()
+    updated = db.query(models.UserSummary).filter(models.UserSummary.user_id == user_id).update({
+        models.UserSummary.supplier_count: models.UserSummary.supplier_count + suppliers,
+        models.UserSummary.record_count: models.UserSummary.record_count + records,
+        models.UserSummary.last_activity: now,
+    }, synchronize_session=False)
+    if not updated:
+        # First write since the table existed: count from scratch, including the pending write.
+        db.flush()
+        _insert_user_summary(db, user_id, suppliers, records, now)
+
+def get_user_summary(db: Session, user_id: int):
+    summary = db.get(models.UserSummary, user_id)
+    if summary is None:
+        # The read may have gone to a lagging replica; the insert counts on the primary.
+        _insert_user_summary(db, user_id)
+        db.commit()
+        summary = db.get(models.UserSummary, user_id)
+    return summary
+
+def apply_record_bookkeeping(db: Session, deltas: dict, supplier_ids, owners: dict, added: dict = None):
+    """
+    Derived-state updates for a set of compliance record writes staged in this session:
+    monthly rollup deltas, LLM cache invalidation and per-user counters (`added` maps
+    owner user_id -> net records added; owners maps supplier_id -> user_id).
+    """
+    added = added or {}
+    apply_rollup_deltas(db, deltas)
+    llm_cache.invalidate_suppliers(db, supplier_ids)
+    for owner in {owners[sid] for sid in supplier_ids if sid in owners}:
+        bump_user_summary(db, owner, records=added.get(owner, 0))
+
+def _supplier_owner(db: Session, supplier_id: int):
+    return db.query(models.Supplier.user_id).filter(models.Supplier.id == supplier_id).scalar()
+
+# ---------- Monthly compliance rollup ----------
+
+def _rollup_key(supplier_id, metric, day):
+    if isinstance(day, str):
+        day = date.fromisoformat(day)
+    return supplier_id, metric, day.replace(day=1)
+
+def add_rollup_delta(deltas: dict, supplier_id, metric, day, result, sign: int = 1):
+    """Accumulate one record's contribution (sign=-1 to remove it) into a deltas dict."""
+    key = _rollup_key(supplier_id, metric, day)
+    counts = deltas.setdefault(key, [0, 0, 0.0])
+    counts[0] += sign
+    if result is not None:
+        counts[1] += sign
+        counts[2] += sign * float(result)
+
+def apply_rollup_deltas(db: Session, deltas: dict):
+    """Upsert accumulated deltas into compliance_monthly_rollup; the caller commits."""
+    rows = [
+        {"supplier_id": sid, "metric": metric, "month": month,
+         "record_count": c[0], "value_count": c[1], "value_sum": c[2]}
+        for (sid, metric, month), c in deltas.items() if any(c)
+    ]
+    if not rows:
+        return
+    table = models.ComplianceMonthlyRollup.__table__
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(table).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.supplier_id, table.c.metric, table.c.month],
+            set_={
+                "record_count": table.c.record_count + stmt.excluded.record_count,
+                "value_count": table.c.value_count + stmt.excluded.value_count,
+                "value_sum": table.c.value_sum + stmt.excluded.value_sum,
+            },
+        )
+        db.execute(stmt)
+        return
+    for row in rows:
+        updated = db.query(models.ComplianceMonthlyRollup).filter_by(
+            supplier_id=row["supplier_id"], metric=row["metric"], month=row["month"]
+        ).update({
+            models.ComplianceMonthlyRollup.record_count: models.ComplianceMonthlyRollup.record_count + row["record_count"],
+            models.ComplianceMonthlyRollup.value_count: models.ComplianceMonthlyRollup.value_count + row["value_count"],
+            models.ComplianceMonthlyRollup.value_sum: models.ComplianceMonthlyRollup.value_sum + row["value_sum"],
+        }, synchronize_session=False)
+        if not updated:
+            db.add(models.ComplianceMonthlyRollup(**row))
+
+def _rollup_record(db: Session, supplier_id, metric, day, result, sign: int = 1):
+    deltas = {}
+    add_rollup_delta(deltas, supplier_id, metric, day, result, sign)
+    apply_rollup_deltas(db, deltas)
+
+def rebuild_monthly_rollup(db: Session, supplier_id: int = None):
+    """Recompute the rollup from raw records, for all suppliers or one."""
+    year = extract('year', models.ComplianceRecord.date_recorded)
+    month = extract('month', models.ComplianceRecord.date_recorded)
+    query = db.query(
+        models.ComplianceRecord.supplier_id,
+        models.ComplianceRecord.metric,
+        year, month,
+        func.count(models.ComplianceRecord.id),
+        func.count(models.ComplianceRecord.result),
+        func.coalesce(func.sum(models.ComplianceRecord.result), 0),
+    )
+    existing = db.query(models.ComplianceMonthlyRollup)
+    if supplier_id is not None:
+        query = query.filter(models.ComplianceRecord.supplier_id == supplier_id)
+        existing = existing.filter(models.ComplianceMonthlyRollup.supplier_id == supplier_id)
+    existing.delete(synchronize_session=False)
+    db.add_all([
+        models.ComplianceMonthlyRollup(
+            supplier_id=sid, metric=metric, month=date(int(y), int(m), 1),
+            record_count=n, value_count=n_values, value_sum=float(total),
+        )
+        for sid, metric, y, m, n, n_values, total in query.group_by(
+            models.ComplianceRecord.supplier_id, models.ComplianceRecord.metric, year, month
+        )
+    ])
+    db.commit()
+
+def get_monthly_averages(db: Session, supplier_id: int, start_date: date = None):
+    """[("YYYY-MM", avg result or None)] for a supplier, oldest month first."""
+    if settings.metrics_use_rollup:
+        rollup = models.ComplianceMonthlyRollup
+        query = db.query(
+            rollup.month, func.sum(rollup.value_sum), func.sum(rollup.value_count)
+        ).filter(rollup.supplier_id == supplier_id)
+        if start_date is not None:
+            query = query.filter(rollup.month >= start_date.replace(day=1))
+        rows = query.group_by(rollup.month).having(func.sum(rollup.record_count) > 0).order_by(rollup.month).all()
+        return [(m.strftime('%Y-%m'), total / n if n else None) for m, total, n in rows]
+
+    year = extract('year', models.ComplianceRecord.date_recorded)
+    month = extract('month', models.ComplianceRecord.date_recorded)
+    query = db.query(year, month, func.avg(models.ComplianceRecord.result)).filter(
+        models.ComplianceRecord.supplier_id == supplier_id
+    )
+    if start_date is not None:
+        query = query.filter(models.ComplianceRecord.date_recorded >= start_date)
+    rows = query.group_by(year, month).order_by(year, month).all()
+    return [(f"{int(y):04d}-{int(m):02d}", avg) for y, m, avg in rows]
+
+def get_recent_records(db: Session, supplier_id: int, start_date: date = None, limit: int = 10):
+    query = db.query(models.ComplianceRecord).filter(models.ComplianceRecord.supplier_id == supplier_id)
+    if start_date is not None:
+        query = query.filter(models.ComplianceRecord.date_recorded >= start_date)
+    return query.order_by(models.ComplianceRecord.date_recorded.desc(), models.ComplianceRecord.id.desc()).limit(limit).all()
+
+def get_suppliers(db: Session, user_id: int, skip: int = 0, limit: int = 100, cursor: str = None):
+    """One page of a user's suppliers ordered by id; returns (suppliers, next_cursor)."""
+    query = db.query(models.Supplier).filter(models.Supplier.user_id == user_id)
+    if cursor:
+        try:
+            after_id = int(pagination.decode_cursor(cursor)["id"])
+        except (KeyError, TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.filter(models.Supplier.id > after_id)
+    query = query.order_by(models.Supplier.id)
+    if skip and not cursor:
+        query = query.offset(skip)  # legacy offset paging
+    suppliers = query.limit(limit + 1).all()
+    next_cursor = pagination.encode_cursor({"id": suppliers[limit - 1].id}) if len(suppliers) > limit else None
+    return suppliers[:limit], next_cursor
 
 def get_supplier_by_id(db: Session, supplier_id: int):
     return db.query(models.Supplier).filter(models.Supplier.id == supplier_id).first()
 
-def create_supplier(db: Session, supplier_in: schemas.SupplierCreate, user_id: int):
+def create_supplier(db: Session, supplier_in: schemas.SupplierCreate, user_id: int, coordinates):
+    """
+    coordinates: (lat, lon) resolved by the caller before this transaction, so no upstream call
+    runs while it holds a connection; (None, None) leaves them to the next weather lookup.
+    """
     try:
         db_obj = models.Supplier(**supplier_in.dict(), user_id=user_id)
+        db_obj.latitude, db_obj.longitude = coordinates
         db.add(db_obj)
+        bump_user_summary(db, user_id, suppliers=1)
         db.commit()
         db.refresh(db_obj)
-        print("Supplier inserted successfully:", db_obj)
+        logger.debug("Supplier %s inserted", db_obj.id)
         return db_obj
     except Exception as e:
         db.rollback()
-        print("Error inserting supplier:", e)
+        logger.warning("Error inserting supplier: %s", e)
         raise
 
-def update_supplier(db: Session, supplier_id: int, supplier_in: schemas.SupplierUpdate):
+def update_supplier(db: Session, supplier_id: int, supplier_in: schemas.SupplierUpdate, coordinates=(None, None)):
+    """coordinates: (lat, lon) of the new city/country, resolved by the caller as for create_supplier."""
     db_obj = get_supplier_by_id(db, supplier_id)
     if not db_obj:
         return None
-    for key, value in supplier_in.dict(exclude_unset=True).items():
+    changes = supplier_in.dict(exclude_unset=True)
+    for key, value in changes.items():
         setattr(db_obj, key, value)
+    if "city" in changes or "country" in changes:
+        db_obj.latitude, db_obj.longitude = coordinates
+    llm_cache.invalidate_supplier(db, supplier_id)
+    bump_user_summary(db, db_obj.user_id)
     db.commit()
     db.refresh(db_obj)
     return db_obj
@@ -35,7 +265,12 @@ def delete_supplier(db: Session, supplier_id: int):
     db_obj = get_supplier_by_id(db, supplier_id)
     if not db_obj:
         return None
+    llm_cache.invalidate_supplier(db, supplier_id)
+    db.query(models.ComplianceMonthlyRollup).filter(
+        models.ComplianceMonthlyRollup.supplier_id == supplier_id
+    ).delete(synchronize_session=False)
     db.delete(db_obj)
+    bump_user_summary(db, db_obj.user_id, suppliers=-1)
     db.commit()
     return db_obj
 
@@ -44,12 +279,71 @@ def delete_supplier(db: Session, supplier_id: int):
 def get_records_by_supplier(db: Session, supplier_id: int):
     return db.query(models.ComplianceRecord).filter(models.ComplianceRecord.supplier_id == supplier_id).all()
 
-def get_all_records(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.ComplianceRecord).offset(skip).limit(limit).all()
+def get_latest_records_by_supplier(db: Session, supplier_ids, n: int = 5):
+    """
+    The n most recent records (by date_recorded) for each supplier, in one query.
+    Returns {supplier_id: [records oldest -> newest]} with an entry for every requested id.
+    """
+    supplier_ids = list(supplier_ids)
+    latest = {sid: [] for sid in supplier_ids}
+    if not supplier_ids:
+        return latest
+    rn = func.row_number().over(
+        partition_by=models.ComplianceRecord.supplier_id,
+        order_by=(models.ComplianceRecord.date_recorded.desc(), models.ComplianceRecord.id.desc()),
+    ).label("rn")
+    ranked = db.query(models.ComplianceRecord.id, rn).filter(
+        models.ComplianceRecord.supplier_id.in_(supplier_ids)
+    ).subquery()
+    records = db.query(models.ComplianceRecord).join(ranked, models.ComplianceRecord.id == ranked.c.id).filter(
+        ranked.c.rn <= n
+    ).order_by(
+        models.ComplianceRecord.supplier_id, models.ComplianceRecord.date_recorded, models.ComplianceRecord.id
+    ).all()
+    for r in records:
+        latest[r.supplier_id].append(r)
+    return latest
+
+def get_all_records(
+    db: Session, skip: int = 0, limit: int = 100, cursor: str = None, supplier_id: int = None,
+    metric: str = None, status: str = None, date_from: date = None, date_to: date = None,
+):
+    """One page of records, newest first by (date_recorded, id); returns (records, next_cursor)."""
+    record = models.ComplianceRecord
+    query = db.query(record)
+    if supplier_id is not None:
+        query = query.filter(record.supplier_id == supplier_id)
+    if metric is not None:
+        query = query.filter(record.metric == metric)
+    if status is not None:
+        query = query.filter(record.status == status)
+    if date_from is not None:
+        query = query.filter(record.date_recorded >= date_from)
+    if date_to is not None:
+        query = query.filter(record.date_recorded <= date_to)
+    if cursor:
+        values = pagination.decode_cursor(cursor)
+        try:
+            after = (date.fromisoformat(values["date"]), int(values["id"]))
+        except (KeyError, TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.filter(tuple_(record.date_recorded, record.id) < tuple_(*after))
+    query = query.order_by(record.date_recorded.desc(), record.id.desc())
+    if skip and not cursor:
+        query = query.offset(skip)  # legacy offset paging
+    records = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(records) > limit:
+        last = records[limit - 1]
+        next_cursor = pagination.encode_cursor({"date": last.date_recorded.isoformat(), "id": last.id})
+    return records[:limit], next_cursor
 
 def create_compliance_record(db: Session, record_in: schemas.ComplianceRecordCreate):
     db_obj = models.ComplianceRecord(**record_in.dict())
     db.add(db_obj)
+    _rollup_record(db, db_obj.supplier_id, db_obj.metric, db_obj.date_recorded, db_obj.result)
+    llm_cache.invalidate_supplier(db, db_obj.supplier_id)
+    bump_user_summary(db, _supplier_owner(db, db_obj.supplier_id), records=1)
     db.commit()
     db.refresh(db_obj)
     return db_obj
@@ -58,7 +352,10 @@ def delete_compliance_record(db: Session, record_id: int):
     db_obj = db.query(models.ComplianceRecord).filter(models.ComplianceRecord.id == record_id).first()
     if not db_obj:
         return None
+    llm_cache.invalidate_supplier(db, db_obj.supplier_id)
+    _rollup_record(db, db_obj.supplier_id, db_obj.metric, db_obj.date_recorded, db_obj.result, sign=-1)
     db.delete(db_obj)
+    bump_user_summary(db, _supplier_owner(db, db_obj.supplier_id), records=-1)
     db.commit()
     return db_obj
 
@@ -66,13 +363,22 @@ def update_compliance_record(db: Session, record_id: int, record_in: schemas.Com
     record = db.query(models.ComplianceRecord).filter(models.ComplianceRecord.id == record_id).first()
     if not record:
         return None
+    deltas = {}
+    add_rollup_delta(deltas, record.supplier_id, record.metric, record.date_recorded, record.result, sign=-1)
     for key, value in record_in.dict(exclude_unset=True).items():
         setattr(record, key, value)
+    add_rollup_delta(deltas, record.supplier_id, record.metric, record.date_recorded, record.result)
+    apply_rollup_deltas(db, deltas)
+    llm_cache.invalidate_supplier(db, record.supplier_id)
+    bump_user_summary(db, _supplier_owner(db, record.supplier_id))
     db.commit()
     db.refresh(record)
     return record
 
 def create_or_update_compliance_weather_delay(db: Session, supplier_id: int, delivery_date: str):
+    if isinstance(delivery_date, str):
+        delivery_date = date.fromisoformat(delivery_date)
+    llm_cache.invalidate_supplier(db, supplier_id)
     # Try to find an existing compliance record for this supplier and date with metric 'Delivery'
     record = db.query(models.ComplianceRecord).filter(
         models.ComplianceRecord.supplier_id == supplier_id,
@@ -81,6 +387,7 @@ def create_or_update_compliance_weather_delay(db: Session, supplier_id: int, del
     ).first()
     if record:
         record.status = 'Excused - Weather Delay'
+        bump_user_summary(db, _supplier_owner(db, supplier_id))
         db.commit()
         db.refresh(record)
         return record
@@ -93,6 +400,132 @@ def create_or_update_compliance_weather_delay(db: Session, supplier_id: int, del
         status='Excused - Weather Delay'
     )
     db.add(new_record)
+    _rollup_record(db, supplier_id, 'Delivery', delivery_date, None)
+    bump_user_summary(db, _supplier_owner(db, supplier_id), records=1)
     db.commit()
     db.refresh(new_record)
-    return new_record
\ No newline at end of file
+    return new_record
+
+# ---------- Batch writes for ComplianceRecord ----------
+
+def _supplier_owners(db: Session, supplier_ids):
+    return dict(db.query(models.Supplier.id, models.Supplier.user_id).filter(models.Supplier.id.in_(set(supplier_ids))))
+
+def get_records_by_ids(db: Session, record_ids):
+    """Records for the given ids, in the same order (None where missing)."""
+    found = {r.id: r for r in db.query(models.ComplianceRecord).filter(models.ComplianceRecord.id.in_(set(record_ids)))}
+    return [found.get(i) for i in record_ids]
+
+def create_compliance_records_batch(db: Session, items, atomic: bool = True):
+    """
+    Insert records with one executemany INSERT ... RETURNING in one transaction.
+    Returns (ids, errors): ids align with items (None for rejected items) and errors is a
+    list of {"index", "error"}. In atomic mode nothing is written if any item is rejected.
+    """
+    ids, errors = [None] * len(items), []
+    owners = _supplier_owners(db, [item.supplier_id for item in items])
+    accepted = []
+    for index, item in enumerate(items):
+        if item.supplier_id in owners:
+            accepted.append(index)
+        else:
+            errors.append({"index": index, "error": f"Supplier {item.supplier_id} not found"})
+    if not accepted or (atomic and errors):
+        return ids, errors
+
+    def write(indexes):
+        rows = [items[i].dict() for i in indexes]
+        stmt = insert(models.ComplianceRecord).returning(models.ComplianceRecord.id, sort_by_parameter_order=True)
+        new_ids = db.execute(stmt, rows).scalars().all()
+        deltas, added = {}, {}
+        for row in rows:
+            add_rollup_delta(deltas, row["supplier_id"], row["metric"], row["date_recorded"], row["result"])
+            owner = owners[row["supplier_id"]]
+            added[owner] = added.get(owner, 0) + 1
+        apply_record_bookkeeping(db, deltas, {row["supplier_id"] for row in rows}, owners, added)
+        return dict(zip(indexes, new_ids))
+
+    _write_batch(db, accepted, write, atomic, ids, errors)
+    return ids, errors
+
+def update_compliance_records_batch(db: Session, items, atomic: bool = True):
+    """
+    Apply partial updates (items carry an id) with one bulk UPDATE; returns (ids, errors) as
+    create_compliance_records_batch does. An id repeated within the batch is rejected.
+    """
+    ids, errors = [None] * len(items), []
+    record = models.ComplianceRecord
+    current = {row.id: row for row in db.query(
+        record.id, record.supplier_id, record.metric, record.date_recorded, record.result
+    ).filter(record.id.in_({item.id for item in items}))}
+    accepted, seen = [], set()
+    for index, item in enumerate(items):
+        if item.id not in current:
+            errors.append({"index": index, "error": f"Record {item.id} not found"})
+        elif item.id in seen:
+            # Each item's rollup delta starts from the stored row, so a repeat would count twice.
+            errors.append({"index": index, "error": f"Record {item.id} appears more than once in the batch"})
+        else:
+            seen.add(item.id)
+            accepted.append(index)
+    if not accepted or (atomic and errors):
+        return ids, errors
+    owners = _supplier_owners(db, [current[items[i].id].supplier_id for i in accepted])
+
+    def write(indexes):
+        rows, deltas = [], {}
+        for i in indexes:
+            old = current[items[i].id]
+            changes = items[i].dict(exclude_unset=True)
+            new = {"metric": old.metric, "date_recorded": old.date_recorded, "result": old.result, **changes}
+            add_rollup_delta(deltas, old.supplier_id, old.metric, old.date_recorded, old.result, sign=-1)
+            add_rollup_delta(deltas, old.supplier_id, new["metric"], new["date_recorded"], new["result"])
+            if len(changes) > 1:  # more than just the id
+                rows.append(changes)
+        if rows:
+            db.execute(update(record), rows)
+        apply_record_bookkeeping(db, deltas, {current[items[i].id].supplier_id for i in indexes}, owners)
+        return {i: items[i].id for i in indexes}
+
+    _write_batch(db, accepted, write, atomic, ids, errors)
+    return ids, errors
+
+def _batch_error(index, error):
+    return {"index": index, "error": str(getattr(error, "orig", error))}
+
+def _write_batch(db: Session, indexes, write, atomic: bool, ids: list, errors: list):
+    """
+    Commit write(indexes), which stages the statements and returns {index: id}. If the bulk
+    statement fails as a whole, find the failing items one by one: best effort commits the
+    others, atomic stages them in one transaction that is rolled back, so nothing is written.
+    """
+    try:
+        written = write(indexes)
+        db.commit()
+        for i, written_id in written.items():
+            ids[i] = written_id
+        return
+    except Exception as batch_error:
+        db.rollback()
+        failed = batch_error
+    staged = []
+    for index in indexes:
+        try:
+            written = write([index])
+            if atomic:
+                db.flush()
+                staged.append(index)
+            else:
+                db.commit()
+                ids[index] = written[index]
+        except Exception as item_error:
+            db.rollback()
+            errors.append(_batch_error(index, item_error))
+            if atomic and staged:
+                write(staged)  # the rollback dropped them; later items may conflict with them
+    if atomic:
+        db.rollback()
+        if not errors:
+            # Every item succeeded on its own; report the batch failure against the first one.
+            errors.append(_batch_error(indexes[0], failed))
+    errors.sort(key=lambda e: e["index"])
@@ -0,0 +1,34 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import crud, geocoding, schemas
+
+# Async counterparts of the crud functions used by `async def` routes. The query logic
+# stays in crud and runs through AsyncSession.run_sync, so both paths share one
+# implementation while database IO here goes through the async driver instead of
+# blocking the event loop. Upstream HTTP calls happen before run_sync, never inside it.
+
+
+async def get_user_summary(db: AsyncSession, user_id: int):
+    return await db.run_sync(crud.get_user_summary, user_id)
+
+async def get_suppliers(db: AsyncSession, user_id: int, skip: int = 0, limit: int = 100, cursor: str = None):
+    return await db.run_sync(crud.get_suppliers, user_id, skip, limit, cursor)
+
+async def get_supplier_by_id(db: AsyncSession, supplier_id: int):
+    return await db.run_sync(crud.get_supplier_by_id, supplier_id)
+
+async def create_supplier(db: AsyncSession, supplier_in: schemas.SupplierCreate, user_id: int):
+    try:
+        coordinates = await geocoding.resolve_async(db, geocoding.supplier_place(supplier_in))
+    except Exception:
+        # Resolved lazily on the next weather lookup.
+        coordinates = (None, None)
+    return await db.run_sync(crud.create_supplier, supplier_in, user_id, coordinates)
+
+async def get_records_by_supplier(db: AsyncSession, supplier_id: int):
+    return await db.run_sync(crud.get_records_by_supplier, supplier_id)
+
+async def get_latest_records_by_supplier(db: AsyncSession, supplier_ids, n: int = 5):
+    return await db.run_sync(crud.get_latest_records_by_supplier, supplier_ids, n)
+
+async def create_or_update_compliance_weather_delay(db: AsyncSession, supplier_id: int, delivery_date: str):
+    return await db.run_sync(crud.create_or_update_compliance_weather_delay, supplier_id, delivery_date)
@@ -1,21 +1,128 @@
-from sqlalchemy import create_engine
+import random
+from fastapi import Request
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.sql.dml import UpdateBase
 from .config import settings  # Loads from your .env file
 
-# Create the SQLAlchemy engine
-engine = create_engine(settings.database_url, echo=True)
+READ_METHODS = ("GET", "HEAD")
+
+
+def async_database_url(url: str) -> str:
+    """Map a sync DATABASE_URL onto its asyncio driver (asyncpg / aiosqlite)."""
+    scheme, sep, rest = url.partition("://")
+    driverless = scheme.split("+")[0]
+    if driverless in ("postgresql", "postgres"):
+        return f"postgresql+asyncpg{sep}{rest}"
+    if driverless == "sqlite":
+        return f"sqlite+aiosqlite{sep}{rest}"
+    return url
+
+
+def _engine_options(url: str) -> dict:
+    driverless = url.split("://", 1)[0].split("+")[0]
+    options = {
+        "echo": settings.db_echo,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+        "pool_recycle": settings.db_pool_recycle,
+    }
+    if driverless != "sqlite":
+        # SQLite uses a per-thread / static pool that has no size to tune.
+        options.update(
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+        )
+    if driverless in ("postgresql", "postgres") and settings.db_statement_timeout_ms:
+        timeout = str(settings.db_statement_timeout_ms)
+        if "+asyncpg" in url:
+            options["connect_args"] = {"server_settings": {"statement_timeout": timeout}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={timeout}"}
+    return options
+
+
+def _replica_urls():
+    return [url.strip() for url in settings.database_replica_urls.split(",") if url.strip()]
+
+
+# Create the SQLAlchemy engines: the primary takes every write, replicas serve reads.
+engine = create_engine(settings.database_url, **_engine_options(settings.database_url))
+replica_engines = [create_engine(url, **_engine_options(url)) for url in _replica_urls()]
+
+async_url = async_database_url(settings.database_url)
+async_engine = create_async_engine(async_url, **_engine_options(async_url))
+async_replica_engines = [
+    create_async_engine(async_database_url(url), **_engine_options(async_database_url(url)))
+    for url in _replica_urls()
+]
+
+
+class RoutingSession(Session):
+    """
+    Sends reads to a replica when the session is marked read_only (GET/HEAD requests) and
+    everything else to the primary. Once the session writes anything it stays on the
+    primary for the rest of its life, so a request always reads its own writes.
+    """
+    primary = engine
+    replicas = replica_engines
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if (
+            self.replicas
+            and self.info.get("read_only")
+            and not self.info.get("wrote")
+            and not self._flushing
+            and not isinstance(clause, UpdateBase)
+        ):
+            return random.choice(self.replicas)
+        return self.primary
+
+
+class AsyncRoutingSession(RoutingSession):
+    # AsyncSession drives a sync Session whose binds are the async engines' sync facades.
+    primary = async_engine.sync_engine
+    replicas = [e.sync_engine for e in async_replica_engines]
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _stick_after_flush(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _stick_after_dml(orm_execute_state):
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info["wrote"] = True
+
+
+def use_primary(db):
+    """Pin a session (sync or async) to the primary, e.g. before a read that must not lag."""
+    db.info["wrote"] = True
+
 
 # Create a configured "Session" class
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, class_=RoutingSession)
+
+# Async sessions for async route handlers. Objects stay loaded after commit because
+# lazy loads are not available on an AsyncSession.
+AsyncSessionLocal = async_sessionmaker(
+    class_=AsyncSession, sync_session_class=AsyncRoutingSession, autoflush=False, expire_on_commit=False
+)
 
 # Base class for all models
 Base = declarative_base()
 
 # Dependency for FastAPI endpoints
-def get_db():
-    db = SessionLocal()
+def get_db(request: Request):
+    db = SessionLocal(info={"read_only": request.method in READ_METHODS})
     try:
         yield db
     finally:
         db.close()
+
+async def get_async_db(request: Request):
+    async with AsyncSessionLocal(info={"read_only": request.method in READ_METHODS}) as db:
+        yield db
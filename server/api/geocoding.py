@@ -0,0 +1,153 @@
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from fastapi import HTTPException
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from . import models, providers
+from .config import settings
+
+
+class _LRU:
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+_lru = _LRU(settings.geocode_lru_size)
+
+
+def normalize_place(place: str) -> str:
+    return " ".join(str(place).strip().lower().split())
+
+
+def supplier_place(supplier) -> str:
+    # Use city for coordinates if available, else fallback to country
+    return getattr(supplier, 'city', None) or supplier.country
+
+
+# ---------- Cache lookups (no network) ----------
+
+def lookup(db: Session, place: str):
+    key = normalize_place(place)
+    coords = _lru.get(key)
+    if coords is not None:
+        return coords
+    row = db.get(models.GeocodeCache, key)
+    if row is None:
+        return None
+    coords = (row.latitude, row.longitude)
+    _lru.put(key, coords)
+    return coords
+
+
+def lookup_many(db: Session, places) -> dict:
+    """{normalized place: (lat, lon)} for the places already cached, in at most one query."""
+    found, unknown = {}, set()
+    for place in places:
+        key = normalize_place(place)
+        coords = _lru.get(key)
+        if coords is not None:
+            found[key] = coords
+        else:
+            unknown.add(key)
+    if unknown:
+        for row in db.query(models.GeocodeCache).filter(models.GeocodeCache.place.in_(unknown)):
+            found[row.place] = (row.latitude, row.longitude)
+            _lru.put(row.place, found[row.place])
+    return found
+
+
+def remember(db: Session, place: str, lat: float, lon: float):
+    """
+    Stage a geocode result in the session; the caller commits. A row another worker cached
+    for the same place concurrently is kept, so the caller's transaction never conflicts on it.
+    """
+    key = normalize_place(place)
+    _lru.put(key, (lat, lon))
+    row = {"place": key, "latitude": lat, "longitude": lon, "updated_at": datetime.utcnow()}
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        db.execute(insert(models.GeocodeCache.__table__).values(row).on_conflict_do_nothing(index_elements=["place"]))
+        return
+    db.merge(models.GeocodeCache(**row))
+
+
+def commit_quietly(db: Session):
+    # Another worker may have cached the same place concurrently; that row is just as good.
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+
+
+# ---------- Upstream geocoding ----------
+
+def _parse(place, res):
+    if not res:
+        raise HTTPException(status_code=404, detail=f"City not found: {place}")
+    return res[0]["lat"], res[0]["lon"]
+
+
+def fetch_coordinates(place: str):
+    return _parse(place, providers.weather().geocode(place))
+
+
+async def fetch_coordinates_async(place: str):
+    return _parse(place, await providers.weather().ageocode(place))
+
+
+def resolve(db: Session, place: str):
+    coords = lookup(db, place)
+    if coords is None:
+        coords = fetch_coordinates(place)
+        remember(db, place, *coords)
+    return coords
+
+
+async def resolve_async(db: AsyncSession, place: str):
+    coords = await db.run_sync(lookup, place)
+    if coords is None:
+        coords = await fetch_coordinates_async(place)
+        await db.run_sync(remember, place, *coords)
+    return coords
+
+
+# ---------- Supplier coordinates ----------
+
+def supplier_coordinates(db: Session, supplier):
+    if supplier.latitude is not None and supplier.longitude is not None:
+        return supplier.latitude, supplier.longitude
+    lat, lon = resolve(db, supplier_place(supplier))
+    supplier.latitude, supplier.longitude = lat, lon
+    commit_quietly(db)
+    return lat, lon
+
+
+async def supplier_coordinates_async(db: AsyncSession, supplier):
+    if supplier.latitude is not None and supplier.longitude is not None:
+        return supplier.latitude, supplier.longitude
+    lat, lon = await resolve_async(db, supplier_place(supplier))
+    supplier.latitude, supplier.longitude = lat, lon
+    await db.run_sync(commit_quietly)
+    return lat, lon
@@ -0,0 +1,297 @@
+"""
+Streaming bulk import of suppliers and compliance records from .xlsx or .csv files.
+
+Rows are read lazily (openpyxl read_only / csv.DictReader), validated against the same
+schemas as the single-row endpoints, and written in chunks with one executemany INSERT and
+one bulk UPDATE per chunk. Existing rows are matched on natural keys:
+
+- suppliers: (user_id, name)
+- compliance records: (supplier_id, metric, date_recorded)
+
+When a file has several rows with the same key, the last one is written and the earlier
+ones are reported as duplicates, so rows == inserted + updated + failed + duplicates.
+
+CLI:
+    python -m api.importer suppliers uploads/Task_Supplier_Data.xlsx --user-id 1 --default risk_level=Medium
+    python -m api.importer compliance records.csv
+"""
+import argparse
+import ast
+import csv
+import io
+import json
+import os
+import re
+from datetime import datetime
+from itertools import islice
+from pydantic import ValidationError
+from sqlalchemy import insert, tuple_, update
+from sqlalchemy.orm import Session
+from . import crud, geocoding, llm_cache, models, schemas, spatial
+from .config import settings
+
+_LEADING_NUMBER = re.compile(r"^\s*(-?\d+(?:\.\d+)?)")
+
+
+# ---------- Reading ----------
+
+def _clean(value):
+    if isinstance(value, str):
+        value = value.strip()
+        return value or None
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def iter_rows(file, filename: str):
+    """Yield (row_number, {header: value}) from an .xlsx/.csv path or binary file object."""
+    ext = os.path.splitext(filename)[1].lower()
+    if ext in (".xlsx", ".xlsm"):
+        from openpyxl import load_workbook
+        workbook = load_workbook(file, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [str(h).strip() if h is not None else None for h in next(rows, [])]
+            for number, values in enumerate(rows, start=2):
+                if all(v is None for v in values):
+                    continue
+                yield number, {h: _clean(v) for h, v in zip(header, values) if h}
+        finally:
+            workbook.close()
+    elif ext == ".csv":
+        text = open(file, newline="", encoding="utf-8-sig") if isinstance(file, str) else \
+            io.TextIOWrapper(file, newline="", encoding="utf-8-sig")
+        with text:
+            for number, row in enumerate(csv.DictReader(text), start=2):
+                yield number, {h.strip(): _clean(v) for h, v in row.items() if h}
+    else:
+        raise ValueError(f"Unsupported file type '{ext}', expected .xlsx or .csv")
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class ImportReport:
+    def __init__(self):
+        self.rows = 0
+        self.inserted = 0
+        self.updated = 0
+        self.error_count = 0
+        self.errors = []
+        self.duplicates = 0
+        self.warnings = []
+
+    def error(self, row_number, message):
+        self.error_count += 1
+        if len(self.errors) < settings.import_max_reported_errors:
+            self.errors.append({"row": row_number, "error": message})
+
+    def duplicate(self, row_number, kept_row_number, key: str):
+        """row_number was superseded by a later row of the same file with the same key."""
+        self.duplicates += 1
+        if len(self.warnings) < settings.import_max_reported_errors:
+            self.warnings.append({"row": row_number, "warning": f"superseded by row {kept_row_number} with the same {key}"})
+
+    def as_dict(self):
+        return {
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "failed": self.error_count,
+            "duplicates": self.duplicates,
+            "errors": self.errors,
+            "warnings": self.warnings,
+        }
+
+
+def _validation_message(exc: ValidationError):
+    return "; ".join(f"{'.'.join(str(p) for p in e['loc'])}: {e['msg']}" for e in exc.errors())
+
+
+# ---------- Suppliers ----------
+
+def _supplier_row(row: dict, defaults: dict):
+    data = {**defaults, **{k: v for k, v in row.items() if v is not None}}
+    terms = data.get("contract_terms")
+    if isinstance(terms, str):
+        try:
+            terms = json.loads(terms)
+        except ValueError:
+            terms = ast.literal_eval(terms)
+    if isinstance(terms, dict):
+        data["contract_terms"] = {str(k): str(v) for k, v in terms.items()}
+    return schemas.SupplierCreate(**data)
+
+
+def import_suppliers(db: Session, rows, user_id: int, defaults: dict = None, chunk_size: int = None):
+    report = ImportReport()
+    for chunk in _chunks(rows, chunk_size or settings.import_chunk_size):
+        valid, numbers = {}, {}
+        for number, row in chunk:
+            report.rows += 1
+            try:
+                supplier = _supplier_row(row, defaults or {})
+            except ValidationError as e:
+                report.error(number, _validation_message(e))
+                continue
+            except (ValueError, SyntaxError) as e:
+                report.error(number, f"contract_terms: {e}")
+                continue
+            if supplier.name in valid:
+                report.duplicate(numbers[supplier.name], number, "name")
+            valid[supplier.name] = supplier  # a later row for the same name wins
+            numbers[supplier.name] = number
+
+        if not valid:
+            continue
+        existing = {row.name: row for row in db.query(
+            models.Supplier.id, models.Supplier.name, models.Supplier.city, models.Supplier.country
+        ).filter(models.Supplier.user_id == user_id, models.Supplier.name.in_(list(valid)))}
+
+        known_places = geocoding.lookup_many(db, [s.city or s.country for n, s in valid.items() if n not in existing])
+
+        inserts, updates = [], []
+        for name, supplier in valid.items():
+            values = supplier.dict()
+            old = existing.get(name)
+            if old is not None:
+                values["id"] = old.id
+                if (old.city, old.country) != (values.get("city"), values["country"]):
+                    # Moved: coordinates are re-resolved lazily on the next weather lookup.
+                    values.update(latitude=None, longitude=None)
+                updates.append(values)
+            else:
+                coords = known_places.get(geocoding.normalize_place(values.get("city") or values["country"]))
+                lat, lon = coords if coords else (None, None)
+                inserts.append({**values, "user_id": user_id, "latitude": lat, "longitude": lon})
+
+        if inserts:
+            db.execute(insert(models.Supplier), inserts)
+        if updates:
+            db.execute(update(models.Supplier), updates)
+            llm_cache.invalidate_suppliers(db, [u["id"] for u in updates])
+        crud.bump_user_summary(db, user_id, suppliers=len(inserts))
+        db.commit()
+        spatial.index.invalidate()  # Core bulk writes bypass the ORM hooks that keep it current
+        report.inserted += len(inserts)
+        report.updated += len(updates)
+    return report
+
+
+# ---------- Compliance records ----------
+
+def _record_row(row: dict):
+    data = dict(row)
+    result = data.get("result")
+    if isinstance(result, str):
+        # Spreadsheet exports carry units ("7 days") or verdicts ("Fail") in the result
+        # column; keep the number, the verdict already lives in status.
+        match = _LEADING_NUMBER.match(result)
+        data["result"] = float(match.group(1)) if match else None
+    data.setdefault("result", None)
+    return schemas.ComplianceRecordCreate(**data)
+
+
+def import_compliance_records(db: Session, rows, user_id: int = None, chunk_size: int = None):
+    """Import records; when user_id is given, only that user's suppliers are accepted."""
+    report = ImportReport()
+    record = models.ComplianceRecord
+    for chunk in _chunks(rows, chunk_size or settings.import_chunk_size):
+        parsed = []
+        for number, row in chunk:
+            report.rows += 1
+            try:
+                parsed.append((number, _record_row(row)))
+            except ValidationError as e:
+                report.error(number, _validation_message(e))
+        if not parsed:
+            continue
+
+        supplier_query = db.query(models.Supplier.id, models.Supplier.user_id).filter(
+            models.Supplier.id.in_({r.supplier_id for _, r in parsed})
+        )
+        if user_id is not None:
+            supplier_query = supplier_query.filter(models.Supplier.user_id == user_id)
+        owners = dict(supplier_query)
+
+        valid, numbers = {}, {}
+        for number, r in parsed:
+            if r.supplier_id not in owners:
+                report.error(number, f"supplier_id: supplier {r.supplier_id} not found")
+                continue
+            key = (r.supplier_id, r.metric, r.date_recorded)
+            if key in valid:
+                report.duplicate(numbers[key], number, "supplier_id, metric and date_recorded")
+            valid[key] = r  # a later row for the same record wins
+            numbers[key] = number
+        if not valid:
+            continue
+
+        existing = {}
+        for row in db.query(record.id, record.supplier_id, record.metric, record.date_recorded, record.result).filter(
+            tuple_(record.supplier_id, record.metric, record.date_recorded).in_(list(valid))
+        ).order_by(record.id):
+            existing[(row.supplier_id, row.metric, row.date_recorded)] = row  # latest id wins
+
+        inserts, updates, deltas, added = [], [], {}, {}
+        for key, r in valid.items():
+            values = r.dict()
+            old = existing.get(key)
+            if old is not None:
+                updates.append({"id": old.id, "result": values["result"], "status": values["status"]})
+                crud.add_rollup_delta(deltas, old.supplier_id, old.metric, old.date_recorded, old.result, sign=-1)
+            else:
+                inserts.append(values)
+                owner = owners[r.supplier_id]
+                added[owner] = added.get(owner, 0) + 1
+            crud.add_rollup_delta(deltas, r.supplier_id, r.metric, r.date_recorded, values["result"])
+
+        if inserts:
+            db.execute(insert(record), inserts)
+        if updates:
+            db.execute(update(record), updates)
+        crud.apply_record_bookkeeping(db, deltas, {sid for sid, _, _ in valid}, owners, added)
+        db.commit()
+        report.inserted += len(inserts)
+        report.updated += len(updates)
+    return report
+
+
+# ---------- CLI ----------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import suppliers or compliance records.")
+    parser.add_argument("kind", choices=["suppliers", "compliance"])
+    parser.add_argument("path", help=".xlsx or .csv file")
+    parser.add_argument("--user-id", type=int, help="owner of imported suppliers (required for suppliers)")
+    parser.add_argument("--default", action="append", default=[], metavar="FIELD=VALUE",
+                        help="supplier field value used when a row leaves it empty")
+    parser.add_argument("--chunk-size", type=int, default=settings.import_chunk_size)
+    args = parser.parse_args(argv)
+
+    from .database import SessionLocal
+    db = SessionLocal()
+    try:
+        rows = iter_rows(args.path, args.path)
+        if args.kind == "suppliers":
+            if args.user_id is None:
+                parser.error("--user-id is required for suppliers")
+            defaults = dict(item.split("=", 1) for item in args.default)
+            report = import_suppliers(db, rows, args.user_id, defaults, args.chunk_size)
+        else:
+            report = import_compliance_records(db, rows, args.user_id, args.chunk_size)
+    finally:
+        db.close()
+    print(json.dumps(report.as_dict(), indent=2, default=str))
+    return 1 if report.error_count else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
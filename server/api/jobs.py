@@ -0,0 +1,318 @@
+"""
+Background jobs for the long-running Gemini analyses.
+
+Jobs live in the `jobs` table, which is also the queue: workers claim the oldest queued
+row with a conditional UPDATE, so any number of workers in any number of processes can
+share it without a broker. Workers run inside the API process (settings.job_workers) or
+standalone:
+
+    python -m api.jobs --workers 4
+
+Identical jobs (same user, kind and parameters) that are still queued or running are joined
+rather than duplicated. Finished jobs keep their result for job_result_ttl_seconds.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from pydantic import ValidationError
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import analyses, database, llm, models, providers, schemas, upstream
+from .config import configure_logging, settings
+
+logger = logging.getLogger(__name__)
+
+IN_FLIGHT = ("queued", "running")
+FINISHED = ("succeeded", "failed")
+REAP_INTERVAL_SECONDS = 60
+
+
+# ---------- Handlers ----------
+
+def _with_session(fn, *args):
+    db = database.SessionLocal()
+    try:
+        return fn(db, *args)
+    finally:
+        db.close()
+
+
+async def _check_compliance(params):
+    return await run_in_threadpool(_with_session, analyses.check_compliance, params["supplier_id"])
+
+
+async def _supplier_insights(params):
+    return await run_in_threadpool(_with_session, analyses.supplier_insights, params["supplier_id"])
+
+
+async def _recommend_supplier(params):
+    async with database.AsyncSessionLocal() as db:
+        return await analyses.recommend_supplier(
+            db, params["user_lat"], params["user_lon"], params.get("k"), params.get("within_km")
+        )
+
+
+# kind -> (params schema, handler returning the same body as the synchronous endpoint)
+HANDLERS = {
+    "check_compliance": (schemas.SupplierAnalysisParams, _check_compliance),
+    "supplier_insights": (schemas.SupplierAnalysisParams, _supplier_insights),
+    "recommend_supplier": (schemas.RecommendSupplierParams, _recommend_supplier),
+}
+
+
+def dedupe_key(kind: str, params: dict) -> str:
+    payload = json.dumps({"kind": kind, "params": params}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# ---------- Submitting and reading ----------
+
+async def submit(db: AsyncSession, kind: str, params: dict, user_id: int = None):
+    """Queue a job, or return the identical job this user already has queued or running."""
+    schema, _ = HANDLERS[kind]
+    try:
+        params = schema(**params).dict()
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors())
+
+    key = dedupe_key(kind, params)
+    existing = (await db.execute(
+        select(models.Job).where(
+            models.Job.dedupe_key == key, models.Job.user_id == user_id, models.Job.status.in_(IN_FLIGHT)
+        )
+        .order_by(models.Job.created_at).limit(1)
+    )).scalars().first()
+    if existing is not None:
+        return existing
+
+    job = models.Job(
+        id=uuid.uuid4().hex,
+        kind=kind,
+        params=params,
+        dedupe_key=key,
+        user_id=user_id,
+        status="queued",
+        attempts=0,
+        created_at=datetime.utcnow(),
+    )
+    db.add(job)
+    await db.commit()
+    worker_pool.notify()
+    return job
+
+
+async def wait_for_job(db: AsyncSession, job_id: str, user_id: int, timeout: float = 0):
+    """The user's job, once it has finished or `timeout` seconds have passed; 404 for other users' jobs."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while True:
+        job = await db.get(models.Job, job_id, populate_existing=True)
+        if job is None or job.user_id != user_id:
+            raise HTTPException(status_code=404, detail="Job not found")
+        remaining = deadline - loop.time()
+        if job.status in FINISHED or remaining <= 0:
+            return job
+        await db.rollback()  # don't hold a connection while waiting
+        await worker_pool.wait_finished(job_id, min(remaining, settings.job_poll_interval_seconds))
+
+
+# ---------- Workers ----------
+
+class JobWorkerPool:
+    def __init__(self):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._tasks = []
+        self._wakeup = None
+        self._finished = {}  # job id -> [Event, number of waiters], for waiters in this process
+
+    def notify(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def start(self, workers: int):
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(workers)]
+        self._tasks.append(asyncio.create_task(self._reap_forever()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._wakeup = None
+
+    async def wait_finished(self, job_id: str, timeout: float):
+        # Jobs finished by another process are only seen by the caller's next poll.
+        entry = self._finished.setdefault(job_id, [asyncio.Event(), 0])
+        event = entry[0]
+        entry[1] += 1
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            entry[1] -= 1
+            # Only the last waiter drops the entry; _finish() has already popped it if it ran.
+            if entry[1] == 0 and self._finished.get(job_id) is entry:
+                del self._finished[job_id]
+
+    async def _work(self):
+        while True:
+            try:
+                self._wakeup.clear()
+                job = await self._claim()
+                if job is None:
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), settings.job_poll_interval_seconds)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Job worker error")
+                await asyncio.sleep(settings.job_poll_interval_seconds)
+
+    async def _claim(self):
+        async with database.AsyncSessionLocal() as db:
+            while True:
+                job_id = (await db.execute(
+                    select(models.Job.id).where(models.Job.status == "queued")
+                    .order_by(models.Job.created_at).limit(1)
+                )).scalar()
+                if job_id is None:
+                    return None
+                claimed = await db.execute(
+                    update(models.Job)
+                    .where(models.Job.id == job_id, models.Job.status == "queued")
+                    .values(
+                        status="running",
+                        worker_id=self.worker_id,
+                        started_at=datetime.utcnow(),
+                        attempts=models.Job.attempts + 1,
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+                await db.commit()
+                if claimed.rowcount == 1:
+                    return await db.get(models.Job, job_id)
+                # Another worker won the race for this row; try the next one.
+
+    async def _run(self, job):
+        _, handler = HANDLERS[job.kind]
+        try:
+            with llm.profile("bulk"):
+                result = await asyncio.wait_for(handler(job.params), settings.job_timeout_seconds)
+            values = {"status": "succeeded", "result": jsonable_encoder(result)}
+        except asyncio.TimeoutError:
+            values = {"status": "failed", "error": f"Timed out after {settings.job_timeout_seconds}s", "error_code": 504}
+        except HTTPException as e:
+            values = {"status": "failed", "error": str(e.detail), "error_code": e.status_code}
+        except asyncio.CancelledError:
+            # Stopping the pool: hand the job back to the queue rather than leave it "running"
+            # for the reaper, and don't count this run against it.
+            await self._requeue(job.id)
+            raise
+        except Exception as e:
+            values = {"status": "failed", "error": str(e), "error_code": 500}
+        await self._finish(job.id, values)
+
+    async def _requeue(self, job_id: str):
+        async with database.AsyncSessionLocal() as db:
+            await db.execute(
+                update(models.Job).where(models.Job.id == job_id, models.Job.status == "running").values(
+                    status="queued", worker_id=None, started_at=None, attempts=models.Job.attempts - 1,
+                ).execution_options(synchronize_session=False)
+            )
+            await db.commit()
+
+    async def _finish(self, job_id: str, values: dict):
+        now = datetime.utcnow()
+        async with database.AsyncSessionLocal() as db:
+            await db.execute(
+                update(models.Job).where(models.Job.id == job_id).values(
+                    **values, finished_at=now, expires_at=now + timedelta(seconds=settings.job_result_ttl_seconds)
+                ).execution_options(synchronize_session=False)
+            )
+            await db.commit()
+        entry = self._finished.pop(job_id, None)
+        if entry is not None:
+            entry[0].set()
+
+    async def reap(self):
+        """
+        Purge expired results and requeue jobs whose worker disappeared mid-run; a job that
+        has already had job_max_attempts runs is failed instead.
+        """
+        now = datetime.utcnow()
+        lost_before = now - timedelta(seconds=2 * settings.job_timeout_seconds)
+        lost = (models.Job.status == "running", models.Job.started_at < lost_before)
+        async with database.AsyncSessionLocal() as db:
+            await db.execute(delete(models.Job).where(
+                models.Job.status.in_(FINISHED), models.Job.expires_at < now
+            ).execution_options(synchronize_session=False))
+            await db.execute(update(models.Job).where(
+                *lost, models.Job.attempts >= settings.job_max_attempts
+            ).values(
+                status="failed", error="Worker stopped before the job finished", error_code=500,
+                finished_at=now, expires_at=now + timedelta(seconds=settings.job_result_ttl_seconds),
+            ).execution_options(synchronize_session=False))
+            requeued = await db.execute(update(models.Job).where(*lost).values(
+                status="queued", worker_id=None, started_at=None,
+            ).execution_options(synchronize_session=False))
+            await db.commit()
+        if requeued.rowcount:
+            self.notify()
+
+    async def _reap_forever(self):
+        while True:
+            try:
+                await self.reap()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Job reaper error")
+            await asyncio.sleep(REAP_INTERVAL_SECONDS)
+
+
+worker_pool = JobWorkerPool()
+
+
+# ---------- CLI ----------
+
+async def _serve(workers: int):
+    providers.init()
+    upstream.start()
+    await worker_pool.start(workers)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await worker_pool.stop()
+        await upstream.aclose()
+        await database.async_engine.dispose()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run background job workers.")
+    parser.add_argument("--workers", type=int, default=max(settings.job_workers, 1))
+    args = parser.parse_args(argv)
+
+    configure_logging()
+    try:
+        asyncio.run(_serve(args.workers))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import contextvars
+from contextlib import contextmanager
+from . import providers
+
+# The LLM calls used by analyses, routed to providers.llm() for the current profile:
+# "interactive" by default, "bulk" inside `with llm.profile("bulk")` (background jobs).
+
+_profile = contextvars.ContextVar("llm_profile", default="interactive")
+
+
+@contextmanager
+def profile(name: str):
+    token = _profile.set(name)
+    try:
+        yield
+    finally:
+        _profile.reset(token)
+
+
+def model_name() -> str:
+    """The model answering in the current profile; part of every LLM cache key."""
+    return providers.llm(_profile.get()).model
+
+
+def generate(prompt: str) -> str:
+    return providers.llm(_profile.get()).generate(prompt)
+
+
+async def agenerate(prompt: str) -> str:
+    return await providers.llm(_profile.get()).agenerate(prompt)
+
+
+async def astream(prompt: str):
+    """Yield the generated text chunk by chunk as the model streams it."""
+    async for text in providers.llm(_profile.get()).astream(prompt):
+        yield text
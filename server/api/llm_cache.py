@@ -0,0 +1,163 @@
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from . import models
+from .config import settings
+
+# Persistent cache of LLM responses. Keys are content addressed: the model, the prompt
+# template name/version and every input that feeds the prompt. lookup/store only stage
+# changes in the session, callers finish with commit() so a request costs one transaction.
+# A hit writes nothing unless the entry's last use is older than llm_cache_touch_seconds,
+# and only store() checks the size budget.
+
+EVICT_BATCH = 100
+
+_size_lock = threading.Lock()
+_size = {"bytes": None, "synced_at": 0.0}  # in-process estimate of SUM(size_bytes)
+
+
+def cache_key(model: str, template: str, template_version: int, inputs: dict) -> str:
+    payload = json.dumps(
+        {"model": model, "template": template, "version": template_version, "inputs": inputs},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def record_inputs(records) -> list:
+    return [[r.id, r.metric, str(r.date_recorded), r.result, r.status] for r in records]
+
+
+def supplier_inputs(supplier) -> dict:
+    return {
+        "id": supplier.id,
+        "name": supplier.name,
+        "country": supplier.country,
+        "city": supplier.city,
+        "status": supplier.status,
+        "risk_level": supplier.risk_level,
+        "compliance_score": supplier.compliance_score,
+        "last_audit": supplier.last_audit,
+    }
+
+
+def _touch(entries, now):
+    """Record a use, coarsely: entries used within llm_cache_touch_seconds are left alone."""
+    cutoff = now - timedelta(seconds=settings.llm_cache_touch_seconds)
+    for entry in entries:
+        if entry.last_used_at is None or entry.last_used_at < cutoff:
+            entry.hits = (entry.hits or 0) + 1
+            entry.last_used_at = now
+
+
+def lookup(db: Session, key: str):
+    entry = db.get(models.LLMCacheEntry, key)
+    if entry is None:
+        return None
+    _touch([entry], datetime.utcnow())
+    return entry.response
+
+
+def lookup_many(db: Session, keys) -> dict:
+    """{key: response} for the keys already cached, in one query."""
+    keys = list(keys)
+    if not keys:
+        return {}
+    entries = db.query(models.LLMCacheEntry).filter(models.LLMCacheEntry.key.in_(keys)).all()
+    _touch(entries, datetime.utcnow())
+    return {entry.key: entry.response for entry in entries}
+
+
+def store(db: Session, key: str, model: str, template: str, template_version: int, response: str, supplier_id: int = None):
+    """Stage an entry, evicting old ones first when it would take the cache over budget."""
+    now = datetime.utcnow()
+    size = len(response.encode("utf-8"))
+    if _estimated_size(db) + size > settings.llm_cache_max_bytes:
+        evict(db, size)
+    _add_size(size)
+    db.merge(models.LLMCacheEntry(
+        key=key,
+        model=model,
+        template=template,
+        template_version=template_version,
+        supplier_id=supplier_id,
+        response=response,
+        size_bytes=size,
+        hits=0,
+        created_at=now,
+        last_used_at=now,
+    ))
+
+
+def invalidate_supplier(db: Session, supplier_id: int):
+    """Drop every cached analysis for a supplier, in the caller's transaction."""
+    db.query(models.LLMCacheEntry).filter(
+        models.LLMCacheEntry.supplier_id == supplier_id
+    ).delete(synchronize_session=False)
+
+
+def invalidate_suppliers(db: Session, supplier_ids):
+    supplier_ids = list(supplier_ids)
+    if supplier_ids:
+        db.query(models.LLMCacheEntry).filter(
+            models.LLMCacheEntry.supplier_id.in_(supplier_ids)
+        ).delete(synchronize_session=False)
+
+
+def _total_size(db: Session) -> int:
+    return db.query(func.coalesce(func.sum(models.LLMCacheEntry.size_bytes), 0)).scalar()
+
+
+def _estimated_size(db: Session) -> int:
+    """SUM(size_bytes), counted again at most every llm_cache_size_sync_seconds and kept up to
+    date from this process's stores and evictions in between."""
+    with _size_lock:
+        if _size["bytes"] is not None and time.monotonic() - _size["synced_at"] < settings.llm_cache_size_sync_seconds:
+            return _size["bytes"]
+    total = _total_size(db)
+    with _size_lock:
+        _size.update(bytes=total, synced_at=time.monotonic())
+    return total
+
+
+def _add_size(size: int):
+    with _size_lock:
+        if _size["bytes"] is not None:
+            _size["bytes"] += size
+
+
+def evict(db: Session, incoming: int = 0):
+    """Delete least recently used entries until the cache, plus `incoming` bytes, fits in
+    llm_cache_max_bytes; victims are read EVICT_BATCH at a time."""
+    db.flush()
+    total = _total_size(db)
+    excess = total + incoming - settings.llm_cache_max_bytes
+    entry = models.LLMCacheEntry
+    while excess > 0:
+        rows = db.query(entry.key, entry.size_bytes).order_by(entry.last_used_at).limit(EVICT_BATCH).all()
+        if not rows:
+            break
+        victims = []
+        for key, size in rows:
+            victims.append(key)
+            excess -= size
+            total -= size
+            if excess <= 0:
+                break
+        db.query(entry).filter(entry.key.in_(victims)).delete(synchronize_session=False)
+    with _size_lock:
+        _size.update(bytes=total, synced_at=time.monotonic())
+
+
+def commit(db: Session):
+    try:
+        db.commit()
+    except IntegrityError:
+        # Another worker stored the same key first; its response is equivalent.
+        db.rollback()
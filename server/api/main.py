@@ -1,12 +1,26 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .routers import suppliers, compliance, weather
-from .database import engine, Base
-from . import auth
+from .routers import suppliers, compliance, weather, jobs as jobs_router
+from . import auth, jobs, metrics, providers, resilience, upstream, pagination
+from .config import configure_logging, settings
 
-Base.metadata.create_all(bind=engine)
+# Importing the app has no side effects: the schema is managed with Alembic
+# (`alembic upgrade head`, see alembic.ini); logging and clients are set up by the lifespan hook.
 
-app = FastAPI(title="Auditryx API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    configure_logging()
+    providers.init()
+    upstream.start()
+    if settings.job_workers > 0:
+        await jobs.worker_pool.start(settings.job_workers)
+    yield
+    await jobs.worker_pool.stop()
+    await upstream.aclose()
+    auth.shutdown()
+
+app = FastAPI(title="Auditryx API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -19,9 +33,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[pagination.NEXT_CURSOR_HEADER, "Server-Timing"],
 )
+app.add_middleware(metrics.RequestMetricsMiddleware)
 
 app.include_router(suppliers.router)
 app.include_router(compliance.router)
 app.include_router(weather.router)
 app.include_router(auth.router)
+app.include_router(jobs_router.router)
+app.include_router(metrics.router)
+app.include_router(resilience.router)
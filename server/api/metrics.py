@@ -0,0 +1,165 @@
+"""
+Prometheus metrics and per-request stage timing.
+
+Each request gets a RequestTiming in a context variable. Database queries (engine events) and
+upstream calls (track()) add their time to it, so a slow request shows whether the time went
+to the database, OpenWeather or Gemini: the totals are sent in a Server-Timing header and
+recorded in the http_request_stage_seconds histogram. GET /metrics serves everything in the
+Prometheus text format.
+
+Queries slower than db_slow_query_ms are logged to the "api.slow_query" logger.
+"""
+import contextvars
+import logging
+import time
+from contextlib import contextmanager
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from .config import settings
+
+slow_query_log = logging.getLogger("api.slow_query")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Request latency until the response is complete.",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+REQUEST_STAGE = Histogram(
+    "http_request_stage_seconds", "Time one request spent in each stage (db, openweather, gemini).",
+    ["route", "stage"], buckets=LATENCY_BUCKETS,
+)
+DB_QUERY_LATENCY = Histogram(
+    "db_query_duration_seconds", "Database statement latency.", ["operation"], buckets=LATENCY_BUCKETS,
+)
+DB_SLOW_QUERIES = Counter("db_slow_queries_total", "Statements slower than db_slow_query_ms.")
+UPSTREAM_LATENCY = Histogram(
+    "upstream_request_duration_seconds", "Outbound call latency per upstream service.",
+    ["upstream", "outcome"], buckets=LATENCY_BUCKETS,
+)
+
+
+class RequestTiming:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}  # stage -> [calls, seconds]
+
+    def add(self, stage: str, seconds: float):
+        entry = self.stages.get(stage)
+        if entry is None:
+            self.stages[stage] = [1, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+
+    def server_timing(self) -> str:
+        parts = [
+            f'{stage};dur={seconds * 1000:.1f};desc="{calls} calls"'
+            for stage, (calls, seconds) in self.stages.items()
+        ]
+        parts.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ", ".join(parts)
+
+
+_current_timing = contextvars.ContextVar("request_timing", default=None)
+
+
+def _record(stage: str, seconds: float):
+    timing = _current_timing.get()
+    if timing is not None:
+        timing.add(stage, seconds)
+
+
+@contextmanager
+def track(upstream: str):
+    """Time an outbound call to `upstream` (e.g. "openweather", "gemini")."""
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        elapsed = time.perf_counter() - started
+        UPSTREAM_LATENCY.labels(upstream, outcome).observe(elapsed)
+        _record(upstream, elapsed)
+
+
+# ---------- Database ----------
+
+def _operation(statement: str) -> str:
+    words = statement.split(None, 1)
+    return words[0].upper() if words else "UNKNOWN"
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    DB_QUERY_LATENCY.labels(_operation(statement)).observe(elapsed)
+    _record("db", elapsed)
+    if settings.db_slow_query_ms and elapsed * 1000 >= settings.db_slow_query_ms:
+        DB_SLOW_QUERIES.inc()
+        # Statement only: parameters can hold credentials and personal data.
+        slow_query_log.warning("%.1f ms: %s", elapsed * 1000, " ".join(statement.split()))
+
+
+@event.listens_for(Engine, "handle_error")
+def _drop_failed_query(context):
+    started = context.connection.info.get("query_started") if context.connection is not None else None
+    if started:
+        started.pop()
+
+
+# ---------- Requests ----------
+
+def _route(scope) -> str:
+    # The route template keeps the label set small; unmatched paths share one label.
+    route = scope.get("route")
+    return getattr(route, "path", "unmatched")
+
+
+class RequestMetricsMiddleware:
+    """Pure ASGI middleware, so streamed responses are timed until their last chunk."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timing = RequestTiming()
+        token = _current_timing.set(timing)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                MutableHeaders(scope=message).append("Server-Timing", timing.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_timing.reset(token)
+            route = _route(scope)
+            REQUEST_LATENCY.labels(scope["method"], route, str(status)).observe(time.perf_counter() - timing.started)
+            for stage, (_, seconds) in timing.stages.items():
+                REQUEST_STAGE.labels(route, stage).observe(seconds)
+
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -1,5 +1,5 @@
 
-from sqlalchemy import Column, Integer, String, Date, ForeignKey, JSON, Float
+from sqlalchemy import Column, Integer, String, Text, Date, DateTime, ForeignKey, JSON, Float, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from .database import Base
 
@@ -24,11 +24,17 @@ class Supplier(Base):
     compliance_score= Column(Integer, default=0)
     last_audit      = Column(Date, nullable=True)
     risk_level      = Column(String, nullable=True)
-    user_id         = Column(Integer, ForeignKey("users.id"), nullable=False)
+    latitude        = Column(Float, nullable=True)
+    longitude       = Column(Float, nullable=True)
+    user_id         = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     records         = relationship("ComplianceRecord", back_populates="supplier")
 
 class ComplianceRecord(Base):
     __tablename__ = "compliance_records"
+    __table_args__  = (
+        Index("ix_compliance_records_supplier_date", "supplier_id", "date_recorded"),
+        Index("ix_compliance_records_date_id", "date_recorded", "id"),
+    )
     id              = Column(Integer, primary_key=True, index=True)
     supplier_id     = Column(Integer, ForeignKey("suppliers.id"), nullable=False)
     metric          = Column(String, nullable=False)
@@ -36,3 +42,83 @@ class ComplianceRecord(Base):
     result          = Column(Float, nullable=True)
     status          = Column(String, nullable=False)
     supplier        = relationship("Supplier", back_populates="records")
+
+class GeocodeCache(Base):
+    __tablename__ = "geocode_cache"
+    place           = Column(String, primary_key=True)  # normalized place name
+    latitude        = Column(Float, nullable=False)
+    longitude       = Column(Float, nullable=False)
+    updated_at      = Column(DateTime, nullable=False)
+
+class WeatherDaily(Base):
+    __tablename__ = "weather_daily"
+    __table_args__  = (UniqueConstraint("latitude", "longitude", "day", name="uq_weather_daily_location_day"),)
+    id              = Column(Integer, primary_key=True, index=True)
+    latitude        = Column(Float, nullable=False)  # rounded to weather_cache_precision
+    longitude       = Column(Float, nullable=False)
+    day             = Column(Date, nullable=False)
+    temperature     = Column(Float, nullable=True)
+    condition       = Column(String, nullable=True)
+    humidity        = Column(Integer, nullable=True)
+    fetched_at      = Column(DateTime, nullable=False)
+
+class LLMCacheEntry(Base):
+    __tablename__ = "llm_cache"
+    key             = Column(String(64), primary_key=True)  # sha256 of model, template, version and inputs
+    model           = Column(String, nullable=False)
+    template        = Column(String, nullable=False)
+    template_version= Column(Integer, nullable=False)
+    supplier_id     = Column(Integer, nullable=True, index=True)
+    response        = Column(Text, nullable=False)
+    size_bytes      = Column(Integer, nullable=False)
+    hits            = Column(Integer, nullable=False, default=0)  # counted at most once per llm_cache_touch_seconds
+    created_at      = Column(DateTime, nullable=False)
+    last_used_at    = Column(DateTime, nullable=False, index=True)
+
+class UserSummary(Base):
+    # Per-user counters maintained by crud in the same transaction as the writes.
+    __tablename__ = "user_summaries"
+    user_id         = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    supplier_count  = Column(Integer, nullable=False, default=0)
+    record_count    = Column(Integer, nullable=False, default=0)
+    last_activity   = Column(DateTime, nullable=True)
+
+class ComplianceMonthlyRollup(Base):
+    # Pre-aggregated compliance results per supplier, metric and month, maintained by crud.
+    __tablename__ = "compliance_monthly_rollup"
+    supplier_id     = Column(Integer, ForeignKey("suppliers.id"), primary_key=True)
+    metric          = Column(String, primary_key=True)
+    month           = Column(Date, primary_key=True)  # first day of the month
+    record_count    = Column(Integer, nullable=False, default=0)
+    value_count     = Column(Integer, nullable=False, default=0)  # records with a numeric result
+    value_sum       = Column(Float, nullable=False, default=0)
+
+class RevokedToken(Base):
+    # Logged-out access tokens by JWT id; rows can be dropped once the token has expired.
+    __tablename__ = "revoked_tokens"
+    jti             = Column(String(32), primary_key=True)
+    user_id         = Column(Integer, ForeignKey("users.id"), nullable=False)
+    expires_at      = Column(DateTime, nullable=False, index=True)
+
+class Job(Base):
+    # Background analyses run by the api.jobs workers; finished rows are purged after expires_at.
+    __tablename__ = "jobs"
+    id              = Column(String(32), primary_key=True)
+    kind            = Column(String, nullable=False)
+    params          = Column(JSON, nullable=False)
+    dedupe_key      = Column(String(64), nullable=False, index=True)  # kind + params, to join identical in-flight jobs
+    user_id         = Column(Integer, nullable=True)
+    status          = Column(String(16), nullable=False, default="queued")  # queued, running, succeeded, failed
+    result          = Column(JSON, nullable=True)
+    error           = Column(Text, nullable=True)
+    error_code      = Column(Integer, nullable=True)  # HTTP status the synchronous endpoint would have returned
+    attempts        = Column(Integer, nullable=False, default=0)
+    worker_id       = Column(String(64), nullable=True)
+    created_at      = Column(DateTime, nullable=False)
+    started_at      = Column(DateTime, nullable=True)
+    finished_at     = Column(DateTime, nullable=True)
+    expires_at      = Column(DateTime, nullable=True, index=True)
+
+    __table_args__ = (
+        Index("ix_jobs_status_created", "status", "created_at"),
+    )
@@ -0,0 +1,297 @@
+"""
+Weather and LLM providers.
+
+Everything that talks to OpenWeather or Gemini goes through a WeatherProvider or an
+LLMProvider, chosen by settings:
+
+- weather_provider: "openweather", or "fake" for deterministic local data
+- llm_provider: "gemini" (REST API over the shared pooled client), "gemini-sdk"
+  (google-generativeai), or "fake"
+- llm_model, plus llm_bulk_provider / llm_bulk_model for background jobs, which can use a
+  cheaper or faster model than interactive requests (see llm.profile)
+
+Providers are created once per process (init(), from the app's lifespan hook) and share the
+keep-alive clients in upstream. Their calls go through resilience (timeouts, retries, circuit
+breakers); only the weather GETs are idempotent enough to be hedged.
+"""
+import hashlib
+import json
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
+from . import resilience, upstream
+from .config import settings
+
+DEFAULT_GEMINI_ENDPOINT = "https://generativelanguage.googleapis.com"
+
+
+def _pick(seed: str, n: int) -> int:
+    return int(hashlib.sha256(seed.encode()).hexdigest()[:8], 16) % n
+
+
+# ---------- Weather ----------
+
+class WeatherProvider(ABC):
+    """OpenWeather-shaped payloads, which is what the rest of the API reads."""
+    name = "weather"
+
+    @abstractmethod
+    def geocode(self, place: str) -> list:
+        """[{"lat": ..., "lon": ...}] best match first; empty when the place is unknown."""
+
+    @abstractmethod
+    async def ageocode(self, place: str) -> list:
+        """geocode() for async callers."""
+
+    @abstractmethod
+    async def current(self, lat: float, lon: float) -> dict:
+        """{"weather": [{"description": ...}], "main": {"temp": ..., "humidity": ...}}"""
+
+    @abstractmethod
+    async def history(self, lat: float, lon: float, moment: datetime) -> dict:
+        """{"current": {"temp": ..., "humidity": ..., "weather": [{"description": ...}]}}"""
+
+
+class OpenWeatherProvider(WeatherProvider):
+    name = "openweather"
+
+    def __init__(self, base_url: str, api_key: str):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+
+    def geocode(self, place):
+        def request():
+            return resilience.raise_for_status(upstream.get_client().get(
+                f"{self.base_url}/geo/1.0/direct", params={"q": place, "limit": 1, "appid": self.api_key},
+                timeout=resilience.timeout(self.name),
+            ))
+        return resilience.call_sync(self.name, request).json()
+
+    async def ageocode(self, place):
+        return await self._get("/geo/1.0/direct", {"q": place, "limit": 1})
+
+    async def current(self, lat, lon):
+        return await self._get("/data/2.5/weather", {"lat": lat, "lon": lon, "units": "metric"})
+
+    async def history(self, lat, lon, moment):
+        return await self._get(
+            "/data/3.0/onecall/timemachine", {"lat": lat, "lon": lon, "dt": int(moment.timestamp()), "units": "metric"}
+        )
+
+    async def _get(self, path: str, params: dict):
+        async def request():
+            return resilience.raise_for_status(await upstream.get_async_client().get(
+                f"{self.base_url}{path}", params={**params, "appid": self.api_key}
+            ))
+        response = await resilience.call(self.name, request, hedge=True)
+        return response.json()
+
+
+class FakeWeatherProvider(WeatherProvider):
+    """Deterministic weather for local development and tests; no network."""
+    name = "fake-weather"
+    CONDITIONS = ("clear sky", "few clouds", "scattered clouds", "light rain", "overcast clouds", "moderate rain", "snow")
+
+    def geocode(self, place):
+        key = place.strip().lower()
+        return [{"name": place, "lat": -40 + _pick(key, 8000) / 100, "lon": -120 + _pick(key[::-1], 24000) / 100}]
+
+    async def ageocode(self, place):
+        return self.geocode(place)
+
+    def _observation(self, seed: str) -> dict:
+        return {
+            "temp": 5 + _pick(seed, 300) / 10,
+            "humidity": 30 + _pick(seed, 60),
+            "weather": [{"description": self.CONDITIONS[_pick(seed, len(self.CONDITIONS))]}],
+        }
+
+    async def current(self, lat, lon):
+        observation = self._observation(f"{lat:.2f},{lon:.2f}")
+        return {"weather": observation.pop("weather"), "main": observation}
+
+    async def history(self, lat, lon, moment):
+        return {"current": self._observation(f"{lat:.2f},{lon:.2f},{moment.date()}")}
+
+
+# ---------- LLM ----------
+
+class LLMProvider(ABC):
+    name = "llm"
+
+    def __init__(self, model: str):
+        self.model = model
+
+    @abstractmethod
+    def generate(self, prompt: str) -> str:
+        """The generated text for a prompt."""
+
+    @abstractmethod
+    async def agenerate(self, prompt: str) -> str:
+        """generate() for async callers."""
+
+    async def astream(self, prompt: str):
+        """Yield the generated text chunk by chunk; by default all of it at once."""
+        yield await self.agenerate(prompt)
+
+
+class GeminiProvider(LLMProvider):
+    """The Gemini REST API over the shared keep-alive client."""
+    name = "gemini"
+
+    def __init__(self, model: str, api_key: str, endpoint: str = ""):
+        super().__init__(model)
+        self.api_key = api_key
+        self.endpoint = (endpoint or DEFAULT_GEMINI_ENDPOINT).rstrip("/")
+
+    def _url(self, method: str) -> str:
+        return f"{self.endpoint}/v1beta/{self.model}:{method}"
+
+    def _request(self, prompt: str) -> dict:
+        return {
+            "headers": {"x-goog-api-key": self.api_key},
+            "json": {"contents": [{"role": "user", "parts": [{"text": prompt}]}]},
+            "timeout": settings.llm_timeout_seconds,
+        }
+
+    @staticmethod
+    def _text(payload: dict) -> str:
+        candidates = payload.get("candidates") or []
+        parts = candidates[0].get("content", {}).get("parts", []) if candidates else []
+        return "".join(part.get("text", "") for part in parts)
+
+    def generate(self, prompt):
+        def request():
+            return upstream.get_client().post(self._url("generateContent"), **self._request(prompt)).raise_for_status()
+        return self._text(resilience.call_sync(self.name, request).json()).strip()
+
+    async def agenerate(self, prompt):
+        async def request():
+            response = await upstream.get_async_client().post(self._url("generateContent"), **self._request(prompt))
+            return response.raise_for_status()
+        return self._text((await resilience.call(self.name, request)).json()).strip()
+
+    async def astream(self, prompt):
+        # Not retried: part of the answer may already be on its way to the client.
+        async with resilience.guard(self.name):
+            async with upstream.get_async_client().stream(
+                    "POST", self._url("streamGenerateContent"), params={"alt": "sse"}, **self._request(prompt)
+            ) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if line.startswith("data:"):
+                        text = self._text(json.loads(line[5:]))
+                        if text:
+                            yield text
+
+
+class GeminiSDKProvider(LLMProvider):
+    """Gemini through google-generativeai (gRPC), configured once per process."""
+    name = "gemini"
+    _configured = False
+    _configure_lock = threading.Lock()
+
+    def __init__(self, model: str, api_key: str):
+        super().__init__(model)
+        import google.generativeai as genai
+        with self._configure_lock:
+            if not GeminiSDKProvider._configured:
+                genai.configure(api_key=api_key)
+                GeminiSDKProvider._configured = True
+        self._model = genai.GenerativeModel(model)
+
+    @staticmethod
+    def _text(gemini_response) -> str:
+        return gemini_response.text.strip() if hasattr(gemini_response, 'text') else str(gemini_response)
+
+    def generate(self, prompt):
+        # The pinned SDK takes no per-call deadline, so the sync path retries but cannot time out.
+        return self._text(resilience.call_sync(self.name, lambda: self._model.generate_content(prompt)))
+
+    async def agenerate(self, prompt):
+        return self._text(await resilience.call(self.name, lambda: self._model.generate_content_async(prompt)))
+
+    async def astream(self, prompt):
+        async with resilience.guard(self.name):
+            response = await self._model.generate_content_async(prompt, stream=True)
+            async for chunk in response:
+                text = chunk.text
+                if text:
+                    yield text
+
+
+class FakeLLMProvider(LLMProvider):
+    """Canned, deterministic analyses for local development and tests; no network."""
+    name = "fake-llm"
+
+    def generate(self, prompt):
+        score = 1 + _pick(prompt, 9)
+        action = "approve" if score >= 7 else "monitor" if score >= 4 else "avoid"
+        return (
+            f"Feasibility score: {score}/10\n"
+            "- Strengths: consistent audit history.\n"
+            "- Risks: delivery variance and weather exposure.\n"
+            f"- Recommended action: {action}."
+        )
+
+    async def agenerate(self, prompt):
+        return self.generate(prompt)
+
+    async def astream(self, prompt):
+        for line in self.generate(prompt).splitlines(keepends=True):
+            yield line
+
+
+# ---------- Selection ----------
+
+WEATHER_PROVIDERS = {
+    "openweather": lambda: OpenWeatherProvider(settings.openweather_base_url, settings.openweather_api_key),
+    "fake": FakeWeatherProvider,
+}
+LLM_PROVIDERS = {
+    "gemini": lambda model: GeminiProvider(model, settings.gemini_api_key, settings.gemini_api_endpoint),
+    "gemini-sdk": lambda model: GeminiSDKProvider(model, settings.gemini_api_key),
+    "fake": FakeLLMProvider,
+}
+
+_lock = threading.Lock()
+_weather = None
+_llms = {}  # profile -> LLMProvider
+
+
+def _choose(registry: dict, name: str, setting: str):
+    try:
+        return registry[name]
+    except KeyError:
+        raise ValueError(f"Unknown {setting} {name!r}; expected one of {', '.join(registry)}") from None
+
+
+def weather() -> WeatherProvider:
+    global _weather
+    if _weather is None:
+        with _lock:
+            if _weather is None:
+                _weather = _choose(WEATHER_PROVIDERS, settings.weather_provider, "weather_provider")()
+    return _weather
+
+
+def llm(profile: str = "interactive") -> LLMProvider:
+    """The LLM for interactive requests, or for "bulk" background work."""
+    provider = _llms.get(profile)
+    if provider is None:
+        with _lock:
+            provider = _llms.get(profile)
+            if provider is None:
+                name, model = settings.llm_provider, settings.llm_model
+                if profile == "bulk":
+                    name, model = settings.llm_bulk_provider or name, settings.llm_bulk_model or model
+                provider = _choose(LLM_PROVIDERS, name, "llm_provider")(model)
+                _llms[profile] = provider
+    return provider
+
+
+def init():
+    """Create the configured providers now, so a bad setting or a missing SDK fails at startup."""
+    weather()
+    llm("interactive")
+    llm("bulk")
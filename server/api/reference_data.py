@@ -0,0 +1,239 @@
+import hashlib
+import os
+import threading
+import numpy as np
+import pandas as pd
+from .config import settings
+
+SUPPLIER_DATA_PATH = "uploads/Task_Supplier_Data.xlsx"
+COMPLIANCE_DATA_PATH = "uploads/Task_Compliance_Records.xlsx"
+
+
+def _file_digest(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class ReferenceDataset:
+    """
+    A reference workbook parsed once and kept in memory.
+
+    The parsed frame is also written to the reference cache dir as Parquet, keyed by
+    the source file's content hash, so a restarted worker skips the openpyxl parse.
+    The source is only re-read when its mtime/size changes *and* its hash differs.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stat = None
+        self._digest = None
+        self._frame = None
+
+    @property
+    def digest(self) -> str:
+        self._ensure_loaded()
+        return self._digest
+
+    def frame(self) -> pd.DataFrame:
+        self._ensure_loaded()
+        return self._frame
+
+    def _ensure_loaded(self):
+        # Raises FileNotFoundError when the source workbook is missing.
+        st = os.stat(self.path)
+        stat_key = (st.st_mtime_ns, st.st_size)
+        if stat_key == self._stat:
+            return
+        with self._lock:
+            if stat_key == self._stat:
+                return
+            digest = _file_digest(self.path)
+            if digest != self._digest:
+                self._frame = self._load(digest)
+                self._digest = digest
+            self._stat = stat_key
+
+    def _cache_path(self, digest: str) -> str:
+        stem = os.path.splitext(os.path.basename(self.path))[0]
+        return os.path.join(settings.reference_cache_dir, f"{stem}-{digest[:16]}.parquet")
+
+    def _prune_cache(self, keep: str):
+        # Drop Parquet copies of earlier versions of this workbook.
+        stem = os.path.splitext(os.path.basename(self.path))[0]
+        for name in os.listdir(settings.reference_cache_dir):
+            path = os.path.join(settings.reference_cache_dir, name)
+            if name.startswith(f"{stem}-") and name.endswith(".parquet") and path != keep:
+                os.remove(path)
+
+    def _load(self, digest: str) -> pd.DataFrame:
+        cache_path = self._cache_path(digest)
+        if os.path.exists(cache_path):
+            try:
+                return pd.read_parquet(cache_path)
+            except Exception:
+                pass  # corrupt or unreadable cache, fall back to the workbook
+
+        frame = pd.read_excel(self.path)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(settings.reference_cache_dir, exist_ok=True)
+            frame.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, cache_path)
+            self._prune_cache(keep=cache_path)
+        except Exception:
+            # No parquet engine installed or mixed-type columns; the in-memory copy is enough.
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return frame
+
+
+# ---------- Prompt profile ----------
+
+CHARS_PER_TOKEN = 4  # rough Gemini average for English text and numbers
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _fmt(value) -> str:
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return "n/a"
+    return f"{value:.3g}" if isinstance(value, (float, np.floating)) else str(value)
+
+
+def _pct(value) -> str:
+    return "n/a" if value is None or np.isnan(value) else f"{value:.0%}"
+
+
+def _distribution(values: pd.Series) -> str:
+    values = pd.to_numeric(values, errors="coerce").dropna()
+    if values.empty:
+        return "no data"
+    q = values.quantile([0.1, 0.25, 0.5, 0.75, 0.9])
+    return (
+        f"n={len(values)} mean={_fmt(values.mean())} sd={_fmt(values.std())} min={_fmt(values.min())} "
+        f"p10={_fmt(q[0.1])} p25={_fmt(q[0.25])} p50={_fmt(q[0.5])} p75={_fmt(q[0.75])} p90={_fmt(q[0.9])} "
+        f"max={_fmt(values.max())}"
+    )
+
+
+def _frequencies(values: pd.Series, limit: int = 8) -> str:
+    counts = values.fillna("unknown").astype(str).str.strip().value_counts()
+    shares = [f"{name} {count / counts.sum():.0%}" for name, count in counts.head(limit).items()]
+    if len(counts) > limit:
+        shares.append(f"{len(counts) - limit} others {counts.iloc[limit:].sum() / counts.sum():.0%}")
+    return ", ".join(shares)
+
+
+def _leading_number(values: pd.Series) -> pd.Series:
+    return pd.to_numeric(values.astype(str).str.extract(r"(-?\d+(?:\.\d+)?)")[0], errors="coerce")
+
+
+class ReferenceProfile:
+    """
+    Summary statistics of the reference workbooks, rendered as a compact prompt section.
+
+    Prompts used to paste the first rows of each workbook; the profile describes the whole
+    dataset in a fraction of the tokens. Statistics are recomputed only when either workbook
+    changes, and render() keeps whole lines, most important first, up to a token budget.
+    """
+
+    def __init__(self, suppliers: ReferenceDataset, compliance: ReferenceDataset):
+        self.suppliers = suppliers
+        self.compliance = compliance
+        self._lock = threading.Lock()
+        self._digests = None
+        self._lines = None
+        self._rendered = {}
+
+    def key(self, max_tokens: int = None):
+        """Identifies render(max_tokens) for cache keys."""
+        return [self.suppliers.digest, self.compliance.digest, max_tokens or settings.reference_profile_max_tokens]
+
+    def render(self, max_tokens: int = None) -> str:
+        max_tokens = max_tokens or settings.reference_profile_max_tokens
+        # Raises FileNotFoundError when a workbook is missing.
+        digests = (self.suppliers.digest, self.compliance.digest)
+        with self._lock:
+            if digests != self._digests:
+                self._lines = self._compute(self.suppliers.frame(), self.compliance.frame())
+                self._digests = digests
+                self._rendered = {}
+            text = self._rendered.get(max_tokens)
+            if text is None:
+                kept, used = [], 0
+                for line in self._lines:
+                    cost = estimate_tokens(line) + 1  # + newline
+                    if used + cost > max_tokens:
+                        break
+                    kept.append(line)
+                    used += cost
+                text = "\n".join(kept)
+                self._rendered[max_tokens] = text
+            return text
+
+    def _compute(self, suppliers: pd.DataFrame, compliance: pd.DataFrame) -> list:
+        status = compliance["status"].fillna("").astype(str).str.strip()
+        passed = status.str.lower().isin(["pass", "compliant"])
+        dates = pd.to_datetime(compliance["date_recorded"], errors="coerce")
+        lines = [
+            f"Reference data: {len(suppliers)} suppliers, {len(compliance)} compliance records "
+            f"({_fmt(dates.min().date() if dates.notna().any() else None)} to "
+            f"{_fmt(dates.max().date() if dates.notna().any() else None)}).",
+            f"Compliance score: {_distribution(suppliers['compliance_score'])}",
+            f"Record status: {_frequencies(status)}",
+        ]
+
+        for metric, group in compliance.groupby(compliance["metric"].fillna("unknown")):
+            line = f"Metric {metric}: {len(group)} records, pass {_pct(passed[group.index].mean())}; status {_frequencies(status[group.index], 4)}"
+            numbers = _leading_number(group["result"])
+            if numbers.notna().mean() >= 0.5:
+                line += f"; result {_distribution(numbers)}"
+            else:
+                line += f"; result {_frequencies(group['result'], 4)}"
+            lines.append(line)
+
+        by_supplier = pd.DataFrame({"supplier_id": compliance["supplier_id"], "passed": passed})
+        pass_rate = by_supplier.groupby("supplier_id")["passed"].mean()
+        lines.append(f"Per-supplier pass rate: {_distribution(pass_rate)}")
+
+        if "country" in suppliers:
+            countries = suppliers.assign(
+                pass_rate=suppliers["supplier_id"].map(pass_rate) if "supplier_id" in suppliers else np.nan
+            ).groupby(suppliers["country"].fillna("unknown"))
+            parts = [
+                f"{country} n={len(group)} score {_fmt(group['compliance_score'].mean())} pass {_pct(group['pass_rate'].mean())}"
+                for country, group in sorted(countries, key=lambda item: -len(item[1]))
+            ]
+            lines.append("By country: " + "; ".join(parts))
+
+        for column in ("risk_level", "status"):
+            if column in suppliers:
+                lines.append(f"Supplier {column.replace('_', ' ')}: {_frequencies(suppliers[column])}")
+
+        if "contract_terms" in suppliers:
+            terms = suppliers["contract_terms"].astype(str)
+            delivery = _leading_number(terms.str.extract(r"delivery_time\W+([^,}]*)")[0])
+            lines.append(f"Contract delivery time (days): {_distribution(delivery)}")
+            quality = terms.str.extract(r"quality_standard\W+(\w+)")[0]
+            if quality.notna().any():
+                lines.append(f"Quality standards: {_frequencies(quality)}")
+            discount = _leading_number(terms.str.extract(r"discount_rate\W+([^,}]*)")[0])
+            if discount.notna().any():
+                lines.append(f"Discount rate (%): {_distribution(discount)}")
+
+        if "last_audit" in suppliers:
+            audits = pd.to_datetime(suppliers["last_audit"], errors="coerce")
+            age = (audits.max() - audits).dt.days
+            lines.append(f"Days since last audit (vs newest audit): {_distribution(age)}")
+        return lines
+
+
+reference_suppliers = ReferenceDataset(SUPPLIER_DATA_PATH)
+reference_compliance = ReferenceDataset(COMPLIANCE_DATA_PATH)
+reference_profile = ReferenceProfile(reference_suppliers, reference_compliance)
@@ -0,0 +1,325 @@
+"""
+Timeouts, retries, circuit breakers and hedging for outbound calls.
+
+Every call to OpenWeather or Gemini goes through call() (or call_sync() / guard() for the
+sync and streaming paths), which for each upstream:
+
+- holds a slot of its concurrency limiter and bounds each attempt with the upstream's timeout
+  (openweather_timeout_seconds, llm_timeout_seconds), so a hung upstream frees the worker
+- retries timeouts, connection errors, 429 and 5xx answers up to *_retries times, sleeping
+  a random ("full jitter") share of an exponential backoff in between; other 4xx answers
+  are the caller's problem and are raised at once
+- counts consecutive failures in a CircuitBreaker: after circuit_failure_threshold of them
+  the upstream is considered down and calls fail at once with UpstreamUnavailable (503)
+  for circuit_reset_seconds, then a single probe call decides whether it closes again
+- for idempotent GETs with openweather_hedge_after_ms set, sends a second copy of a request
+  that has not answered after that delay and keeps whichever answers first
+
+Breaker state and retry, failure and hedge counts are in the Prometheus metrics and in
+GET /metrics/upstreams.
+"""
+import asyncio
+import logging
+import random
+import threading
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Optional
+import httpx
+from fastapi import APIRouter, HTTPException, status
+from prometheus_client import Counter, Gauge
+from . import metrics, upstream
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE = ("timeout", "connection", "status")
+
+RETRIES = Counter("upstream_retries_total", "Outbound calls retried after a failed attempt.", ["upstream"])
+FAILURES = Counter("upstream_failures_total", "Failed outbound attempts.", ["upstream", "reason"])
+SHORT_CIRCUITED = Counter("upstream_short_circuited_total", "Calls refused while the circuit was open.", ["upstream"])
+HEDGES = Counter("upstream_hedged_requests_total", "Hedge requests sent, by which copy answered.", ["upstream", "winner"])
+CIRCUIT_STATE = Gauge("upstream_circuit_state", "Circuit breaker state: 0 closed, 1 half-open, 2 open.", ["upstream"])
+
+
+class UpstreamUnavailable(HTTPException):
+    """Raised without calling the upstream while its circuit is open."""
+
+    def __init__(self, upstream_name: str, retry_after: float):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"{upstream_name} is unavailable, please retry later",
+            headers={"Retry-After": str(max(1, round(retry_after)))},
+        )
+        self.upstream = upstream_name
+
+
+@dataclass
+class Policy:
+    timeout: float
+    retries: int
+    hedge_after: Optional[float] = None  # seconds; None disables hedging
+
+
+def policy(upstream_name: str) -> Policy:
+    if upstream_name == "openweather":
+        return Policy(
+            timeout=settings.openweather_timeout_seconds,
+            retries=settings.openweather_retries,
+            hedge_after=settings.openweather_hedge_after_ms / 1000 or None,
+        )
+    if upstream_name == "gemini":
+        return Policy(timeout=settings.llm_timeout_seconds, retries=settings.gemini_retries)
+    return Policy(timeout=settings.upstream_timeout_seconds, retries=0)
+
+
+def backoff(attempt: int) -> float:
+    """Full jitter: uniform between 0 and base * 2^attempt, capped."""
+    cap = min(settings.upstream_backoff_max_seconds, settings.upstream_backoff_base_seconds * 2 ** attempt)
+    return random.uniform(0, cap)
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code
+    code = getattr(error, "code", None)  # google.api_core exceptions (gemini-sdk)
+    return code if isinstance(code, int) else None
+
+
+def failure_reason(error: BaseException) -> Optional[str]:
+    """Why an attempt counts against the upstream, or None when the upstream is fine."""
+    if isinstance(error, (asyncio.TimeoutError, httpx.TimeoutException)):
+        return "timeout"
+    if isinstance(error, httpx.TransportError):
+        return "connection"
+    code = _status_code(error)
+    if code is not None:
+        return "status" if code == 429 or code >= 500 else None
+    return None if isinstance(error, HTTPException) else "error"
+
+
+def retryable(error: BaseException) -> bool:
+    return failure_reason(error) in RETRYABLE
+
+
+def raise_for_status(response: httpx.Response) -> httpx.Response:
+    """Raise on 429 and 5xx only; OpenWeather answers other errors with a payload callers read."""
+    if response.status_code == 429 or response.status_code >= 500:
+        response.raise_for_status()
+    return response
+
+
+# ---------- Circuit breaker ----------
+
+class CircuitBreaker:
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+    _GAUGE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.failures = 0  # consecutive
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()  # sync calls come from the threadpool
+        self.stats = {"calls": 0, "failures": 0, "retries": 0, "short_circuited": 0, "hedged": 0, "opened": 0}
+        CIRCUIT_STATE.labels(name).set(0)
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            logger.warning("Circuit for %s is now %s", self.name, state)
+            self.state = state
+            CIRCUIT_STATE.labels(self.name).set(self._GAUGE[state])
+
+    def retry_after(self) -> float:
+        return max(self.opened_at + self.reset_seconds - time.monotonic(), 0)
+
+    def before_call(self):
+        """Raise UpstreamUnavailable unless a call may go out now."""
+        with self._lock:
+            if self.state == self.OPEN and self.retry_after() == 0:
+                self._set_state(self.HALF_OPEN)
+            if self.state == self.OPEN or (self.state == self.HALF_OPEN and self._probing):
+                self.stats["short_circuited"] += 1
+                SHORT_CIRCUITED.labels(self.name).inc()
+                raise UpstreamUnavailable(self.name, self.retry_after() or self.reset_seconds)
+            if self.state == self.HALF_OPEN:
+                self._probing = True
+            self.stats["calls"] += 1
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._probing = False
+            self._set_state(self.CLOSED)
+
+    def record_failure(self, reason: str):
+        FAILURES.labels(self.name, reason).inc()
+        with self._lock:
+            self.stats["failures"] += 1
+            self.failures += 1
+            self._probing = False
+            if self.state == self.HALF_OPEN or (self.failure_threshold and self.failures >= self.failure_threshold):
+                if self.state != self.OPEN:
+                    self.stats["opened"] += 1
+                self.opened_at = time.monotonic()
+                self._set_state(self.OPEN)
+
+    def release(self):
+        """A call ended without telling whether the upstream is healthy (cancelled, 4xx)."""
+        with self._lock:
+            self._probing = False
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "retry_after_seconds": round(self.retry_after(), 1) if self.state == self.OPEN else 0,
+                **self.stats,
+            }
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker(upstream_name: str) -> CircuitBreaker:
+    found = _breakers.get(upstream_name)
+    if found is None:
+        with _breakers_lock:
+            found = _breakers.get(upstream_name)
+            if found is None:
+                found = CircuitBreaker(upstream_name, settings.circuit_failure_threshold, settings.circuit_reset_seconds)
+                _breakers[upstream_name] = found
+    return found
+
+
+def snapshot() -> dict:
+    return {name: b.snapshot() for name, b in sorted(_breakers.items())}
+
+
+def _settle(circuit: CircuitBreaker, error: Optional[BaseException]) -> Optional[str]:
+    reason = failure_reason(error) if error is not None else None
+    if error is None:
+        circuit.record_success()
+    elif reason is not None:
+        circuit.record_failure(reason)
+    else:
+        circuit.release()
+    return reason
+
+
+# ---------- Calls ----------
+
+@asynccontextmanager
+async def guard(upstream_name: str):
+    """One attempt: breaker check, concurrency slot, latency tracking and outcome. No timeout
+    or retry, for streams whose output cannot be replayed."""
+    circuit = breaker(upstream_name)
+    circuit.before_call()
+    error = None
+    try:
+        async with upstream.limiter(upstream_name):
+            with metrics.track(upstream_name):
+                yield
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        if isinstance(error, (asyncio.CancelledError, GeneratorExit)):
+            circuit.release()
+        else:
+            _settle(circuit, error)
+
+
+async def _attempt(upstream_name: str, request, timeout: float):
+    async with guard(upstream_name):
+        return await asyncio.wait_for(request(), timeout)
+
+
+async def _hedged(upstream_name: str, request, timeout: float, hedge_after: float):
+    first = asyncio.ensure_future(_attempt(upstream_name, request, timeout))
+    done, _ = await asyncio.wait({first}, timeout=hedge_after)
+    if done:
+        return first.result()
+    second = asyncio.ensure_future(_attempt(upstream_name, request, timeout))
+    running = {first, second}
+    try:
+        while running:
+            done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    winner = "hedge" if task is second else "primary"
+                    HEDGES.labels(upstream_name, winner).inc()
+                    breaker(upstream_name).stats["hedged"] += 1
+                    return task.result()
+        HEDGES.labels(upstream_name, "none").inc()
+        raise first.exception()
+    finally:
+        for task in running:
+            task.cancel()
+
+
+async def call(upstream_name: str, request, hedge: bool = False):
+    """
+    Await `request()` (a coroutine function doing one HTTP call) under the upstream's policy.
+    Pass hedge=True only for idempotent requests.
+    """
+    rules = policy(upstream_name)
+    attempt = 0
+    while True:
+        try:
+            if hedge and rules.hedge_after:
+                return await _hedged(upstream_name, request, rules.timeout, rules.hedge_after)
+            return await _attempt(upstream_name, request, rules.timeout)
+        except UpstreamUnavailable:
+            raise
+        except Exception as e:
+            if attempt >= rules.retries or not retryable(e):
+                raise
+            logger.info("%s attempt %d failed (%r), retrying", upstream_name, attempt + 1, e)
+        attempt += 1
+        RETRIES.labels(upstream_name).inc()
+        breaker(upstream_name).stats["retries"] += 1
+        await asyncio.sleep(backoff(attempt))
+
+
+def call_sync(upstream_name: str, request):
+    """call() for the sync paths (threadpool routes, the job runner); `request` must apply
+    timeout(upstream_name) itself."""
+    rules = policy(upstream_name)
+    circuit = breaker(upstream_name)
+    attempt = 0
+    while True:
+        circuit.before_call()
+        try:
+            with metrics.track(upstream_name):
+                result = request()
+        except Exception as e:
+            if _settle(circuit, e) not in RETRYABLE or attempt >= rules.retries:
+                raise
+            logger.info("%s attempt %d failed (%r), retrying", upstream_name, attempt + 1, e)
+        else:
+            circuit.record_success()
+            return result
+        attempt += 1
+        RETRIES.labels(upstream_name).inc()
+        circuit.stats["retries"] += 1
+        time.sleep(backoff(attempt))
+
+
+def timeout(upstream_name: str) -> float:
+    return policy(upstream_name).timeout
+
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics/upstreams")
+def get_upstream_stats():
+    """Circuit state and call, failure, retry and hedge counts per upstream since start."""
+    return snapshot()
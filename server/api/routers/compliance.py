@@ -1,13 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import date
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Response, UploadFile
 from sqlalchemy.orm import Session
-from typing import List
-from .. import crud, schemas, database
+from typing import List, Literal, Optional
+from .. import crud, schemas, database, importer, pagination
 
 router = APIRouter(prefix="/compliance", tags=["compliance"])
 
 @router.get("/", response_model=List[schemas.ComplianceRecord])
-def list_records(skip: int = 0, limit: int = 100, db: Session = Depends(database.get_db)):
-    return crud.get_all_records(db, skip, limit)
+def list_records(
+    response: Response,
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    supplier_id: Optional[int] = None,
+    metric: Optional[str] = None,
+    status: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: Session = Depends(database.get_db)
+):
+    records, next_cursor = crud.get_all_records(
+        db, skip, limit, cursor,
+        supplier_id=supplier_id, metric=metric, status=status, date_from=date_from, date_to=date_to,
+    )
+    pagination.set_next_cursor(response, next_cursor)
+    return records
 
 @router.get("/supplier/{supplier_id}", response_model=List[schemas.ComplianceRecord])
 def get_supplier_records(supplier_id: int, db: Session = Depends(database.get_db)):
@@ -17,6 +34,44 @@ def get_supplier_records(supplier_id: int, db: Session = Depends(database.get_db
 def create_record(record: schemas.ComplianceRecordCreate, db: Session = Depends(database.get_db)):
     return crud.create_compliance_record(db, record)
 
+@router.post("/import")
+def import_records(file: UploadFile = File(...), db: Session = Depends(database.get_db)):
+    try:
+        rows = importer.iter_rows(file.file, file.filename or "")
+        return importer.import_compliance_records(db, rows).as_dict()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+BatchMode = Literal["atomic", "best_effort"]
+
+def _batch_response(db: Session, ids, errors, mode: str, returning: bool):
+    if mode == "atomic" and errors:
+        raise HTTPException(status_code=422, detail={"message": "Batch rejected, nothing was written", "errors": errors})
+    records = None
+    if returning:
+        records = [r for r in crud.get_records_by_ids(db, [i for i in ids if i is not None]) if r is not None]
+    return {"mode": mode, "ids": ids, "errors": errors, "records": records}
+
+@router.post("/batch", response_model=schemas.ComplianceRecordBatchResult)
+def create_records_batch(
+    batch: schemas.ComplianceRecordBatchCreate,
+    mode: BatchMode = "atomic",
+    returning: bool = False,
+    db: Session = Depends(database.get_db)
+):
+    ids, errors = crud.create_compliance_records_batch(db, batch.items, atomic=mode == "atomic")
+    return _batch_response(db, ids, errors, mode, returning)
+
+@router.patch("/batch", response_model=schemas.ComplianceRecordBatchResult)
+def update_records_batch(
+    batch: schemas.ComplianceRecordBatchUpdate,
+    mode: BatchMode = "atomic",
+    returning: bool = False,
+    db: Session = Depends(database.get_db)
+):
+    ids, errors = crud.update_compliance_records_batch(db, batch.items, atomic=mode == "atomic")
+    return _batch_response(db, ids, errors, mode, returning)
+
 @router.delete("/{record_id}", response_model=schemas.ComplianceRecord)
 def delete_record(record_id: int, db: Session = Depends(database.get_db)):
     result = crud.delete_compliance_record(db, record_id)
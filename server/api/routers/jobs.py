@@ -0,0 +1,32 @@
+from fastapi import APIRouter, Depends, Query, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from .. import database, jobs, schemas
+from ..config import settings
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+@router.post("/", response_model=schemas.Job, status_code=202)
+async def submit_job(
+    request: Request,
+    response: Response,
+    job: schemas.JobCreate,
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    user_id = int(request.headers.get("x-user-id", 1))
+    queued = await jobs.submit(db, job.kind, job.params, user_id)
+    response.headers["Location"] = f"/jobs/{queued.id}"
+    return queued
+
+
+@router.get("/{job_id}", response_model=schemas.Job)
+async def get_job(
+    request: Request,
+    job_id: str,
+    wait: float = Query(0, ge=0, le=settings.job_max_wait_seconds, description="Seconds to wait for the job to finish"),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    user_id = int(request.headers.get("x-user-id", 1))
+    # Job state changes under the reader; replicas could lag behind it.
+    database.use_primary(db)
+    return await jobs.wait_for_job(db, job_id, user_id, wait)
@@ -1,39 +1,110 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, Request, Response, UploadFile
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
-import pandas as pd
-from dotenv import load_dotenv
-import os
-import google.generativeai as genai
-from fastapi import APIRouter, HTTPException, Query
-from .. import crud, schemas, database, models
-load_dotenv() 
+from typing import List, Optional
+from datetime import datetime, timedelta
+import json
+import logging
+from .. import analyses, crud, crud_async, schemas, database, models, importer, pagination, spatial, streaming
 
 router = APIRouter(prefix="/suppliers", tags=["suppliers"])
-GEMINI_KEY = os.getenv("GEMINI_API_KEY")
-genai.configure(api_key=GEMINI_KEY)
+logger = logging.getLogger(__name__)
 
 
 @router.get("/", response_model=List[schemas.Supplier])
-async def read_suppliers(request: Request, skip: int=0, limit: int=100, db: Session=Depends(database.get_db)):
+async def read_suppliers(
+    request: Request,
+    response: Response,
+    skip: int=0,
+    limit: int=Query(100, ge=1, le=1000),
+    cursor: Optional[str]=None,
+    db: AsyncSession=Depends(database.get_async_db)
+):
     user_id = int(request.headers.get("x-user-id", 1))
-    print("Fetching suppliers for user_id:", user_id)
-    return crud.get_suppliers(db, user_id, skip, limit)
+    logger.debug("Fetching suppliers for user_id %s", user_id)
+    suppliers, next_cursor = await crud_async.get_suppliers(db, user_id, skip, limit, cursor)
+    pagination.set_next_cursor(response, next_cursor)
+    return suppliers
 
-from fastapi import Request
 
 @router.post("/", response_model=schemas.Supplier)
-async def add_supplier(request: Request, supplier: schemas.SupplierCreate, db: Session=Depends(database.get_db)):
+async def add_supplier(request: Request, supplier: schemas.SupplierCreate, db: AsyncSession=Depends(database.get_async_db)):
     user_id = int(request.headers.get("x-user-id", 1))
-    print("Received supplier data:", supplier.dict(), "user_id:", user_id)
+    logger.debug("Adding supplier %r for user_id %s", supplier.name, user_id)
     try:
-        result = crud.create_supplier(db, supplier, user_id)
+        result = await crud_async.create_supplier(db, supplier, user_id)
         return result
     except Exception as e:
-        print("Exception in add_supplier:", e)
+        logger.exception("Failed to add supplier")
         raise HTTPException(status_code=500, detail=f"Failed to add supplier: {e}")
 
 
+@router.post("/import")
+def import_suppliers(
+    request: Request,
+    file: UploadFile = File(...),
+    defaults: Optional[str] = Form(None, description="JSON object of values for fields a row leaves empty"),
+    db: Session = Depends(database.get_db)
+):
+    user_id = int(request.headers.get("x-user-id", 1))
+    try:
+        field_defaults = json.loads(defaults) if defaults else {}
+        rows = importer.iter_rows(file.file, file.filename or "")
+        return importer.import_suppliers(db, rows, user_id, field_defaults).as_dict()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# GET /suppliers/scores (declared before /{supplier_id} so it isn't captured by it)
+@router.get("/scores")
+def get_supplier_scores(
+    request: Request,
+    user_lat: Optional[float] = Query(None, ge=-90, le=90),
+    user_lon: Optional[float] = Query(None, ge=-180, le=180),
+    limit: int = Query(50, ge=1, le=1000),
+    db: Session = Depends(database.get_db)
+):
+    """Suppliers ranked by the local scoring engine (no LLM); distance counts when a location is given."""
+    from .. import scoring  # pandas, loaded on first use
+    user_id = int(request.headers.get("x-user-id", 1))
+    suppliers = scoring.load_suppliers(db, user_id)
+    records = scoring.load_records(db, suppliers["id"].tolist())
+    ranked = scoring.rank(records, suppliers, user_lat, user_lon)
+    return scoring.as_rows(ranked.head(limit))
+
+
+# GET /suppliers/nearby
+@router.get("/nearby", response_model=List[schemas.SupplierNearby])
+def get_nearby_suppliers(
+    request: Request,
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    k: int = Query(10, ge=1, le=1000),
+    within_km: Optional[float] = Query(None, gt=0),
+    db: Session = Depends(database.get_db)
+):
+    """The k suppliers nearest to (lat, lon), nearest first; suppliers without coordinates are left out."""
+    user_id = int(request.headers.get("x-user-id", 1))
+    spatial.index.ensure_loaded(db)
+    found = spatial.index.nearest(lat, lon, k, user_id=user_id, within_km=within_km)
+    by_id = {
+        s.id: s for s in db.query(models.Supplier).filter(models.Supplier.id.in_([i for i, _ in found]))
+    }
+    nearby = []
+    for supplier_id, distance_km in found:
+        supplier = by_id.get(supplier_id)
+        if supplier is not None:
+            supplier.distance_km = round(distance_km, 2)
+            nearby.append(supplier)
+    return nearby
+
+
+# GET /suppliers/insights (declared before /{supplier_id} so it isn't captured by it)
+@router.get("/insights")
+def generate_supplier_insights(supplier_id: int = Query(...), db: Session = Depends(database.get_db)):
+    return analyses.supplier_insights(db, supplier_id)
+
+
 # GET /suppliers/{supplier_id}
 @router.get("/{supplier_id}", response_model=schemas.Supplier)
 def read_supplier(supplier_id: int, db: Session=Depends(database.get_db)):
@@ -44,9 +115,6 @@ def read_supplier(supplier_id: int, db: Session=Depends(database.get_db)):
 
 
 # GET /suppliers/{supplier_id}/metrics
-from datetime import datetime, timedelta
-from fastapi import Query
-
 @router.get("/{supplier_id}/metrics")
 def get_supplier_metrics(
     supplier_id: int,
@@ -60,12 +128,6 @@ def get_supplier_metrics(
       ...
     ]
     """
-    # Get all records for this supplier
-    records = crud.get_records_by_supplier(db, supplier_id)
-    if not records:
-        return []
-
-    # Prepare for chart: group by month, average value
     now = datetime.now()
     if range == '6M':
         start_date = now - timedelta(days=31*6)
@@ -73,30 +135,14 @@ def get_supplier_metrics(
         start_date = now - timedelta(days=366)
     else:
         start_date = None
+    # Records on the start day itself fall before the cutoff time, as in the datetime comparison before.
+    start_day = start_date.date() + timedelta(days=1) if start_date else None
 
-    # Filter records by date (ensure both are datetime)
-    filtered = [
-    r for r in records
-    if not start_date or datetime.combine(r.date_recorded, datetime.min.time()) >= start_date
-]
-
-
-    # Group by month for chart
-    month_map = {}
-    for r in filtered:
-        month = r.date_recorded.strftime('%Y-%m')
-        if month not in month_map:
-            month_map[month] = []
-        month_map[month].append(r)
-
-    chart_data = []
-    for month in sorted(month_map.keys()):
-        vals = [float(r.result) for r in month_map[month] if r.result is not None]
-        avg = round(sum(vals)/len(vals), 1) if vals else None
-        chart_data.append({
-            "month": month,
-            "value": avg,
-        })
+    # Chart: monthly average of results, aggregated in the database
+    chart_data = [
+        {"month": month, "value": round(avg, 1) if avg is not None else None}
+        for month, avg in crud.get_monthly_averages(db, supplier_id, start_day)
+    ]
 
     # Table data: most recent 10 records (descending)
     table_data = [
@@ -108,8 +154,12 @@ def get_supplier_metrics(
             "date_recorded": r.date_recorded.strftime('%Y-%m-%d'),
             "notes": getattr(r, 'notes', None),
         }
-        for r in sorted(filtered, key=lambda x: x.date_recorded, reverse=True)[:10]
+        for r in crud.get_recent_records(db, supplier_id, start_day, limit=10)
     ]
+    if not table_data and not db.query(models.ComplianceRecord.id).filter(
+        models.ComplianceRecord.supplier_id == supplier_id
+    ).first():
+        return []
 
     # For frontend: send both chart and table data
     return {
@@ -119,120 +169,17 @@ def get_supplier_metrics(
 
 @router.post("/check-compliance/{supplier_id}")
 def check_compliance(supplier_id: int, db: Session = Depends(database.get_db)):
-    try:
-        reference_suppliers = pd.read_excel("uploads/Task_Supplier_Data.xlsx")
-        reference_compliance = pd.read_excel("uploads/Task_Compliance_Records.xlsx")
-    except FileNotFoundError:
-        raise HTTPException(status_code=404, detail="Reference Excel files not found")
-
-    supplier = db.query(models.Supplier).filter(models.Supplier.id == supplier_id).first()
-    if not supplier:
-        raise HTTPException(status_code=404, detail="Supplier not found")
-
-    records = db.query(models.ComplianceRecord).filter(models.ComplianceRecord.supplier_id == supplier_id).all()
-    if not records:
-        raise HTTPException(status_code=404, detail="No compliance records found for this supplier.")
-
-    compliance_summary = "\n".join([
-        f"- {r.metric} on {r.date_recorded.strftime('%Y-%m-%d')}: {r.result} ({r.status})"
-        for r in records[-5:]
-    ])
-
-    prompt = f"""
-You are an expert supply chain compliance analyst.
-
-Analyze the compliance performance of Supplier "{supplier.name}" (ID: {supplier_id}) in comparison to other suppliers using the dataset provided.
-
-### Supplier Information:
-- Country: {supplier.country}
-- Risk Level: {supplier.risk_level}
-- Status: {supplier.status}
-- Compliance Score: {supplier.compliance_score}
-- Last Audit: {supplier.last_audit}
-
-### Supplier's Compliance Records:
-{compliance_summary}
-
-### Overall Dataset Snapshot (All Suppliers - Sample):
-{reference_suppliers.head(15).to_string(index=False)}
-
-### All Compliance Records (first 20 rows of dataset):
-{reference_compliance.head(20).to_string(index=False)}
-
-Please do not mention any limitations about the dataset size or content. Limit your response to a maximum of 4000 characters, and focus on actionable insights only.
-Please answer:
-1. How does Supplier {supplier_id}'s reliability compare to the average?
-2. Are there any patterns of delays, failures, or inconsistencies?
-3. Predict future reliability and risks.
-4. Give a reliability score out of 10 and justify.
-5. Recommend 2 action points for the compliance team.
-"""
-
-    try:
-        model = genai.GenerativeModel('models/gemini-1.5-flash')
-        gemini_response = model.generate_content(prompt)
-        analysis = gemini_response.text.strip() if hasattr(gemini_response, 'text') else str(gemini_response)
-        return {"analysis": analysis}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Gemini error: {str(e)}")
-
-
-@router.get("/insights")
-def generate_supplier_insights(supplier_id: int = Query(...), db: Session = Depends(database.get_db)):
-    try:
-        reference_suppliers = pd.read_excel("uploads/Task_Supplier_Data.xlsx")
-        reference_compliance = pd.read_excel("uploads/Task_Compliance_Records.xlsx")
-    except FileNotFoundError:
-        raise HTTPException(status_code=500, detail="Reference Excel files not found")
-
-    supplier = db.query(models.Supplier).filter(models.Supplier.id == supplier_id).first()
-    if not supplier:
-        raise HTTPException(status_code=404, detail="Supplier not found")
+    return analyses.check_compliance(db, supplier_id)
 
-    records = db.query(models.ComplianceRecord).filter(models.ComplianceRecord.supplier_id == supplier_id).all()
-    if not records:
-        raise HTTPException(status_code=404, detail="No compliance records found for this supplier.")
 
-    history = "\n".join([
-        f"- {r.metric} on {r.date_recorded.strftime('%Y-%m-%d')}: {r.result} ({r.status})"
-        for r in records[-5:]
-    ])
+# Server-Sent Events variants: text is forwarded as Gemini generates it (see api/streaming.py).
+@router.get("/check-compliance/{supplier_id}/stream")
+async def stream_check_compliance(supplier_id: int, db: AsyncSession = Depends(database.get_async_db)):
+    analysis = await db.run_sync(analyses.prepare_check_compliance, supplier_id)
+    return streaming.event_stream(streaming.stream_analysis(analysis))
 
-    prompt = f"""
-You are a procurement compliance assistant.
 
-Based on the following supplier details and compliance history, generate:
-
-1. Key weaknesses or compliance issues.
-2. At least 2 suggestions to improve the supplier's compliance.
-3. Recommended contract term adjustments (like audit frequency, stricter penalties, incentives, etc.).
-
-SUPPLIER INFO:
-- Name: {supplier.name}
-- Country: {supplier.country}
-- Status: {supplier.status}
-- Risk Level: {supplier.risk_level}
-- Compliance Score: {supplier.compliance_score}
-- Last Audit: {supplier.last_audit}
-
-COMPLIANCE HISTORY (last 5 records):
-{history}
-
-REFERENCE DATA (first 15 suppliers & 20 compliance records):
-{reference_suppliers.head(15).to_string(index=False)}
-
-{reference_compliance.head(20).to_string(index=False)}
-
-Please do not mention any limitations about the dataset size or content. Limit your response to a maximum of 4000 characters, and focus on actionable insights only.
-"""
-
-    try:
-        model = genai.GenerativeModel('models/gemini-1.5-flash')
-        gemini_response = model.generate_content(prompt)
-        insights = gemini_response.text.strip() if hasattr(gemini_response, 'text') else str(gemini_response)
-        return {
-            "supplier": supplier.name,
-            "insights": insights
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Gemini processing failed: {str(e)}")
+@router.get("/insights/stream")
+async def stream_supplier_insights(supplier_id: int = Query(...), db: AsyncSession = Depends(database.get_async_db)):
+    analysis = await db.run_sync(analyses.prepare_supplier_insights, supplier_id)
+    return streaming.event_stream(streaming.stream_analysis(analysis))
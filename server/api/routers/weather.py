@@ -1,46 +1,36 @@
 from fastapi import APIRouter, HTTPException, Query, Depends, Body
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
 from datetime import datetime, timedelta
-import httpx, os
-import google.generativeai as genai
+import logging
 from datetime import datetime
-from dotenv import load_dotenv
-from .. import models, database
-import pandas as pd
-import re
-import math
-
-load_dotenv()
+from .. import analyses, crud_async, models, database, geocoding, weather_history, llm, llm_cache, scoring_terms
+from ..config import settings
+from ..weather_cache import current_weather
 
 router = APIRouter(prefix="/weather", tags=["weather"])
-
-OW_API_KEY = os.getenv("OPENWEATHER_API_KEY")
-GEMINI_KEY = os.getenv("GEMINI_API_KEY")
-genai.configure(api_key=GEMINI_KEY)
+logger = logging.getLogger(__name__)
 
 
-BASE_URL = "https://api.openweathermap.org/data/2.5"
+# Bump when a prompt template changes so cached LLM responses are not reused.
+WEATHER_IMPACT_PROMPT_VERSION = 1
 
-def get_coordinates_for_city(city: str):
-    geo_url = f"http://api.openweathermap.org/geo/1.0/direct?q={city}&limit=1&appid={OW_API_KEY}"
-    res = httpx.get(geo_url).json()
-    if not res:
-        raise HTTPException(status_code=404, detail="City not found")
-    return res[0]["lat"], res[0]["lon"]
 
-@router.get("/today/{supplier_id}")
-def get_today_weather(supplier_id: int, db: Session = Depends(database.get_db)):
-    supplier = db.query(models.Supplier).filter(models.Supplier.id == supplier_id).first()
+async def _supplier_location(db: AsyncSession, supplier_id: int):
+    supplier = await db.get(models.Supplier, supplier_id)
     if not supplier:
         raise HTTPException(status_code=404, detail="Supplier not found")
-    # Use city for coordinates if available, else fallback to country
-    city = getattr(supplier, 'city', None) or supplier.country
-    lat, lon = get_coordinates_for_city(city)
-    weather_url = f"{BASE_URL}/weather?lat={lat}&lon={lon}&appid={OW_API_KEY}&units=metric"
-    data = httpx.get(weather_url).json()
+    return supplier, await geocoding.supplier_coordinates_async(db, supplier)
+
+@router.get("/today/{supplier_id}")
+async def get_today_weather(supplier_id: int, db: AsyncSession = Depends(database.get_async_db)):
+    supplier, (lat, lon) = await _supplier_location(db, supplier_id)
+    data = await current_weather.get(lat, lon)
+    if "weather" not in data or "main" not in data:
+        raise HTTPException(status_code=502, detail="Weather data unavailable for this location.")
     return {
         "supplier": supplier.name,
-        "location": city,
+        "location": geocoding.supplier_place(supplier),
         "lat": lat,
         "lon": lon,
         "condition": data["weather"][0]["description"],
@@ -48,138 +38,32 @@ def get_today_weather(supplier_id: int, db: Session = Depends(database.get_db)):
         "humidity": data["main"].get("humidity")
     }
 
-@router.get("/history/{supplier_id}")
-def get_weather_history(supplier_id: int, db: Session = Depends(database.get_db)):
-    supplier = db.query(models.Supplier).filter(models.Supplier.id == supplier_id).first()
-    if not supplier:
-        raise HTTPException(status_code=404, detail="Supplier not found")
+@router.get("/cache-stats")
+def get_weather_cache_stats():
+    return current_weather.stats()
 
-    # Use city for coordinates if available, else fallback to country
-    city = getattr(supplier, 'city', None) or supplier.country
-    lat, lon = get_coordinates_for_city(city)
-    end = int(datetime.now().timestamp())
-    results = []
-    for i in range(1, 8):
-        dt = end - i * 86400
-        url = f"https://api.openweathermap.org/data/3.0/onecall/timemachine?lat={lat}&lon={lon}&dt={dt}&appid={OW_API_KEY}&units=metric"
-        res = httpx.get(url).json()
-        if "current" in res:
-            current = res["current"]
-            results.append({
-                "date": str(datetime.fromtimestamp(dt).date()),
-                "temperature": current.get("temp"),
-                "condition": current.get("weather", [{}])[0].get("description", ""),
-                "humidity": current.get("humidity")
-            })
+@router.get("/history/{supplier_id}")
+async def get_weather_history(
+    supplier_id: int,
+    days: int = Query(settings.weather_history_days, ge=1, le=settings.weather_history_max_days),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    supplier, (lat, lon) = await _supplier_location(db, supplier_id)
     return {
         "supplier": supplier.name,
-        "location": city,
-        "history": results
+        "location": geocoding.supplier_place(supplier),
+        "history": await weather_history.daily_history(db, lat, lon, days)
     }
 
 @router.get("/recommend-supplier/")
-def recommend_supplier(
+async def recommend_supplier(
     user_lat: float = Query(...),
     user_lon: float = Query(...),
-    db: Session = Depends(database.get_db)
+    k: Optional[int] = Query(None, ge=1, description="Only evaluate the k nearest suppliers"),
+    within_km: Optional[float] = Query(None, gt=0, description="Only evaluate suppliers within this distance"),
+    db: AsyncSession = Depends(database.get_async_db)
 ):
-    def haversine(lat1, lon1, lat2, lon2):
-        R = 6371  # Earth radius in km
-        phi1, phi2 = math.radians(lat1), math.radians(lat2)
-        delta_phi = math.radians(lat2 - lat1)
-        delta_lambda = math.radians(lon2 - lon1)
-
-        a = math.sin(delta_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda / 2) ** 2
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-        return R * c
-
-    suppliers = db.query(models.Supplier).all()
-    suggestions = []
-    best_score = -1
-    best_supplier_data = None
-
-    try:
-        reference_compliance_df = pd.read_excel("uploads/Task_Compliance_Records.xlsx")
-        reference_snapshot = reference_compliance_df.head(15).to_string(index=False)
-    except Exception:
-        raise HTTPException(status_code=500, detail="Static compliance dataset not found in /uploads.")
-
-    for supplier in suppliers:
-        try:
-            lat, lon = get_coordinates_for_city(supplier.city)
-            distance_km = haversine(user_lat, user_lon, lat, lon)
-
-            weather_url = f"{BASE_URL}/weather?lat={lat}&lon={lon}&appid={OW_API_KEY}&units=metric"
-            data = httpx.get(weather_url).json()
-            weather = data["weather"][0]["description"]
-            temp = data["main"]["temp"]
-
-            records = db.query(models.ComplianceRecord).filter(models.ComplianceRecord.supplier_id == supplier.id).all()
-            db_compliance_summary = "\n".join([
-                f"- {r.metric} on {r.date_recorded}: {r.result} ({r.status})"
-                for r in records[-5:]
-            ]) if records else "No compliance records found."
-
-            prompt = f"""
-You are evaluating suppliers for a procurement system.
-
-Below is a REFERENCE dataset of past supplier compliance examples:
-{reference_snapshot}
-Please do not mention any limitations about the dataset size or content. Limit your response to a maximum of 4000 characters, and focus on actionable insights only.
-
-Now evaluate this LIVE supplier:
-- Name: {supplier.name}
-- Country: {supplier.country}
-- Risk Level: {supplier.risk_level}
-- Status: {supplier.status}
-- Current Weather: {weather}, {temp}°C
-- Distance from user: {distance_km:.2f} km
-
-RECENT COMPLIANCE HISTORY:
-{db_compliance_summary}
-
-Return:
-1. Feasibility score (out of 10)
-2. Strengths & risks
-3. Should the user select them today?
-4. Recommended action (approve, monitor, avoid)
-"""
-
-            model = genai.GenerativeModel('models/gemini-1.5-flash')
-            gemini_response = model.generate_content(prompt)
-            recommendation = gemini_response.text.strip() if hasattr(gemini_response, 'text') else str(gemini_response)
-
-            # Try to extract feasibility score using regex
-            score_match = re.search(r"(\d+(?:\.\d+)?)\s*/\s*10", recommendation)
-            score = float(score_match.group(1)) if score_match else 0
-
-            supplier_info = {
-                "supplier": supplier.name,
-                "weather": weather,
-                "temperature": temp,
-                "distance_km": round(distance_km, 2),
-                "risk_level": supplier.risk_level,
-                "status": supplier.status,
-                "feasibility_score": score,
-                "recommendation": recommendation
-            }
-
-            if score > best_score:
-                best_score = score
-                best_supplier_data = supplier_info
-
-            suggestions.append(supplier_info)
-
-        except Exception as e:
-            suggestions.append({
-                "supplier": supplier.name,
-                "error": f"Failed to evaluate: {str(e)}"
-            })
-
-    return {
-        "results": suggestions,
-        "best_supplier": best_supplier_data
-    }
+    return await analyses.recommend_supplier(db, user_lat, user_lon, k, within_km)
 
 @router.post("/check-weather-impact")
 async def check_weather_impact(
@@ -187,35 +71,31 @@ async def check_weather_impact(
     latitude: float = Body(...),
     longitude: float = Body(...),
     delivery_date: str = Body(...),
-    db: Session = Depends(database.get_db)
+    db: AsyncSession = Depends(database.get_async_db)
 ):
     """
     Checks weather impact for a supplier's delivery and updates compliance if adverse weather is detected.
     """
 
-    print(f"[Weather Impact] Received: supplier_id={supplier_id}, latitude={latitude}, longitude={longitude}, delivery_date={delivery_date}")
+    logger.debug("Weather impact: supplier_id=%s latitude=%s longitude=%s delivery_date=%s",
+                 supplier_id, latitude, longitude, delivery_date)
     # Parse delivery date
     try:
         dt = int(datetime.strptime(delivery_date, "%Y-%m-%d").timestamp())
     except Exception:
-        print("[Weather Impact] Invalid delivery_date format.")
         raise HTTPException(status_code=400, detail="Invalid delivery_date format. Use YYYY-MM-DD.")
 
 
-    print(f"[Weather Impact] Using OW_API_KEY: {OW_API_KEY}")
     # Use 2.5 endpoint for current weather (no historical data in free tier)
-    url = f"https://api.openweathermap.org/data/2.5/weather?lat={latitude}&lon={longitude}&appid={OW_API_KEY}&units=metric"
-    print(f"[Weather Impact] Weather API URL: {url}")
-    res = httpx.get(url).json()
-    print(f"[Weather Impact] Weather API response: {res}")
+    res = await current_weather.get(latitude, longitude)
     if "weather" not in res or "main" not in res:
-        print("[Weather Impact] Weather data not found for the given date/location.")
+        logger.warning("Weather impact: no weather data for %s, %s: %s", latitude, longitude, res)
         raise HTTPException(status_code=404, detail="Weather data not found for the given date/location.")
     weather_desc = res["weather"][0]["description"].lower()
-    adverse = any(word in weather_desc for word in ["rain", "snow", "storm", "thunder", "hail", "extreme"])
+    adverse = scoring_terms.is_adverse_weather(weather_desc)
 
     # Get supplier name for prompt and response
-    supplier = db.query(models.Supplier).filter(models.Supplier.id == supplier_id).first()
+    supplier = await db.get(models.Supplier, supplier_id)
     supplier_name = supplier.name if supplier else f"ID {supplier_id}"
 
     # Compose Gemini prompt
@@ -224,27 +104,37 @@ Delivery scheduled for {delivery_date} at lat {latitude}, lon {longitude} for su
 Weather forecast: '{weather_desc}'.
 Advise if delivery may be affected and what actions to take. Format your response for a business/procurement dashboard, with a clear summary and bullet points for actions.
 """
-    try:
-        print(f"[Weather Impact] Gemini prompt: {prompt}")
-        print(f"[Weather Impact] Gemini key in use: {GEMINI_KEY}")
-        model = genai.GenerativeModel('models/gemini-1.5-flash')
-        gemini_response = model.generate_content(prompt)
-        recommendation = gemini_response.text.strip() if hasattr(gemini_response, 'text') else str(gemini_response)
-    except Exception as e:
-        print(f"[Weather Impact] Gemini error: {str(e)}")
-        recommendation = f"Gemini error: {str(e)}"
+    cache_key = llm_cache.cache_key(llm.model_name(), "weather_impact", WEATHER_IMPACT_PROMPT_VERSION, {
+        "supplier_id": supplier_id,
+        "supplier_name": supplier_name,
+        "location": [latitude, longitude],
+        "delivery_date": delivery_date,
+        "weather": weather_desc,
+    })
+    recommendation = await db.run_sync(llm_cache.lookup, cache_key)
+    cached = recommendation is not None
+    if not cached:
+        try:
+            logger.debug("Weather impact prompt: %s", prompt)
+            recommendation = await llm.agenerate(prompt)
+            # Not tagged with the supplier: the advice only depends on the keyed inputs, and the
+            # weather-delay record written below would otherwise invalidate it immediately.
+            await db.run_sync(llm_cache.store, cache_key, llm.model_name(), "weather_impact", WEATHER_IMPACT_PROMPT_VERSION, recommendation)
+        except Exception as e:
+            logger.warning("Weather impact: Gemini error: %s", e)
+            recommendation = f"Gemini error: {str(e)}"
+    await db.run_sync(llm_cache.commit)
 
     # Update compliance record if adverse weather
     compliance_update = None
     if adverse:
-       
-        from .. import crud
-        compliance_update = crud.create_or_update_compliance_weather_delay(db, supplier_id, delivery_date)
+        compliance_update = await crud_async.create_or_update_compliance_weather_delay(db, supplier_id, delivery_date)
 
     return {
         "adverse_weather": adverse,
         "weather": weather_desc,
         "recommendation": recommendation,
+        "cached": cached,
         "compliance_updated": bool(compliance_update),
         "supplier": supplier_name,
         "date": delivery_date
@@ -1,7 +1,7 @@
 
 from pydantic import BaseModel
-from typing import Optional, List, Dict
-from datetime import date
+from typing import Optional, List, Dict, Literal
+from datetime import date, datetime
 
 class UserBase(BaseModel):
     email: str
@@ -50,10 +50,16 @@ class Supplier(SupplierBase):
     id: int
     compliance_score: Optional[int]
     last_audit: Optional[date]
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
 
     class Config:
         from_attributes = True 
 
+
+class SupplierNearby(Supplier):
+    distance_km: float
+
 # ComplianceRecord Schemas 
 
 class ComplianceRecordBase(BaseModel):
@@ -81,4 +87,57 @@ class ComplianceRecord(ComplianceRecordBase):
     class Config:
         from_attributes = True
 
+# Batch write schemas
+
+class ComplianceRecordBatchUpdateItem(BaseModel):
+    id: int
+    metric: Optional[str] = None
+    date_recorded: Optional[date] = None
+    result: Optional[float] = None
+    status: Optional[str] = None
+
+class ComplianceRecordBatchCreate(BaseModel):
+    items: List[ComplianceRecordCreate]
+
+class ComplianceRecordBatchUpdate(BaseModel):
+    items: List[ComplianceRecordBatchUpdateItem]
+
+class BatchItemError(BaseModel):
+    index: int
+    error: str
 
+class ComplianceRecordBatchResult(BaseModel):
+    mode: Literal["atomic", "best_effort"]
+    ids: List[Optional[int]]
+    errors: List[BatchItemError] = []
+    records: Optional[List[ComplianceRecord]] = None
+
+# Background jobs
+
+class SupplierAnalysisParams(BaseModel):
+    supplier_id: int
+
+class RecommendSupplierParams(BaseModel):
+    user_lat: float
+    user_lon: float
+    k: Optional[int] = None
+    within_km: Optional[float] = None
+
+class JobCreate(BaseModel):
+    kind: Literal["check_compliance", "supplier_insights", "recommend_supplier"]
+    params: Dict = {}
+
+class Job(BaseModel):
+    id: str
+    kind: str
+    status: Literal["queued", "running", "succeeded", "failed"]
+    result: Optional[Dict] = None
+    error: Optional[str] = None
+    error_code: Optional[int] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,192 @@
+import re
+from datetime import date
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from . import models
+from .scoring_terms import BAD_STATUSES, GOOD_STATUSES, SUMMARY_COLUMNS, WEATHER_EXCUSED_STATUS
+from .spatial import haversine_km
+
+# Deterministic supplier scoring. Features come from one vectorized pass over
+# compliance_records and are combined with distance and current weather into a 0-10 score,
+# used to rank suppliers without an LLM call and to pick the few that are worth one.
+
+TREND_HALF_LIFE_DAYS = 90  # a record this old counts half as much as one from today
+DISTANCE_SCALE_KM = 2000  # distance component is exp(-distance / scale)
+NEUTRAL = 0.5  # component value when there is no data to judge by
+
+# Relative weights of the score components; components without data for a supplier are left
+# out and the remaining weights renormalized.
+WEIGHTS = {
+    "recent_pass_rate": 0.35,
+    "on_time_rate": 0.20,
+    "compliance_score": 0.15,
+    "trend": 0.10,
+    "weather_resilience": 0.05,
+    "distance": 0.10,
+    "current_weather": 0.05,
+}
+
+RECORD_COLUMNS = ["supplier_id", "metric", "date_recorded", "result", "status"]
+SUPPLIER_COLUMNS = ["id", "name", "compliance_score", "contract_terms", "latitude", "longitude"]
+
+_DAYS = re.compile(r"(\d+(?:\.\d+)?)")
+
+
+# ---------- Loading ----------
+
+def load_records(db: Session, supplier_ids=None) -> pd.DataFrame:
+    record = models.ComplianceRecord
+    query = select(record.supplier_id, record.metric, record.date_recorded, record.result, record.status)
+    if supplier_ids is not None:
+        query = query.where(record.supplier_id.in_(list(supplier_ids)))
+    return pd.DataFrame(db.execute(query).all(), columns=RECORD_COLUMNS)
+
+
+def load_suppliers(db: Session, user_id: int = None) -> pd.DataFrame:
+    supplier = models.Supplier
+    query = select(*(getattr(supplier, c) for c in SUPPLIER_COLUMNS))
+    if user_id is not None:
+        query = query.where(supplier.user_id == user_id)
+    return pd.DataFrame(db.execute(query).all(), columns=SUPPLIER_COLUMNS)
+
+
+def summary_frame(rows) -> pd.DataFrame:
+    """A records frame from scoring_terms.record_summary_query() rows, for supplier_features()."""
+    frame = pd.DataFrame(rows, columns=SUMMARY_COLUMNS)
+    frame["delivery"] = frame["delivery"].astype(bool)
+    return frame
+
+
+def suppliers_frame(suppliers) -> pd.DataFrame:
+    """The load_suppliers frame for ORM suppliers already in memory."""
+    return pd.DataFrame([[getattr(s, c) for c in SUPPLIER_COLUMNS] for s in suppliers], columns=SUPPLIER_COLUMNS)
+
+
+def promised_delivery_days(contract_terms) -> float:
+    """Days from a contract's delivery_time term ("within 7 days"), NaN when absent."""
+    if not isinstance(contract_terms, dict):
+        return np.nan
+    match = _DAYS.search(str(contract_terms.get("delivery_time", "")))
+    return float(match.group(1)) if match else np.nan
+
+
+# ---------- Features ----------
+
+def supplier_features(records: pd.DataFrame, suppliers: pd.DataFrame, today: date = None) -> pd.DataFrame:
+    """
+    One row per supplier (indexed by id) with:
+    records, pass_rate, recent_pass_rate (recency weighted), trend (recent minus overall),
+    delivery_delay_rate, weather_excused, compliance_score, and pass_rate:<metric> per metric.
+    Rates are NaN when a supplier has nothing to compute them from.
+
+    records is a load_records() frame, or a summary_frame() whose rows stand for n records
+    each; the summary has no metric names, so it gives no per-metric pass rates.
+    """
+    today = pd.Timestamp(today or date.today())
+    features = pd.DataFrame(index=pd.Index(suppliers["id"], name="supplier_id"))
+    features["compliance_score"] = pd.to_numeric(suppliers["compliance_score"], errors="coerce").to_numpy()
+
+    status = records["status"].fillna("").str.strip().str.lower()
+    passed = status.isin(GOOD_STATUSES)
+    graded = passed | status.isin(BAD_STATUSES)
+    excused = status == WEATHER_EXCUSED_STATUS
+    age_days = (today - pd.to_datetime(records["date_recorded"])).dt.days.clip(lower=0)
+    weight = np.power(0.5, age_days / TREND_HALF_LIFE_DAYS)
+
+    # Delivery records are late when the result (in days) exceeds the contract's delivery
+    # time; without both numbers the record's status decides.
+    promised = records["supplier_id"].map(
+        pd.Series(suppliers["contract_terms"].map(promised_delivery_days).to_numpy(), index=suppliers["id"])
+    )
+    result = pd.to_numeric(records["result"], errors="coerce")
+    if "delivery" in records:
+        delivery = records["delivery"] & ~excused
+    else:
+        delivery = records["metric"].fillna("").str.lower().str.contains("delivery") & ~excused
+    late = np.where(result.notna() & promised.notna(), result > promised, status.isin(BAD_STATUSES))
+    count = records["n"] if "n" in records else pd.Series(1, index=records.index)
+
+    frame = pd.DataFrame({
+        "supplier_id": records["supplier_id"],
+        "records": count,
+        "graded": graded * count,
+        "passed": passed * count,
+        "weighted": weight * graded * count,
+        "weighted_passed": weight * passed * count,
+        "excused": excused * count,
+        "delivery": (delivery & (graded | result.notna())) * count,
+        "late": (delivery & (graded | result.notna()) & late) * count,
+    })
+    totals = frame.groupby("supplier_id").sum().rename(columns={"excused": "weather_excused", "delivery": "deliveries"})
+    totals = totals.reindex(features.index)
+
+    features["records"] = totals["records"].fillna(0).astype(int)
+    features["pass_rate"] = totals["passed"] / totals["graded"].replace(0, np.nan)
+    features["recent_pass_rate"] = totals["weighted_passed"] / totals["weighted"].replace(0, np.nan)
+    features["trend"] = features["recent_pass_rate"] - features["pass_rate"]
+    features["delivery_delay_rate"] = totals["late"] / totals["deliveries"].replace(0, np.nan)
+    features["weather_excused"] = totals["weather_excused"].fillna(0).astype(int)
+
+    if "metric" in records:
+        by_metric = frame[graded].assign(metric=records["metric"]).groupby(["supplier_id", "metric"])["passed"].mean().unstack()
+        for metric in by_metric.columns:
+            features[f"pass_rate:{metric}"] = by_metric[metric].reindex(features.index)
+    return features
+
+
+# ---------- Score ----------
+
+def score(features: pd.DataFrame, distance_km: pd.Series = None, adverse_weather: pd.Series = None) -> pd.Series:
+    """0-10 score per supplier; distance and weather are optional Series indexed like features."""
+    components = pd.DataFrame({
+        "recent_pass_rate": features["recent_pass_rate"],
+        "on_time_rate": 1 - features["delivery_delay_rate"],
+        "compliance_score": (features["compliance_score"] / 100).clip(0, 1),
+        "trend": features["trend"].clip(-0.5, 0.5) + 0.5,
+        "weather_resilience": 1 / (1 + features["weather_excused"]),
+    }, index=features.index)
+    if distance_km is not None:
+        components["distance"] = np.exp(-distance_km.reindex(features.index).astype(float) / DISTANCE_SCALE_KM)
+    if adverse_weather is not None:
+        components["current_weather"] = 1 - adverse_weather.reindex(features.index).astype(float)
+
+    weights = pd.Series({c: WEIGHTS[c] for c in components.columns})
+    present = components.notna()
+    total = (components.fillna(0) * weights).sum(axis=1)
+    weight = (present * weights).sum(axis=1)
+    return (10 * total / weight.replace(0, np.nan)).fillna(10 * NEUTRAL).round(2)
+
+
+def rank(records: pd.DataFrame, suppliers: pd.DataFrame, user_lat: float = None, user_lon: float = None,
+         adverse_weather: pd.Series = None) -> pd.DataFrame:
+    """Features plus distance_km and score, best first."""
+    features = supplier_features(records, suppliers)
+    distance = None
+    if user_lat is not None and user_lon is not None:
+        distance = pd.Series(
+            haversine_km(user_lat, user_lon, suppliers["latitude"].astype(float), suppliers["longitude"].astype(float)),
+            index=features.index,
+        )
+        features["distance_km"] = distance.round(2)
+    features["score"] = score(features, distance, adverse_weather)
+    features.insert(0, "name", suppliers["name"].to_numpy())
+    return features.sort_values("score", ascending=False, kind="stable")
+
+
+def as_rows(ranked: pd.DataFrame) -> list:
+    """JSON-ready rows for the API; per-metric pass rates are grouped under pass_rate_by_metric."""
+    rows = []
+    metric_columns = [c for c in ranked.columns if c.startswith("pass_rate:")]
+    clean = ranked.astype(object).where(ranked.notna(), None)
+    for supplier_id, row in clean.iterrows():
+        item = {"supplier_id": int(supplier_id)}
+        for column, value in row.items():
+            if column not in metric_columns:
+                item[column] = value.item() if hasattr(value, "item") else value
+        item["pass_rate_by_metric"] = {
+            c.split(":", 1)[1]: (row[c].item() if hasattr(row[c], "item") else row[c]) for c in metric_columns
+        }
+        rows.append(item)
+    return rows
@@ -0,0 +1,40 @@
+from sqlalchemy import case, func, select
+from . import models
+
+# Status and weather vocabulary of the scoring engine, and the SQL side of it. Kept apart
+# from scoring.py so request paths can use them without importing pandas.
+
+GOOD_STATUSES = ("pass", "compliant")
+BAD_STATUSES = ("fail", "non-compliant")
+WEATHER_EXCUSED_STATUS = "excused - weather delay"
+ADVERSE_WEATHER_WORDS = ("rain", "snow", "storm", "thunder", "hail", "extreme")
+
+SUMMARY_COLUMNS = ["supplier_id", "date_recorded", "status", "delivery", "result", "n"]
+
+
+def is_adverse_weather(description: str) -> bool:
+    description = (description or "").lower()
+    return any(word in description for word in ADVERSE_WEATHER_WORDS)
+
+
+def record_summary_query(supplier_ids):
+    """
+    compliance_records of the given suppliers collapsed to what scoring.score() needs: one row
+    per supplier, day, status class (a representative status) and, for delivery metrics, result,
+    with the number of records in n. Columns are SUMMARY_COLUMNS.
+    """
+    record = models.ComplianceRecord
+    status = func.lower(func.trim(record.status))
+    status_class = case(
+        (status.in_(GOOD_STATUSES), GOOD_STATUSES[0]),
+        (status.in_(BAD_STATUSES), BAD_STATUSES[0]),
+        (status == WEATHER_EXCUSED_STATUS, WEATHER_EXCUSED_STATUS),
+        else_="",
+    )
+    delivery = func.lower(func.coalesce(record.metric, "")).like("%delivery%")
+    result = case((delivery, record.result))
+    return (
+        select(record.supplier_id, record.date_recorded, status_class, delivery, result, func.count())
+        .where(record.supplier_id.in_(list(supplier_ids)))
+        .group_by(record.supplier_id, record.date_recorded, status_class, delivery, result)
+    )
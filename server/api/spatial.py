@@ -0,0 +1,192 @@
+import math
+import threading
+import time
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from . import models
+from .config import settings
+
+# In-process spatial index over stored supplier coordinates: a lat/lon grid of
+# spatial_cell_degrees cells, with exact distances from a vectorized haversine.
+#
+# The index follows ORM writes to suppliers in this process as they commit (see the session
+# hooks at the bottom). Bulk Core writes call invalidate(), and the whole index is reloaded
+# every spatial_index_refresh_seconds to pick up writes made by other workers.
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+HALF_CIRCUMFERENCE_KM = math.pi * EARTH_RADIUS_KM
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km; accepts scalars or arrays."""
+    import numpy as np  # loaded on first use, like pandas in scoring; keeps startup fast
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=float)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+class SupplierIndex:
+    def __init__(self, cell_degrees: float, refresh_seconds: float):
+        self.cell_degrees = cell_degrees
+        self.refresh_seconds = refresh_seconds
+        self._columns = int(math.ceil(360 / cell_degrees))
+        self._lock = threading.RLock()
+        self._points = {}  # supplier id -> (user_id, lat, lon)
+        self._cells = {}  # (row, column) -> {supplier ids}
+        self._arrays = None  # (ids, user_ids, lats, lons) of every point, built on demand
+        self._loaded_at = None
+
+    # ---------- Maintenance ----------
+
+    def _cell(self, lat: float, lon: float):
+        row = int(math.floor(lat / self.cell_degrees))
+        column = int(math.floor((lon + 180) / self.cell_degrees)) % self._columns
+        return row, column
+
+    def load(self, db: Session):
+        supplier = models.Supplier
+        rows = db.execute(
+            select(supplier.id, supplier.user_id, supplier.latitude, supplier.longitude)
+            .where(supplier.latitude.isnot(None), supplier.longitude.isnot(None))
+        ).all()
+        with self._lock:
+            self._points, self._cells, self._arrays = {}, {}, None
+            for supplier_id, user_id, lat, lon in rows:
+                self._add(supplier_id, user_id, lat, lon)
+            self._loaded_at = time.monotonic()
+
+    def ensure_loaded(self, db: Session):
+        loaded_at = self._loaded_at
+        if loaded_at is None or time.monotonic() - loaded_at > self.refresh_seconds:
+            self.load(db)
+
+    def invalidate(self):
+        """Reload on the next query, e.g. after bulk writes that bypass the ORM."""
+        self._loaded_at = None
+
+    def _add(self, supplier_id, user_id, lat, lon):
+        self._points[supplier_id] = (user_id, lat, lon)
+        self._cells.setdefault(self._cell(lat, lon), set()).add(supplier_id)
+
+    def _discard(self, supplier_id):
+        old = self._points.pop(supplier_id, None)
+        if old is not None:
+            cell = self._cell(old[1], old[2])
+            members = self._cells.get(cell)
+            if members is not None:
+                members.discard(supplier_id)
+                if not members:
+                    del self._cells[cell]
+
+    def upsert(self, supplier_id: int, user_id: int, lat, lon):
+        with self._lock:
+            if self._loaded_at is None:
+                return  # the next load picks it up
+            self._discard(supplier_id)
+            if lat is not None and lon is not None:
+                self._add(supplier_id, user_id, float(lat), float(lon))
+            self._arrays = None
+
+    def remove(self, supplier_id: int):
+        with self._lock:
+            self._discard(supplier_id)
+            self._arrays = None
+
+    # ---------- Queries ----------
+
+    def _all_arrays(self):
+        import numpy as np
+        if self._arrays is None:
+            ids = np.fromiter(self._points.keys(), dtype=np.int64, count=len(self._points))
+            values = list(self._points.values())
+            self._arrays = (
+                ids,
+                np.array([v[0] if v[0] is not None else -1 for v in values], dtype=np.int64),
+                np.array([v[1] for v in values], dtype=float),
+                np.array([v[2] for v in values], dtype=float),
+            )
+        return self._arrays
+
+    def _candidate_ids(self, lat: float, lon: float, radius_km: float):
+        """Ids in the grid cells overlapping the radius, or None when a full scan is cheaper."""
+        dlat = radius_km / KM_PER_DEGREE
+        top, bottom = lat + dlat, lat - dlat
+        if top >= 90 or bottom <= -90:
+            return None
+        dlon = dlat / math.cos(math.radians(max(abs(top), abs(bottom))))
+        if dlon >= 180 or 2 * dlon >= 360 - self.cell_degrees:
+            return None
+        row_lo, col_lo = self._cell(bottom, lon - dlon)
+        row_hi, _ = self._cell(top, lon + dlon)
+        columns = int(math.floor((lon + dlon + 180) / self.cell_degrees)) - int(math.floor((lon - dlon + 180) / self.cell_degrees)) + 1
+        if (row_hi - row_lo + 1) * columns > len(self._cells):
+            return None
+        ids = []
+        for row in range(row_lo, row_hi + 1):
+            for offset in range(columns):
+                ids.extend(self._cells.get((row, (col_lo + offset) % self._columns), ()))
+        return ids
+
+    def within(self, lat: float, lon: float, radius_km: float, user_id: int = None):
+        """[(supplier id, distance km)] within radius_km, nearest first."""
+        import numpy as np
+        with self._lock:
+            candidates = self._candidate_ids(lat, lon, radius_km)
+            if candidates is None:
+                ids, users, lats, lons = self._all_arrays()
+            else:
+                points = [self._points[i] for i in candidates]
+                ids = np.array(candidates, dtype=np.int64)
+                users = np.array([p[0] if p[0] is not None else -1 for p in points], dtype=np.int64)
+                lats = np.array([p[1] for p in points], dtype=float)
+                lons = np.array([p[2] for p in points], dtype=float)
+        if not len(ids):
+            return []
+        distances = haversine_km(lat, lon, lats, lons)
+        mask = distances <= radius_km
+        if user_id is not None:
+            mask &= users == user_id
+        order = np.argsort(distances[mask], kind="stable")
+        return list(zip(ids[mask][order].tolist(), distances[mask][order].tolist()))
+
+    def nearest(self, lat: float, lon: float, k: int, user_id: int = None, within_km: float = None):
+        """The k nearest [(supplier id, distance km)], optionally no further than within_km."""
+        limit = min(within_km, HALF_CIRCUMFERENCE_KM) if within_km is not None else HALF_CIRCUMFERENCE_KM
+        # Grow the search radius until it holds k points; everything nearer than the
+        # k-th point is then inside the radius, so the answer is exact.
+        radius = min(self.cell_degrees * KM_PER_DEGREE, limit)
+        while True:
+            found = self.within(lat, lon, radius, user_id)
+            if len(found) >= k or radius >= limit:
+                return found[:k]
+            radius = min(radius * 2, limit)
+
+
+index = SupplierIndex(settings.spatial_cell_degrees, settings.spatial_index_refresh_seconds)
+
+
+# ---------- Following supplier writes ----------
+
+@event.listens_for(Session, "after_flush")
+def _collect_supplier_changes(session, flush_context):
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, models.Supplier):
+            session.info.setdefault("spatial_changes", {})[obj.id] = (obj.user_id, obj.latitude, obj.longitude)
+    for obj in session.deleted:
+        if isinstance(obj, models.Supplier):
+            session.info.setdefault("spatial_changes", {})[obj.id] = None
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_supplier_changes(session):
+    for supplier_id, point in session.info.pop("spatial_changes", {}).items():
+        if point is None:
+            index.remove(supplier_id)
+        else:
+            index.upsert(supplier_id, *point)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_supplier_changes(session):
+    session.info.pop("spatial_changes", None)
@@ -0,0 +1,63 @@
+import json
+import time
+from fastapi.responses import StreamingResponse
+from . import analyses, database, llm
+
+# Server-Sent Events for the insight endpoints. A stream is:
+#   event: start  {"cached": bool}
+#   event: chunk  {"text": "..."}            (repeated as Gemini produces text)
+#   event: done   {<same body as the JSON endpoint>, "timing": {...}}
+# or ends with `event: error {"detail": "..."}` if generation fails part-way.
+
+
+def sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def event_stream(events) -> StreamingResponse:
+    return StreamingResponse(events, media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",  # keep reverse proxies from buffering the stream
+    })
+
+
+def _timing(started: float, first_chunk: float, chunks: int) -> dict:
+    now = time.perf_counter()
+    return {
+        "first_chunk_ms": round((first_chunk - started) * 1000, 1) if first_chunk else None,
+        "total_ms": round((now - started) * 1000, 1),
+        "chunks": chunks,
+    }
+
+
+async def stream_analysis(analysis: analyses.PreparedAnalysis):
+    started = time.perf_counter()
+    yield sse("start", {"cached": analysis.cached is not None})
+
+    if analysis.cached is not None:
+        yield sse("chunk", {"text": analysis.cached})
+        yield sse("done", {
+            **analysis.extra, analysis.field: analysis.cached, "cached": True,
+            "timing": _timing(started, time.perf_counter(), 1),
+        })
+        return
+
+    parts, first_chunk = [], None
+    try:
+        async for text in llm.astream(analysis.prompt):
+            if first_chunk is None:
+                first_chunk = time.perf_counter()
+            parts.append(text)
+            yield sse("chunk", {"text": text})
+    except Exception as e:
+        yield sse("error", {"detail": f"Gemini error: {str(e)}"})
+        return
+
+    text = "".join(parts).strip()
+    # The request's session may already be closed while the body streams; use a fresh one.
+    async with database.AsyncSessionLocal() as db:
+        await db.run_sync(analyses.store_analysis, analysis, text)
+    yield sse("done", {
+        **analysis.extra, analysis.field: text, "cached": False,
+        "timing": _timing(started, first_chunk, len(parts)),
+    })
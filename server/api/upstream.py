@@ -0,0 +1,72 @@
+import asyncio
+import importlib.util
+import httpx
+from .config import settings
+
+# Shared outbound HTTP clients and per-upstream concurrency limits: one connection-pooled,
+# keep-alive client per process for sync and one for async callers (HTTP/2 when the h2
+# package is installed). The async client and the limiters are created lazily inside the
+# running event loop; start() opens both up front from the app's lifespan hook.
+
+_client = None
+_sync_client = None
+_limiters = {}
+
+
+def _client_options() -> dict:
+    return {
+        "http2": _http2_available(),
+        "timeout": httpx.Timeout(settings.upstream_timeout_seconds),
+        "limits": httpx.Limits(
+            max_connections=settings.openweather_concurrency * 2,
+            max_keepalive_connections=settings.openweather_concurrency,
+            keepalive_expiry=settings.upstream_keepalive_seconds,
+        ),
+    }
+
+
+def _http2_available() -> bool:
+    # httpx needs the optional h2 package for HTTP/2; look for it without importing it.
+    return settings.upstream_http2 and importlib.util.find_spec("h2") is not None
+
+
+def get_async_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(**_client_options())
+    return _client
+
+
+def get_client() -> httpx.Client:
+    global _sync_client
+    if _sync_client is None or _sync_client.is_closed:
+        _sync_client = httpx.Client(**_client_options())
+    return _sync_client
+
+
+def start():
+    get_async_client()
+    get_client()
+
+
+def limiter(upstream: str) -> asyncio.Semaphore:
+    sem = _limiters.get(upstream)
+    if sem is None:
+        limits = {
+            "openweather": settings.openweather_concurrency,
+            "gemini": settings.gemini_concurrency,
+        }
+        sem = asyncio.Semaphore(limits.get(upstream, 10))
+        _limiters[upstream] = sem
+    return sem
+
+
+async def aclose():
+    global _client, _sync_client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+    if _sync_client is not None:
+        _sync_client.close()
+        _sync_client = None
+    _limiters.clear()
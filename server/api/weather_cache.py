@@ -0,0 +1,82 @@
+import asyncio
+import time
+from . import providers
+from .config import settings
+
+
+class WeatherCache:
+    """
+    Current-weather observations keyed by rounded lat/lon with a TTL.
+
+    Concurrent misses for the same location share one upstream request (single flight).
+    Only well-formed observations are cached; error payloads are returned but not stored.
+    """
+
+    def __init__(self, ttl_seconds: float, precision: int):
+        self.ttl_seconds = ttl_seconds
+        self.precision = precision
+        self._entries = {}
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def key(self, lat: float, lon: float):
+        return round(float(lat), self.precision), round(float(lon), self.precision)
+
+    async def get(self, lat: float, lon: float) -> dict:
+        key = self.key(lat, lon)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self.hits += 1
+            return entry[1]
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(inflight)
+
+        self.misses += 1
+        task = asyncio.ensure_future(self._fetch(key))
+        self._inflight[key] = task
+        try:
+            return await asyncio.shield(task)
+        finally:
+            if task.done():
+                self._inflight.pop(key, None)
+            else:
+                # The caller was cancelled; let the fetch finish for the other waiters.
+                task.add_done_callback(lambda _: self._inflight.pop(key, None))
+
+    async def _fetch(self, key) -> dict:
+        data = await providers.weather().current(*key)
+        if "weather" in data and "main" in data:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, data)
+            self._evict_expired()
+        return data
+
+    def _evict_expired(self):
+        if len(self._entries) <= settings.weather_cache_max_entries:
+            return
+        now = time.monotonic()
+        for key in [k for k, (expires, _) in self._entries.items() if expires <= now]:
+            del self._entries[key]
+        # Still over budget: drop the entries closest to expiry.
+        overflow = len(self._entries) - settings.weather_cache_max_entries
+        if overflow > 0:
+            for key in sorted(self._entries, key=lambda k: self._entries[k][0])[:overflow]:
+                del self._entries[key]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_ratio": round((self.hits + self.coalesced) / lookups, 3) if lookups else None,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+
+current_weather = WeatherCache(settings.weather_cache_ttl_seconds, settings.weather_cache_precision)
@@ -0,0 +1,87 @@
+import asyncio
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from . import models, providers
+from .config import settings
+
+# Past days never change, so each (location, day) is fetched from OpenWeather at most
+# once and served from the weather_daily table afterwards.
+
+
+def _location_key(lat: float, lon: float):
+    return round(float(lat), settings.weather_cache_precision), round(float(lon), settings.weather_cache_precision)
+
+
+def _as_dict(row):
+    return {
+        "date": str(row.day),
+        "temperature": row.temperature,
+        "condition": row.condition,
+        "humidity": row.humidity,
+    }
+
+
+def _load_days(db: Session, lat: float, lon: float, days):
+    rows = db.query(models.WeatherDaily).filter(
+        models.WeatherDaily.latitude == lat,
+        models.WeatherDaily.longitude == lon,
+        models.WeatherDaily.day.in_(days),
+    ).all()
+    return {r.day: _as_dict(r) for r in rows}
+
+
+def _store_days(db: Session, rows):
+    """Insert weather_daily rows (dicts). Days a concurrent request stored first are skipped,
+    the rest are kept: past days never change, so both copies are the same."""
+    table = models.WeatherDaily.__table__
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        db.execute(insert(table).values(rows).on_conflict_do_nothing(
+            index_elements=[table.c.latitude, table.c.longitude, table.c.day]
+        ))
+    else:
+        for row in rows:
+            try:
+                with db.begin_nested():
+                    db.add(models.WeatherDaily(**row))
+            except IntegrityError:
+                pass
+    db.commit()
+
+
+async def daily_history(db: AsyncSession, lat: float, lon: float, days: int):
+    """Weather for each of the last `days` days, most recent first."""
+    lat, lon = _location_key(lat, lon)
+    now = datetime.now()
+    moments = [now - timedelta(days=i) for i in range(1, days + 1)]
+    stored = await db.run_sync(_load_days, lat, lon, [m.date() for m in moments])
+
+    missing = [m for m in moments if m.date() not in stored]
+    if missing:
+        fetched = await asyncio.gather(*(providers.weather().history(lat, lon, m) for m in missing), return_exceptions=True)
+        new_rows = []
+        for moment, res in zip(missing, fetched):
+            if isinstance(res, Exception) or "current" not in res:
+                continue
+            current = res["current"]
+            row = {
+                "latitude": lat,
+                "longitude": lon,
+                "day": moment.date(),
+                "temperature": current.get("temp"),
+                "condition": current.get("weather", [{}])[0].get("description", ""),
+                "humidity": current.get("humidity"),
+                "fetched_at": datetime.utcnow(),
+            }
+            stored[row["day"]] = _as_dict(models.WeatherDaily(**row))
+            new_rows.append(row)
+        if new_rows:
+            await db.run_sync(_store_days, new_rows)
+
+    return [stored[m.date()] for m in moments if m.date() in stored]
@@ -0,0 +1,142 @@
+"""
+Concurrent-request throughput of one worker: blocking vs async data access in async routes.
+
+Both handlers list a user's suppliers and make one upstream HTTP call, the shape of
+read_suppliers / get_today_weather / check_weather_impact:
+
+- blocking: sync Session from database.get_db and httpx.get inside `async def` (the old pattern)
+- async:    AsyncSession from database.get_async_db, crud_async and the shared AsyncClient
+
+Requests are driven in-process through httpx.ASGITransport, so every request shares one
+event loop exactly like a single uvicorn worker. The upstream is a local HTTP server that
+answers after --upstream-ms milliseconds.
+
+Keep --concurrency below the sync pool size (15 by default) for the blocking variant: past
+that it waits on pool checkout while blocking the loop that would return the connections,
+and stalls for the pool timeout.
+
+    DATABASE_URL=sqlite:///./bench.db python -m benchmarks.async_throughput --requests 200 --concurrency 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench_async_throughput.db")
+os.environ.setdefault("GEMINI_API_KEY", "")
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from api import crud, crud_async, database, models, upstream
+
+
+def start_upstream(delay_ms: int):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(delay_ms / 1000)
+            body = json.dumps({"weather": [{"description": "clear sky"}], "main": {"temp": 20}}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/weather"
+
+
+def seed(suppliers: int):
+    database.Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+    try:
+        if db.query(models.Supplier).filter(models.Supplier.user_id == 1).count() < suppliers:
+            db.add_all(
+                models.Supplier(
+                    name=f"Bench supplier {i}", country="India", city="Pune", contract_terms={},
+                    risk_level="Low", status="Active", compliance_score=80, user_id=1,
+                )
+                for i in range(suppliers)
+            )
+            db.commit()
+    finally:
+        db.close()
+
+
+def build_app(upstream_url: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/blocking")
+    async def blocking(db: Session = Depends(database.get_db)):
+        suppliers, _ = crud.get_suppliers(db, 1, limit=50)
+        weather = httpx.get(upstream_url).json()
+        return {"suppliers": len(suppliers), "weather": weather["weather"][0]["description"]}
+
+    @app.get("/async")
+    async def non_blocking(db: AsyncSession = Depends(database.get_async_db)):
+        suppliers, _ = await crud_async.get_suppliers(db, 1, limit=50)
+        weather = (await upstream.get_async_client().get(upstream_url)).json()
+        return {"suppliers": len(suppliers), "weather": weather["weather"][0]["description"]}
+
+    return app
+
+
+async def run(app: FastAPI, path: str, requests: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def one():
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get(path)
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+
+        await client.get(path)  # warm up connections and caches
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "path": path,
+        "requests": requests,
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(requests / elapsed, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 1),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 1),
+    }
+
+
+async def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--upstream-ms", type=int, default=50, help="simulated OpenWeather latency")
+    parser.add_argument("--suppliers", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    seed(args.suppliers)
+    server, upstream_url = start_upstream(args.upstream_ms)
+    app = build_app(upstream_url)
+    try:
+        results = [await run(app, path, args.requests, args.concurrency) for path in ("/blocking", "/async")]
+    finally:
+        await upstream.aclose()
+        await database.async_engine.dispose()
+        server.shutdown()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,140 @@
+"""
+Login throughput and the per-request cost of authentication, in one worker.
+
+- login:    /auth/token at --concurrency; bcrypt runs on the auth hash pool, so the run also
+            reports how many logins were shed with 503 and the p95 of a trivial /ping that is
+            requested alongside (it should stay flat while logins queue).
+- overhead: a /whoami route behind auth.get_current_user, with the principal cache and with
+            it disabled (JWT decode + user query on every request), against an open /ping.
+
+    DATABASE_URL=sqlite:///./bench.db python -m benchmarks.auth_throughput --logins 40 --concurrency 8
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench_auth_throughput.db")
+os.environ.setdefault("GEMINI_API_KEY", "")
+
+import httpx
+from fastapi import Depends
+from api import auth, database, models
+from api.main import app
+
+EMAIL = "bench@example.com"
+PASSWORD = "bench-password"
+
+
+@app.get("/ping")
+async def ping():
+    return {"ok": True}
+
+
+@app.get("/whoami")
+async def whoami(user: auth.Principal = Depends(auth.get_current_user)):
+    return {"id": user.id}
+
+
+def seed():
+    db = database.SessionLocal()
+    try:
+        if not db.query(models.User).filter(models.User.email == EMAIL).first():
+            db.add(models.User(email=EMAIL, hashed_password=auth.hash_password(PASSWORD), full_name="Bench"))
+            db.commit()
+    finally:
+        db.close()
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return round(values[max(int(len(values) * q) - 1, 0)] * 1000, 2) if values else None
+
+
+async def timed(client, method, path, **kwargs):
+    started = time.perf_counter()
+    response = await client.request(method, path, **kwargs)
+    return response.status_code, time.perf_counter() - started
+
+
+async def bench_login(client, logins: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    done = asyncio.Event()
+    pings = []
+
+    async def login():
+        async with semaphore:
+            return await timed(client, "POST", "/auth/token", data={"username": EMAIL, "password": PASSWORD})
+
+    async def ping_while_busy():
+        while not done.is_set():
+            pings.append((await timed(client, "GET", "/ping"))[1])
+            await asyncio.sleep(0.01)
+
+    pinger = asyncio.create_task(ping_while_busy())
+    started = time.perf_counter()
+    results = await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await pinger
+
+    ok = [t for code, t in results if code == 200]
+    return {
+        "logins": logins,
+        "concurrency": concurrency,
+        "succeeded": len(ok),
+        "shed_503": sum(1 for code, _ in results if code == 503),
+        "logins_per_second": round(len(ok) / elapsed, 2),
+        "login_p50_ms": percentile(ok, 0.5),
+        "login_p95_ms": percentile(ok, 0.95),
+        "ping_during_logins_p95_ms": percentile(pings, 0.95),
+    }
+
+
+async def bench_overhead(client, token: str, requests: int):
+    headers = {"Authorization": f"Bearer {token}"}
+
+    async def run(path, **kwargs):
+        await client.get(path, **kwargs)  # warm up
+        started = time.perf_counter()
+        for _ in range(requests):
+            (await client.get(path, **kwargs)).raise_for_status()
+        return (time.perf_counter() - started) / requests * 1e6
+
+    ttl = auth.principal_cache.ttl
+    open_us = await run("/ping")
+    cached_us = await run("/whoami", headers=headers)
+    auth.principal_cache.ttl = 0
+    auth.principal_cache.clear()
+    uncached_us = await run("/whoami", headers=headers)
+    auth.principal_cache.ttl = ttl
+    return {
+        "requests": requests,
+        "open_us": round(open_us, 1),
+        "authenticated_cached_us": round(cached_us, 1),
+        "authenticated_uncached_us": round(uncached_us, 1),
+        "auth_overhead_cached_us": round(cached_us - open_us, 1),
+        "auth_overhead_uncached_us": round(uncached_us - open_us, 1),
+    }
+
+
+async def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--logins", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=500, help="authenticated requests per overhead run")
+    args = parser.parse_args(argv)
+
+    seed()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        login = await bench_login(client, args.logins, args.concurrency)
+        token = (await client.post("/auth/token", data={"username": EMAIL, "password": PASSWORD})).json()["access_token"]
+        overhead = await bench_overhead(client, token, args.requests)
+    await database.async_engine.dispose()
+    auth.shutdown()
+    print(json.dumps({"login": login, "overhead": overhead}, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
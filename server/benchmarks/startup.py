@@ -0,0 +1,175 @@
+"""
+Cold-start time of the API: how long a fresh worker takes from process start to serving.
+
+Each run is a new interpreter (python -m benchmarks.startup --child) that times
+- import_ms:        `import api.main`
+- lifespan_ms:      the app's startup hook (providers, upstream clients, job workers)
+- first_request_ms: the first GET /metrics through httpx.ASGITransport
+and reports which heavy modules the import pulled in. The parent also times the whole process
+(process_ms, interpreter start and shutdown included) and prints median / min / max.
+
+--no-database points DATABASE_URL at a path that cannot exist, to check that a worker starts
+without database connectivity. Results are written as JSON; --compare prints the difference
+between two result files.
+
+    python -m benchmarks.startup --runs 10
+    python -m benchmarks.startup --no-database
+    python -m benchmarks.startup --compare benchmarks/results/startup-before.json benchmarks/results/startup-after.json
+
+Run from server/.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+HEAVY_MODULES = ["pandas", "numpy", "openpyxl", "pyarrow", "google.generativeai"]
+MEASURES = ["process_ms", "import_ms", "lifespan_ms", "first_request_ms"]
+UNREACHABLE_DATABASE_URL = "sqlite:////nonexistent/bench_startup/db.sqlite"
+
+
+def child():
+    started = time.perf_counter()
+    import api.main
+    imported = time.perf_counter()
+
+    import asyncio
+    import httpx
+
+    async def serve():
+        timings = {}
+        t = time.perf_counter()
+        async with api.main.app.router.lifespan_context(api.main.app):
+            timings["lifespan_ms"] = (time.perf_counter() - t) * 1000
+            t = time.perf_counter()
+            transport = httpx.ASGITransport(app=api.main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                response = await client.get("/metrics")
+            timings["first_request_ms"] = (time.perf_counter() - t) * 1000
+            timings["status"] = response.status_code
+        return timings
+
+    loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+    result = {"import_ms": (imported - started) * 1000, "loaded_at_import": loaded, **asyncio.run(serve())}
+    print(json.dumps(result))
+
+
+def run_once(env: dict) -> dict:
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-m", "benchmarks.startup", "--child"], env=env, capture_output=True, text=True
+    )
+    elapsed = (time.perf_counter() - started) * 1000
+    if proc.returncode != 0:
+        lines = [line for line in proc.stderr.splitlines() if line.strip() and not line.startswith("(Background")]
+        return {"error": lines[-1] if lines else f"exit {proc.returncode}"}
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["process_ms"] = elapsed
+    return result
+
+
+def summarize(runs: list) -> dict:
+    ok = [r for r in runs if "error" not in r]
+    summary = {"runs": len(runs), "errors": [r["error"] for r in runs if "error" in r]}
+    for measure in MEASURES:
+        values = [r[measure] for r in ok]
+        if values:
+            summary[measure] = {
+                "median": round(statistics.median(values), 1),
+                "min": round(min(values), 1),
+                "max": round(max(values), 1),
+            }
+    if ok:
+        summary["loaded_at_import"] = ok[0]["loaded_at_import"]
+    return summary
+
+
+def compare(before_path: str, after_path: str):
+    with open(before_path) as f:
+        before = json.load(f)["summary"]
+    with open(after_path) as f:
+        after = json.load(f)["summary"]
+    print(f"{'measure':18} {'before':>10} {'after':>10} {'change':>8}")
+    for measure in MEASURES:
+        old, new = before.get(measure, {}).get("median"), after.get(measure, {}).get("median")
+        change = f"{(new - old) / old:+.0%}" if old and new is not None else ""
+        print(f"{measure:18} {old if old is not None else '-':>10} {new if new is not None else '-':>10} {change:>8}")
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cold-start time of the API.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--database-url", default="sqlite:///./bench_startup.db")
+    parser.add_argument("--no-database", action="store_true", help="start without a reachable database")
+    parser.add_argument("--job-workers", type=int, default=0, help="in-process job workers started by the lifespan")
+    parser.add_argument("--output", help="result file; default benchmarks/results/startup-<time>.json")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="compare two result files and exit")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        return child()
+    if args.compare:
+        return compare(*args.compare)
+
+    env = {
+        **os.environ,
+        "DATABASE_URL": UNREACHABLE_DATABASE_URL if args.no_database else args.database_url,
+        "DATABASE_REPLICA_URLS": "",
+        "OPENWEATHER_API_KEY": "bench",
+        "GEMINI_API_KEY": "bench",
+        "JOB_WORKERS": str(args.job_workers),
+        "LOG_LEVEL": os.getenv("LOG_LEVEL", "WARNING"),
+    }
+    runs = []
+    for i in range(args.runs):
+        runs.append(run_once(env))
+        r = runs[-1]
+        if "error" in r:
+            print(f"run {i + 1}: failed: {r['error']}", file=sys.stderr)
+        else:
+            print(
+                f"run {i + 1}: process {r['process_ms']:7.1f}  import {r['import_ms']:7.1f}  "
+                f"lifespan {r['lifespan_ms']:6.1f}  first request {r['first_request_ms']:6.1f} ms",
+                file=sys.stderr,
+            )
+
+    summary = summarize(runs)
+    for measure in MEASURES:
+        if measure in summary:
+            s = summary[measure]
+            print(f"{measure:18} median {s['median']:8.1f}  min {s['min']:8.1f}  max {s['max']:8.1f} ms", file=sys.stderr)
+    if "loaded_at_import" in summary:
+        print(f"heavy modules loaded by the import: {', '.join(summary['loaded_at_import']) or 'none'}", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": sys.version.split()[0],
+            "no_database": args.no_database,
+            "job_workers": args.job_workers,
+        },
+        "summary": summary,
+        "runs": runs,
+    }
+    output = args.output or os.path.join("benchmarks", "results", f"startup-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Local stand-ins for the upstream services, for benchmarks and offline runs.
+
+One threaded HTTP server answers the OpenWeather endpoints the API uses (geo/1.0/direct,
+data/2.5/weather, data/3.0/onecall/timemachine) and the Gemini REST API (generateContent and
+streamGenerateContent?alt=sse) after a configurable delay. Answers are deterministic per
+location / prompt so runs are comparable. error_rate answers that share of requests with
+503 and slow_rate delays that share tenfold, to exercise retries, circuit breakers and
+hedging. Point the API at it with
+
+    OPENWEATHER_BASE_URL=http://127.0.0.1:<port> GEMINI_API_ENDPOINT=http://127.0.0.1:<port>
+
+or run it on its own:
+
+    python -m benchmarks.stubs --port 8099 --weather-ms 80 --gemini-ms 1500
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+CONDITIONS = ["clear sky", "few clouds", "scattered clouds", "light rain", "overcast clouds", "moderate rain", "snow"]
+STREAM_CHUNKS = 4
+
+
+def _pick(seed: str, n: int) -> int:
+    return int(hashlib.sha256(seed.encode()).hexdigest()[:8], 16) % n
+
+
+class UpstreamStub:
+    def __init__(self, weather_ms: float = 80, gemini_ms: float = 1500, port: int = 0,
+                 error_rate: float = 0, slow_rate: float = 0):
+        self.weather_ms = weather_ms
+        self.gemini_ms = gemini_ms
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.calls = Counter()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _count(self, endpoint: str):
+        with self._lock:
+            self.calls[endpoint] += 1
+
+    def _delay(self, ms: float):
+        time.sleep(ms * (10 if random.random() < self.slow_rate else 1) / 1000)
+
+    def _fails(self) -> bool:
+        return random.random() < self.error_rate
+
+    # ---------- Responses ----------
+
+    def geocode(self, query):
+        place = query.get("q", [""])[0]
+        return [{"name": place, "lat": round(-40 + _pick(place, 8000) / 100, 4), "lon": round(-120 + _pick(place[::-1], 24000) / 100, 4)}]
+
+    def weather(self, query):
+        seed = f"{query.get('lat', [''])[0]},{query.get('lon', [''])[0]}"
+        return {
+            "weather": [{"description": CONDITIONS[_pick(seed, len(CONDITIONS))]}],
+            "main": {"temp": 5 + _pick(seed, 300) / 10, "humidity": 30 + _pick(seed, 60)},
+        }
+
+    def timemachine(self, query):
+        seed = f"{query.get('lat', [''])[0]},{query.get('lon', [''])[0]},{query.get('dt', [''])[0]}"
+        return {"current": {
+            "temp": 5 + _pick(seed, 300) / 10,
+            "humidity": 30 + _pick(seed, 60),
+            "weather": [{"description": CONDITIONS[_pick(seed, len(CONDITIONS))]}],
+        }}
+
+    def completion(self, prompt: str) -> str:
+        score = 1 + _pick(prompt, 9)
+        return (
+            f"Feasibility score: {score}/10\n"
+            f"Strengths: consistent audits and documented quality standards.\n"
+            f"Risks: delivery variance and weather exposure.\n"
+            f"Recommended action: {'approve' if score >= 7 else 'monitor' if score >= 4 else 'avoid'}."
+        )
+
+    # ---------- HTTP ----------
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _json(self, payload, status=200):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                routes = {
+                    "/geo/1.0/direct": stub.geocode,
+                    "/data/2.5/weather": stub.weather,
+                    "/data/3.0/onecall/timemachine": stub.timemachine,
+                }
+                route = routes.get(url.path)
+                if route is None:
+                    return self._json({"cod": 404, "message": "not found"}, 404)
+                stub._count(url.path)
+                stub._delay(stub.weather_ms)
+                if stub._fails():
+                    return self._json({"cod": 503, "message": "unavailable"}, 503)
+                self._json(route(query))
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                prompt = "".join(
+                    part.get("text", "") for content in body.get("contents", []) for part in content.get("parts", [])
+                )
+                if stub._fails():
+                    return self._json({"error": {"code": 503, "message": "unavailable"}}, 503)
+                if url.path.endswith(":generateContent"):
+                    stub._count("gemini:generateContent")
+                    stub._delay(stub.gemini_ms)
+                    return self._json(_candidate(stub.completion(prompt)))
+                if url.path.endswith(":streamGenerateContent"):
+                    stub._count("gemini:streamGenerateContent")
+                    return self._stream(stub.completion(prompt))
+                self._json({"error": {"code": 404, "message": "not found"}}, 404)
+
+            def _stream(self, text):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                size = -(-len(text) // STREAM_CHUNKS)
+                for i in range(0, len(text), size):
+                    time.sleep(stub.gemini_ms / 1000 / STREAM_CHUNKS)
+                    self.wfile.write(f"data: {json.dumps(_candidate(text[i:i + size]))}\r\n\r\n".encode())
+                    self.wfile.flush()
+                self.close_connection = True
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def _candidate(text: str) -> dict:
+    return {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP", "index": 0}]}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local OpenWeather and Gemini stand-ins.")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--weather-ms", type=float, default=80)
+    parser.add_argument("--gemini-ms", type=float, default=1500)
+    parser.add_argument("--error-rate", type=float, default=0, help="share of requests answered with 503")
+    parser.add_argument("--slow-rate", type=float, default=0, help="share of requests delayed tenfold")
+    args = parser.parse_args(argv)
+    stub = UpstreamStub(args.weather_ms, args.gemini_ms, args.port, args.error_rate, args.slow_rate)
+    print(f"Upstream stand-ins on {stub.url}")
+    try:
+        stub._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+from logging.config import fileConfig
+from alembic import context
+from sqlalchemy import create_engine, pool
+from api import models  # noqa: F401  registers every table on Base.metadata
+from api.config import settings
+from api.database import Base
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def _configure(sqlite: bool, **options):
+    # SQLite cannot ALTER most things in place; batch mode recreates the table instead.
+    context.configure(
+        target_metadata=target_metadata,
+        render_as_batch=sqlite,
+        compare_type=True,
+        **options,
+    )
+
+
+def run_migrations_offline():
+    """Emit the SQL (alembic upgrade head --sql) without connecting."""
+    _configure(settings.database_url.startswith("sqlite"), url=settings.database_url, literal_binds=True, dialect_opts={"paramstyle": "named"})
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def _run(connection):
+    _configure(connection.dialect.name == "sqlite", connection=connection)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    # Callers running alembic in-process (the tests) can hand over a connection instead.
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        return _run(connection)
+    connectable = create_engine(settings.database_url, poolclass=pool.NullPool)
+    with connectable.connect() as connection:
+        _run(connection)
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
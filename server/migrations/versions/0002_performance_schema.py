@@ -0,0 +1,159 @@
+"""performance schema
+
+What the performance work added on top of the initial schema: supplier coordinates, the
+geocode, LLM and weather caches, the jobs queue, per-user summaries, the monthly compliance
+rollup, revoked tokens, and the indexes behind the hot queries.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 19:33:09.428268
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, Sequence[str], None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('geocode_cache',
+    sa.Column('place', sa.String(), nullable=False),
+    sa.Column('latitude', sa.Float(), nullable=False),
+    sa.Column('longitude', sa.Float(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('place')
+    )
+    op.create_table('jobs',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('kind', sa.String(), nullable=False),
+    sa.Column('params', sa.JSON(), nullable=False),
+    sa.Column('dedupe_key', sa.String(length=64), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('status', sa.String(length=16), nullable=False),
+    sa.Column('result', sa.JSON(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('error_code', sa.Integer(), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('worker_id', sa.String(length=64), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.Column('expires_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_jobs_dedupe_key'), ['dedupe_key'], unique=False)
+        batch_op.create_index(batch_op.f('ix_jobs_expires_at'), ['expires_at'], unique=False)
+        batch_op.create_index('ix_jobs_status_created', ['status', 'created_at'], unique=False)
+
+    op.create_table('llm_cache',
+    sa.Column('key', sa.String(length=64), nullable=False),
+    sa.Column('model', sa.String(), nullable=False),
+    sa.Column('template', sa.String(), nullable=False),
+    sa.Column('template_version', sa.Integer(), nullable=False),
+    sa.Column('supplier_id', sa.Integer(), nullable=True),
+    sa.Column('response', sa.Text(), nullable=False),
+    sa.Column('size_bytes', sa.Integer(), nullable=False),
+    sa.Column('hits', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('last_used_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+    with op.batch_alter_table('llm_cache', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_llm_cache_last_used_at'), ['last_used_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_llm_cache_supplier_id'), ['supplier_id'], unique=False)
+
+    op.create_table('weather_daily',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('latitude', sa.Float(), nullable=False),
+    sa.Column('longitude', sa.Float(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('temperature', sa.Float(), nullable=True),
+    sa.Column('condition', sa.String(), nullable=True),
+    sa.Column('humidity', sa.Integer(), nullable=True),
+    sa.Column('fetched_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('latitude', 'longitude', 'day', name='uq_weather_daily_location_day')
+    )
+    with op.batch_alter_table('weather_daily', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_weather_daily_id'), ['id'], unique=False)
+
+    op.create_table('revoked_tokens',
+    sa.Column('jti', sa.String(length=32), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('jti')
+    )
+    with op.batch_alter_table('revoked_tokens', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_revoked_tokens_expires_at'), ['expires_at'], unique=False)
+
+    op.create_table('user_summaries',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('supplier_count', sa.Integer(), nullable=False),
+    sa.Column('record_count', sa.Integer(), nullable=False),
+    sa.Column('last_activity', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_table('compliance_monthly_rollup',
+    sa.Column('supplier_id', sa.Integer(), nullable=False),
+    sa.Column('metric', sa.String(), nullable=False),
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.Column('record_count', sa.Integer(), nullable=False),
+    sa.Column('value_count', sa.Integer(), nullable=False),
+    sa.Column('value_sum', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['supplier_id'], ['suppliers.id'], ),
+    sa.PrimaryKeyConstraint('supplier_id', 'metric', 'month')
+    )
+    with op.batch_alter_table('compliance_records', schema=None) as batch_op:
+        batch_op.create_index('ix_compliance_records_date_id', ['date_recorded', 'id'], unique=False)
+        batch_op.create_index('ix_compliance_records_supplier_date', ['supplier_id', 'date_recorded'], unique=False)
+
+    with op.batch_alter_table('suppliers', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('latitude', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('longitude', sa.Float(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_suppliers_user_id'), ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('suppliers', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_suppliers_user_id'))
+        batch_op.drop_column('longitude')
+        batch_op.drop_column('latitude')
+
+    with op.batch_alter_table('compliance_records', schema=None) as batch_op:
+        batch_op.drop_index('ix_compliance_records_supplier_date')
+        batch_op.drop_index('ix_compliance_records_date_id')
+
+    op.drop_table('compliance_monthly_rollup')
+    op.drop_table('user_summaries')
+    with op.batch_alter_table('revoked_tokens', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_revoked_tokens_expires_at'))
+
+    op.drop_table('revoked_tokens')
+    with op.batch_alter_table('weather_daily', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_weather_daily_id'))
+
+    op.drop_table('weather_daily')
+    with op.batch_alter_table('llm_cache', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_llm_cache_supplier_id'))
+        batch_op.drop_index(batch_op.f('ix_llm_cache_last_used_at'))
+
+    op.drop_table('llm_cache')
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.drop_index('ix_jobs_status_created')
+        batch_op.drop_index(batch_op.f('ix_jobs_expires_at'))
+        batch_op.drop_index(batch_op.f('ix_jobs_dedupe_key'))
+
+    op.drop_table('jobs')
+    op.drop_table('geocode_cache')
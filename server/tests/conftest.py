@@ -0,0 +1,46 @@
+"""
+Test setup: a throwaway SQLite database, fake weather and LLM providers and no job workers.
+Settings are read when api is first imported, so the environment is set before that.
+
+    cd server && python -m pytest -q
+"""
+import asyncio
+import os
+import tempfile
+
+import pytest
+
+_tmp = tempfile.mkdtemp(prefix="auditryx-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{os.path.join(_tmp, 'test.db')}",
+    "DATABASE_REPLICA_URLS": "",
+    "GEMINI_API_KEY": "test",
+    "OPENWEATHER_API_KEY": "test",
+    "WEATHER_PROVIDER": "fake",
+    "LLM_PROVIDER": "fake",
+    "JOB_WORKERS": "0",
+})
+
+import httpx  # noqa: E402
+from api import database, models  # noqa: E402,F401  (models registers the tables)
+from api.main import app  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def schema():
+    database.Base.metadata.create_all(bind=database.engine)
+    yield
+    database.Base.metadata.drop_all(bind=database.engine)
+
+
+@pytest.fixture
+def run():
+    """Run a coroutine function against the app, with its lifespan, and return its result."""
+    def runner(test):
+        async def main():
+            async with app.router.lifespan_context(app):
+                transport = httpx.ASGITransport(app=app)
+                async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                    return await test(client)
+        return asyncio.run(main())
+    return runner
@@ -0,0 +1,25 @@
+from api import database
+from api.main import app
+
+
+def test_dashboard_uses_the_async_session_only(run):
+    def no_sync_session():
+        raise AssertionError("dashboard opened a sync session")
+        yield  # pragma: no cover
+
+    async def test(client):
+        signup = await client.post("/auth/signup", json={"email": "dash@example.com", "password": "secret"})
+        token = signup.json()["access_token"]
+        await client.post("/suppliers/", headers={"x-user-id": str(signup.json()["user"]["id"])}, json={
+            "name": "Acme", "country": "France", "city": "Lyon", "contract_terms": {}, "risk_level": "low",
+        })
+        return await client.get("/auth/dashboard-data", headers={"Authorization": f"Bearer {token}"})
+
+    app.dependency_overrides[database.get_db] = no_sync_session
+    try:
+        response = run(test)
+    finally:
+        app.dependency_overrides.clear()
+    assert response.status_code == 200, response.text
+    assert response.json()["suppliers"] == 1
+    assert response.json()["recent_suppliers"][0]["name"] == "Acme"
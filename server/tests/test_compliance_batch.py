@@ -0,0 +1,59 @@
+from datetime import date
+
+from api import crud, database, models
+
+
+def _records(n):
+    with database.SessionLocal() as db:
+        supplier = models.Supplier(name="Acme", country="Testland", contract_terms={}, risk_level="low", user_id=1)
+        db.add(supplier)
+        db.flush()
+        records = [
+            models.ComplianceRecord(supplier_id=supplier.id, metric="quality", date_recorded=date(2024, 5, 1 + i),
+                                    result=50.0, status="compliant")
+            for i in range(n)
+        ]
+        db.add_all(records)
+        db.commit()
+        crud.rebuild_monthly_rollup(db, supplier.id)
+        return supplier.id, [r.id for r in records]
+
+
+def _rollup(supplier_id):
+    with database.SessionLocal() as db:
+        row = db.query(models.ComplianceMonthlyRollup).filter_by(supplier_id=supplier_id).one()
+        return row.record_count, row.value_sum
+
+
+def _patch(run, items, mode="atomic"):
+    async def test(client):
+        return await client.patch(f"/compliance/batch?mode={mode}", json={"items": items})
+    return run(test)
+
+
+def test_repeated_id_is_rejected(run):
+    supplier_id, (record_id,) = _records(1)
+    items = [{"id": record_id, "result": 70.0}, {"id": record_id, "result": 80.0}]
+
+    response = _patch(run, items)
+    assert response.status_code == 422
+    assert [e["index"] for e in response.json()["detail"]["errors"]] == [1]
+
+    response = _patch(run, items, mode="best_effort")
+    assert response.status_code == 200
+    assert response.json()["ids"] == [record_id, None]
+
+
+def test_rollup_counts_each_record_once(run):
+    supplier_id, (record_id,) = _records(1)
+    _patch(run, [{"id": record_id, "result": 70.0}, {"id": record_id, "result": 80.0}], mode="best_effort")
+    assert _rollup(supplier_id) == (1, 70.0)
+
+
+def test_atomic_database_error_is_reported_per_item(run):
+    supplier_id, (first, second) = _records(2)
+    response = _patch(run, [{"id": first, "result": 90.0}, {"id": second, "status": None}])
+    assert response.status_code == 422
+    assert [e["index"] for e in response.json()["detail"]["errors"]] == [1]
+    with database.SessionLocal() as db:
+        assert db.get(models.ComplianceRecord, first).result == 50.0
@@ -0,0 +1,26 @@
+import io
+
+from api import database, importer, models
+
+
+def _csv(text):
+    return importer.iter_rows(io.BytesIO(text.encode()), "records.csv")
+
+
+def test_in_file_duplicate_is_reported():
+    with database.SessionLocal() as db:
+        supplier = models.Supplier(name="Acme", country="Testland", contract_terms={}, risk_level="low", user_id=1)
+        db.add(supplier)
+        db.commit()
+        rows = _csv(
+            "supplier_id,metric,date_recorded,result,status\n"
+            f"{supplier.id},quality,2024-05-01,90,Pass\n"
+            f"{supplier.id},delivery,2024-05-01,3,Pass\n"
+            f"{supplier.id},quality,2024-05-01,40,Fail\n"
+        )
+        report = importer.import_compliance_records(db, rows).as_dict()
+        stored = db.query(models.ComplianceRecord).filter_by(metric="quality").one()
+
+    assert (report["rows"], report["inserted"], report["updated"], report["failed"], report["duplicates"]) == (3, 2, 0, 0, 1)
+    assert report["warnings"] == [{"row": 2, "warning": "superseded by row 4 with the same supplier_id, metric and date_recorded"}]
+    assert stored.status == "Fail"
@@ -0,0 +1,98 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+
+from api import database, jobs, models, schemas
+from api.config import settings
+
+
+def test_job_is_only_visible_to_its_owner(run):
+    async def test(client):
+        submitted = await client.post(
+            "/jobs/", json={"kind": "supplier_insights", "params": {"supplier_id": 1}}, headers={"x-user-id": "1"}
+        )
+        job_id = submitted.json()["id"]
+        own = await client.get(f"/jobs/{job_id}", headers={"x-user-id": "1"})
+        other = await client.get(f"/jobs/{job_id}", headers={"x-user-id": "2"})
+        resubmitted = await client.post(
+            "/jobs/", json={"kind": "supplier_insights", "params": {"supplier_id": 1}}, headers={"x-user-id": "2"}
+        )
+        return submitted, own, other, resubmitted
+
+    submitted, own, other, resubmitted = run(test)
+    assert submitted.status_code == 202
+    assert own.status_code == 200
+    assert other.status_code == 404
+    # Another user's identical job is not joined, so it stays readable by them.
+    assert resubmitted.json()["id"] != submitted.json()["id"]
+
+
+def _job(**values):
+    job = models.Job(
+        id=uuid.uuid4().hex, kind="supplier_insights", params={"supplier_id": 1}, dedupe_key="k",
+        user_id=1, status="queued", attempts=0, created_at=datetime.utcnow(),
+    )
+    for name, value in values.items():
+        setattr(job, name, value)
+    return job
+
+
+def _statuses(*job_ids):
+    db = database.SessionLocal()
+    try:
+        return [(db.get(models.Job, job_id).status, db.get(models.Job, job_id).worker_id) for job_id in job_ids]
+    finally:
+        db.close()
+
+
+def test_stopping_the_pool_requeues_the_running_job(run, monkeypatch):
+    started = asyncio.Event()
+
+    async def hang(params):
+        started.set()
+        await asyncio.Event().wait()
+
+    monkeypatch.setitem(jobs.HANDLERS, "supplier_insights", (schemas.SupplierAnalysisParams, hang))
+
+    async def test(client):
+        submitted = await client.post(
+            "/jobs/", json={"kind": "supplier_insights", "params": {"supplier_id": 1}}, headers={"x-user-id": "1"}
+        )
+        pool = jobs.JobWorkerPool()
+        await pool.start(1)
+        await asyncio.wait_for(started.wait(), 5)
+        await pool.stop()
+        return submitted.json()["id"]
+
+    job_id = run(test)
+    assert _statuses(job_id) == [("queued", None)]
+
+
+def test_reap_requeues_lost_jobs_until_they_run_out_of_attempts(run):
+    long_ago = datetime.utcnow() - timedelta(seconds=3 * settings.job_timeout_seconds)
+    retry = _job(status="running", worker_id="gone:1", started_at=long_ago, attempts=1)
+    spent = _job(status="running", worker_id="gone:1", started_at=long_ago, attempts=settings.job_max_attempts)
+    db = database.SessionLocal()
+    job_ids = retry.id, spent.id
+    db.add_all([retry, spent])
+    db.commit()
+    db.close()
+
+    async def test(client):
+        await jobs.JobWorkerPool().reap()
+
+    run(test)
+    assert _statuses(*job_ids) == [("queued", None), ("failed", "gone:1")]
+
+
+def test_a_waiter_timing_out_does_not_orphan_the_others(run):
+    async def test(client):
+        pool = jobs.JobWorkerPool()
+        short = asyncio.create_task(pool.wait_finished("job", 0.01))
+        long = asyncio.create_task(pool.wait_finished("job", 5))
+        await short
+        await pool._finish("job", {"status": "succeeded"})  # no such row; only the waiters matter here
+        await asyncio.wait_for(long, 1)
+        return pool._finished
+
+    assert run(test) == {}
@@ -0,0 +1,40 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from api import database, llm_cache, models
+from api.config import settings
+
+
+@pytest.fixture(autouse=True)
+def fresh_size_estimate(monkeypatch):
+    monkeypatch.setitem(llm_cache._size, "bytes", None)
+
+
+def _store(db, key, response):
+    llm_cache.store(db, key, "model", "template", 1, response)
+    llm_cache.commit(db)
+
+
+def test_recent_hit_does_not_write():
+    with database.SessionLocal() as db:
+        _store(db, "a", "cached")
+        assert llm_cache.lookup(db, "a") == "cached"
+        assert not db.dirty
+        entry = db.get(models.LLMCacheEntry, "a")
+        entry.last_used_at = datetime.utcnow() - timedelta(seconds=settings.llm_cache_touch_seconds + 1)
+        db.commit()
+        assert llm_cache.lookup_many(db, ["a"]) == {"a": "cached"}
+        assert entry in db.dirty and entry.hits == 1
+
+
+def test_store_evicts_least_recently_used(monkeypatch):
+    monkeypatch.setattr(settings, "llm_cache_max_bytes", 25)
+    with database.SessionLocal() as db:
+        for i, key in enumerate("abc"):
+            _store(db, key, "x" * 10)
+            db.get(models.LLMCacheEntry, key).last_used_at = datetime(2024, 1, 1 + i)
+            db.commit()
+        assert llm_cache.lookup(db, "a") is None
+        assert {e.key for e in db.query(models.LLMCacheEntry)} == {"b", "c"}
+        assert llm_cache._size["bytes"] == 20
@@ -0,0 +1,68 @@
+import os
+
+import sqlalchemy as sa
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config
+from alembic.migration import MigrationContext
+from sqlalchemy.orm import Session
+
+from api import crud, database, models
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(__file__)), "migrations")
+
+
+def _baseline_metadata():
+    """The tables as create_all made them from api/models.py before the migrations existed."""
+    metadata = sa.MetaData()
+    sa.Table("users", metadata,
+             sa.Column("id", sa.Integer, primary_key=True, index=True),
+             sa.Column("email", sa.String, unique=True, nullable=False),
+             sa.Column("hashed_password", sa.String, nullable=False),
+             sa.Column("full_name", sa.String))
+    sa.Table("suppliers", metadata,
+             sa.Column("id", sa.Integer, primary_key=True, index=True),
+             sa.Column("name", sa.String, nullable=False),
+             sa.Column("country", sa.String, nullable=False),
+             sa.Column("city", sa.String, nullable=True),
+             sa.Column("status", sa.String, nullable=True),
+             sa.Column("contract_terms", sa.JSON, nullable=False),
+             sa.Column("compliance_score", sa.Integer),
+             sa.Column("last_audit", sa.Date, nullable=True),
+             sa.Column("risk_level", sa.String, nullable=True),
+             sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id"), nullable=False))
+    sa.Table("compliance_records", metadata,
+             sa.Column("id", sa.Integer, primary_key=True, index=True),
+             sa.Column("supplier_id", sa.Integer, sa.ForeignKey("suppliers.id"), nullable=False),
+             sa.Column("metric", sa.String, nullable=False),
+             sa.Column("date_recorded", sa.Date, nullable=False),
+             sa.Column("result", sa.Float, nullable=True),
+             sa.Column("status", sa.String, nullable=False))
+    return metadata
+
+
+def test_create_all_database_upgrades_to_head(tmp_path):
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    baseline = _baseline_metadata()
+    baseline.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(baseline.tables["users"].insert().values(id=1, email="a@example.com", hashed_password="x"))
+        connection.execute(baseline.tables["suppliers"].insert().values(
+            id=1, name="Acme", country="France", city="Lyon", contract_terms={}, user_id=1))
+        connection.execute(baseline.tables["compliance_records"].insert().values(
+            supplier_id=1, metric="quality", date_recorded=sa.func.date("2024-05-01"), result=90.0, status="pass"))
+
+    config = Config()
+    config.set_main_option("script_location", MIGRATIONS)
+    with engine.begin() as connection:
+        config.attributes["connection"] = connection
+        command.stamp(config, "0001")
+        command.upgrade(config, "head")
+        assert compare_metadata(MigrationContext.configure(connection), database.Base.metadata) == []
+
+    with Session(engine) as db:
+        supplier = db.get(models.Supplier, 1)
+        assert (supplier.name, supplier.latitude) == ("Acme", None)
+        assert db.query(models.GeocodeCache).count() == 0
+        summary = crud.get_user_summary(db, 1)
+        assert (summary.supplier_count, summary.record_count) == (1, 1)
@@ -0,0 +1,46 @@
+import random
+from datetime import date, timedelta
+
+from api import database, models, scoring, scoring_terms
+
+STATUSES = ["Pass", "compliant", "FAIL", "non-compliant", "Excused - Weather Delay", "pending", None]
+METRICS = ["quality", "On-time delivery", "delivery_days", "safety"]
+
+
+def _seed(db):
+    rng = random.Random(7)
+    suppliers = [
+        models.Supplier(name=f"S{i}", country="Testland", risk_level="low", user_id=1, compliance_score=60 + i,
+                        contract_terms={"delivery_time": f"within {3 + i} days"} if i % 2 else {})
+        for i in range(4)
+    ]
+    db.add_all(suppliers)
+    db.flush()
+    db.add_all([
+        models.ComplianceRecord(
+            supplier_id=rng.choice(suppliers[:3]).id,  # the last supplier has no history
+            metric=rng.choice(METRICS),
+            date_recorded=date(2024, 1, 1) + timedelta(days=rng.randrange(300)),
+            result=rng.choice([None, float(rng.randrange(10))]),
+            status=rng.choice(STATUSES) or "",
+        )
+        for _ in range(400)
+    ])
+    db.commit()
+    return suppliers
+
+
+def test_summary_scores_match_scores_from_raw_records():
+    with database.SessionLocal() as db:
+        suppliers = _seed(db)
+        frame = scoring.suppliers_frame(suppliers)
+        ids = [s.id for s in suppliers]
+        raw = scoring.load_records(db, ids)
+        rows = db.execute(scoring_terms.record_summary_query(ids)).all()
+    assert len(rows) < len(raw)
+
+    from_raw = scoring.supplier_features(raw, frame, today=date(2024, 12, 1))
+    from_summary = scoring.supplier_features(scoring.summary_frame(rows), frame, today=date(2024, 12, 1))
+    columns = ["records", "pass_rate", "recent_pass_rate", "delivery_delay_rate", "weather_excused"]
+    assert from_summary[columns].round(9).equals(from_raw[columns].round(9))
+    assert scoring.score(from_summary).equals(scoring.score(from_raw))
@@ -0,0 +1,57 @@
+import asyncio
+
+from api import crud, database, providers, schemas
+
+
+def _supplier(name, city):
+    return {"name": name, "country": "Testland", "city": city, "contract_terms": {}, "risk_level": "low"}
+
+
+def test_concurrent_creates_for_a_new_city(run, monkeypatch):
+    # Both requests miss the geocode cache before either has written it.
+    provider = providers.weather()
+    geocode = provider.ageocode
+
+    async def slow_geocode(place):
+        await asyncio.sleep(0.05)
+        return await geocode(place)
+
+    monkeypatch.setattr(provider, "ageocode", slow_geocode)
+
+    async def test(client):
+        return await asyncio.gather(
+            client.post("/suppliers/", json=_supplier("First", "Raceville")),
+            client.post("/suppliers/", json=_supplier("Second", "Raceville")),
+        )
+
+    first, second = run(test)
+    assert first.status_code == 200, first.text
+    assert second.status_code == 200, second.text
+    assert (first.json()["latitude"], first.json()["longitude"]) == (second.json()["latitude"], second.json()["longitude"])
+
+
+def test_insights_route_is_not_captured_by_supplier_id(run):
+    async def test(client):
+        supplier_id = (await client.post("/suppliers/", json=_supplier("Insightful", "Lyon"))).json()["id"]
+        await client.post("/compliance/", json={
+            "supplier_id": supplier_id, "metric": "quality", "date_recorded": "2024-05-01",
+            "result": 80.0, "status": "compliant",
+        })
+        return await client.get("/suppliers/insights", params={"supplier_id": supplier_id})
+
+    response = run(test)
+    assert response.status_code == 200, response.text
+    assert response.json()["supplier"] == "Insightful"
+
+
+def _update(city):
+    return schemas.SupplierUpdate(**_supplier("Mover", city), compliance_score=0, last_audit=None)
+
+
+def test_moving_a_supplier_takes_coordinates_from_the_caller():
+    with database.SessionLocal() as db:
+        supplier = crud.create_supplier(db, schemas.SupplierCreate(**_supplier("Mover", "Lyon")), 1, (45.76, 4.84))
+        moved = crud.update_supplier(db, supplier.id, _update("Paris"))
+        assert (moved.latitude, moved.longitude) == (None, None)  # resolved on the next weather lookup
+        moved = crud.update_supplier(db, supplier.id, _update("Nice"), (43.7, 7.27))
+        assert (moved.latitude, moved.longitude) == (43.7, 7.27)
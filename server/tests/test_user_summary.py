@@ -0,0 +1,46 @@
+from datetime import datetime
+
+import sqlalchemy as sa
+
+from api import crud, database, models
+
+
+def _supplier(user_id, name="Acme"):
+    return models.Supplier(name=name, country="Testland", contract_terms={}, risk_level="low", user_id=user_id)
+
+
+def test_summary_counts_existing_rows():
+    with database.SessionLocal() as db:
+        db.add_all([_supplier(3, "A"), _supplier(3, "B")])
+        db.commit()
+        summary = crud.get_user_summary(db, 3)
+        assert (summary.supplier_count, summary.record_count) == (2, 0)
+
+
+def test_first_write_racing_another_insert_keeps_both_counts():
+    with database.SessionLocal() as db, database.SessionLocal() as other:
+        db.add(_supplier(5))
+        db.commit()
+        # Another request creates the summary row, counting the committed supplier...
+        assert crud.get_user_summary(other, 5).supplier_count == 1
+        other.commit()
+        # ...after this one found no row and goes on to insert its own count for a new supplier.
+        db.add(_supplier(5, "Second"))
+        db.flush()
+        crud._insert_user_summary(db, 5, suppliers=1, now=datetime.utcnow())
+        db.commit()
+        assert db.get(models.UserSummary, 5).supplier_count == 2
+
+
+def test_summary_created_from_a_replica_read_counts_on_the_primary(tmp_path):
+    replica = sa.create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    database.Base.metadata.create_all(replica)  # a replica that has not caught up with anything
+
+    class LaggingSession(database.RoutingSession):
+        replicas = [replica]
+
+    with database.SessionLocal() as db:
+        db.add(_supplier(7))
+        db.commit()
+    with LaggingSession(info={"read_only": True}) as db:
+        assert crud.get_user_summary(db, 7).supplier_count == 1
@@ -0,0 +1,19 @@
+from datetime import date, datetime
+
+from api import database, models, weather_history
+
+
+def _day(day, condition):
+    return {"latitude": 45.76, "longitude": 4.84, "day": day, "temperature": 12.0, "condition": condition,
+            "humidity": 70, "fetched_at": datetime.utcnow()}
+
+
+def test_a_day_stored_concurrently_does_not_drop_the_others():
+    with database.SessionLocal() as db:
+        weather_history._store_days(db, [_day(date(2024, 5, 1), "clear sky")])
+        weather_history._store_days(db, [_day(date(2024, 5, 1), "light rain"), _day(date(2024, 5, 2), "snow")])
+        stored = weather_history._load_days(db, 45.76, 4.84, [date(2024, 5, 1), date(2024, 5, 2)])
+    assert {day: d["condition"] for day, d in stored.items()} == {
+        date(2024, 5, 1): "clear sky",
+        date(2024, 5, 2): "snow",
+    }